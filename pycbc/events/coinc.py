@@ -153,12 +153,220 @@ def calculate_n_louder(bstat, fstat, dec, skip_background=False):
         return fore_n_louder
 
 
-def timeslide_durations(start1, start2, end1, end2, timeslide_offsets):
+class LouderIndex(object):
+    """ Index of background statistic values for counting louder events
+
+    The background is held sorted, with the decimation factor of each event
+    stored in a binary indexed (Fenwick) tree, so the indexed events are
+    counted and removed in O(log n) time per value rather than by
+    re-sorting the background as `calculate_n_louder` does. Inserted events
+    are held in a pending set, of at most about sqrt(n) events, which every
+    call to `n_louder` sorts and every removal scans; it is merged into the
+    index once it grows large, so insertion is amortized O(sqrt(n)).
+
+    Unlike `calculate_n_louder`, a background event with exactly the same
+    statistic as a foreground event is always counted as louder.
+    """
+    def __init__(self, bstat, dec=None):
+        """
+        Parameters
+        ----------
+        bstat: numpy.ndarray
+            Array of the background statistic values
+        dec: numpy.ndarray, optional
+            Array of the decimation factors for the background statistics.
+            If not given, each event has a factor of one.
+        """
+        bstat = numpy.array(bstat, dtype=numpy.float64, ndmin=1)
+        if dec is None:
+            dec = numpy.ones(len(bstat))
+        self._build(bstat, numpy.array(dec, dtype=numpy.float64, ndmin=1))
+
+    def _build(self, bstat, dec):
+        sort = bstat.argsort()
+        self.stat = bstat[sort]
+        self.weight = dec[sort]
+        self.pending_stat = numpy.array([], dtype=numpy.float64)
+        self.pending_weight = numpy.array([], dtype=numpy.float64)
+
+        # Each node i (counting from one) holds the sum of the weights in
+        # positions (i - lowbit(i), i]
+        cum = numpy.concatenate([[0], self.weight.cumsum()])
+        node = numpy.arange(1, len(cum))
+        self.tree = numpy.zeros(len(cum))
+        self.tree[1:] = cum[node] - cum[node - (node & -node)]
+
+    def _prefix(self, num):
+        """ Total weight of the first `num` sorted events, vectorized """
+        num = numpy.array(num, dtype=numpy.int64, ndmin=1)
+        total = numpy.zeros(len(num))
+        while num.any():
+            total += self.tree[num]
+            num -= num & -num
+        return total
+
+    @property
+    def total(self):
+        """ The total weight of the background """
+        return self._prefix(len(self.stat))[0] + self.pending_weight.sum()
+
+    def n_louder(self, fstat):
+        """ Weighted number of background events at least as loud as each
+        foreground value
+
+        Parameters
+        ----------
+        fstat: numpy.ndarray or scalar
+            Array of the foreground statistic values or single value
+
+        Returns
+        -------
+        fore_n_louder: numpy.ndarray or scalar
+            The number of background events louder than each foreground
+            value
+        """
+        values = numpy.array(fstat, dtype=numpy.float64, ndmin=1)
+        below = numpy.searchsorted(self.stat, values, side='left')
+        louder = self._prefix(len(self.stat))[0] - self._prefix(below)
+
+        if len(self.pending_stat):
+            sort = self.pending_stat.argsort()
+            pcum = numpy.concatenate([[0],
+                                      self.pending_weight[sort].cumsum()])
+            pbelow = numpy.searchsorted(self.pending_stat[sort], values,
+                                        side='left')
+            louder += pcum[-1] - pcum[pbelow]
+
+        if numpy.ndim(fstat) == 0:
+            return louder[0]
+        return louder
+
+    def ifar(self, fstat, background_time):
+        """ Inverse false alarm rate of each foreground value
+
+        Parameters
+        ----------
+        fstat: numpy.ndarray or scalar
+            Array of the foreground statistic values or single value
+        background_time: float
+            The total amount of time the background was gathered over
+
+        Returns
+        -------
+        ifar: numpy.ndarray or scalar
+            The inverse false alarm rate, in the units of background_time
+        """
+        return background_time / (self.n_louder(fstat) + 1)
+
+    def insert(self, bstat, dec=None):
+        """ Add events to the background
+
+        Parameters
+        ----------
+        bstat: numpy.ndarray
+            Array of the background statistic values to add
+        dec: numpy.ndarray, optional
+            Array of their decimation factors, one if not given
+        """
+        bstat = numpy.array(bstat, dtype=numpy.float64, ndmin=1)
+        if dec is None:
+            dec = numpy.ones(len(bstat))
+        dec = numpy.array(dec, dtype=numpy.float64, ndmin=1)
+        self.pending_stat = numpy.concatenate([self.pending_stat, bstat])
+        self.pending_weight = numpy.concatenate([self.pending_weight, dec])
+
+        if len(self.pending_stat) ** 2 > max(len(self.stat), 2 ** 20):
+            keep = self.weight > 0
+            self._build(numpy.concatenate([self.stat[keep],
+                                           self.pending_stat]),
+                        numpy.concatenate([self.weight[keep],
+                                           self.pending_weight]))
+
+    def remove(self, bstat):
+        """ Remove one background event with each of the given values
+
+        Parameters
+        ----------
+        bstat: numpy.ndarray
+            Array of the statistic values of the events to remove
+
+        Raises
+        ------
+        ValueError
+            If there is no remaining background event with one of the values
+        """
+        for value in numpy.array(bstat, dtype=numpy.float64, ndmin=1):
+            pend = numpy.flatnonzero(self.pending_stat == value)
+            if len(pend):
+                self.pending_stat = numpy.delete(self.pending_stat, pend[0])
+                self.pending_weight = numpy.delete(self.pending_weight,
+                                                   pend[0])
+                continue
+
+            left = numpy.searchsorted(self.stat, value, side='left')
+            right = numpy.searchsorted(self.stat, value, side='right')
+            present = numpy.flatnonzero(self.weight[left:right] > 0)
+            if not len(present):
+                raise ValueError('No background event with statistic %s'
+                                 % value)
+            pos = left + present[0]
+            weight = self.weight[pos]
+            self.weight[pos] = 0
+
+            node = pos + 1
+            while node < len(self.tree):
+                self.tree[node] -= weight
+                node += node & -node
+
+
+def coalesce_start_end(start, end):
+    """ Merge overlapping intervals given as arrays of start and end times
+
+    Parameters
+    ----------
+    start: numpy.ndarray
+        Array of the start of each interval
+    end: numpy.ndarray
+        Array of the end of each interval
+
+    Returns
+    -------
+    start: numpy.ndarray
+        Sorted array of the start of each disjoint interval
+    end: numpy.ndarray
+        Array of the end of each disjoint interval
+    """
+    start = numpy.array(start, dtype=numpy.float64, ndmin=1)
+    end = numpy.array(end, dtype=numpy.float64, ndmin=1)
+    if len(start) == 0:
+        return start, end
+
+    sort = start.argsort()
+    start = start[sort]
+    # The furthest any interval so far reaches
+    reach = numpy.maximum.accumulate(end[sort])
+
+    # A new interval begins wherever the start is past all previous ends
+    first = numpy.ones(len(start), dtype=bool)
+    first[1:] = start[1:] > reach[:-1]
+    first = numpy.flatnonzero(first)
+    last = numpy.append(first[1:] - 1, len(start) - 1)
+    return start[first], reach[last]
+
+
+def timeslide_durations(start1, start2, end1, end2, timeslide_offsets,
+                        max_evaluations=2**22):
     """ Find the coincident time for each timeslide.
 
     Find the coincident time for each timeslide, where the first time vector
     is slid to the right by the offset in the given timeslide_offsets vector.
 
+    The second detector's segments are coalesced and turned into a
+    cumulative live time function, so the live time of the second detector
+    inside each shifted first detector segment is a difference of two
+    interpolated values. All offsets are evaluated together, in blocks
+    which bound the memory used.
+
     Parameters
     ----------
     start1: numpy.ndarray
@@ -171,19 +379,151 @@ def timeslide_durations(start1, start2, end1, end2, timeslide_offsets):
         Array of the end of valid analyzed times for detector 2
     timseslide_offset: numpy.ndarray
         Array of offsets (in seconds) for each timeslide
+    max_evaluations: {4194304, int}, optional
+        The maximum number of (offset, segment) pairs to evaluate at once
 
     Returns
     --------
     durations: numpy.ndarray
         Array of coincident time for each timeslide in the offset array
     """
-    from . import veto
-    durations = []
-    seg2 = veto.start_end_to_segments(start2, end2)
-    for offset in timeslide_offsets:
-        seg1 = veto.start_end_to_segments(start1 + offset, end1 + offset)
-        durations.append(abs((seg1 & seg2).coalesce()))
-    return numpy.array(durations)
+    start1, end1 = coalesce_start_end(start1, end1)
+    start2, end2 = coalesce_start_end(start2, end2)
+    offsets = numpy.array(timeslide_offsets, dtype=numpy.float64, ndmin=1)
+    durations = numpy.zeros(len(offsets))
+    if len(start1) == 0 or len(start2) == 0:
+        return durations
+
+    # Cumulative live time of detector 2 before the start of each segment
+    length2 = end2 - start2
+    before2 = numpy.concatenate([[0], length2.cumsum()])
+
+    def live2(times):
+        # Live time of detector 2 before each of the given times
+        idx = numpy.searchsorted(start2, times, side='right')
+        prev = numpy.maximum(idx - 1, 0)
+        inside = numpy.clip(times - start2[prev], 0, length2[prev])
+        return numpy.where(idx > 0, before2[prev] + inside, 0)
+
+    step = max(1, max_evaluations // len(start1))
+    for i in range(0, len(offsets), step):
+        shift = offsets[i:i + step, None]
+        durations[i:i + step] = (live2(end1[None, :] + shift) -
+                                 live2(start1[None, :] + shift)).sum(axis=1)
+    return durations
+
+
+class TimeCoincidenceEngine(object):
+    """ Find time coincidences against a fixed set of second detector times
+
+    The second detector times are folded and sorted once, so the first
+    detector triggers can be streamed through in chunks without re-sorting
+    the second detector triggers each time. The triggers matching each
+    first detector trigger are gathered with vectorized index arithmetic,
+    and all timeslides are found in the same pass.
+    """
+    def __init__(self, t2, window, slide_step=0):
+        """
+        Parameters
+        ----------
+        t2 : numpy.ndarray
+            Array of trigger times from the second detector
+        window : float
+            Coincidence window maximum time difference, arbitrary units
+            (usually s)
+        slide_step : float (default 0)
+            If calculating background coincidences, the interval between
+            background slides, arbitrary units (usually s)
+        """
+        self.t2 = t2
+        self.window = window
+        self.slide_step = slide_step
+        fold2 = t2 % slide_step if slide_step else t2
+        self.sort2 = fold2.argsort()
+        self.fold2 = fold2[self.sort2]
+
+    def _num_before(self, values):
+        """ Number of folded second detector times smaller than each value
+
+        When sliding, the folded times are treated as if they were repeated
+        one slide interval before and after, so that windows which wrap
+        around the ends of the interval are handled. As the window is
+        smaller than the slide interval only these neighbours can match.
+        """
+        num = numpy.searchsorted(self.fold2, values)
+        if self.slide_step:
+            num += numpy.searchsorted(self.fold2, values + self.slide_step)
+            num += numpy.searchsorted(self.fold2, values - self.slide_step)
+        return num
+
+    def coincidences(self, t1):
+        """ Find the coincidences of the given first detector times
+
+        Parameters
+        ----------
+        t1 : numpy.ndarray
+            Array of trigger times from the first detector
+
+        Returns
+        -------
+        idx1 : numpy.ndarray
+            Array of indices into the t1 array for coincident triggers
+        idx2 : numpy.ndarray
+            Array of indices into the t2 array
+        slide : numpy.ndarray
+            Array of slide ids
+        """
+        fold1 = t1 % self.slide_step if self.slide_step else t1
+        sort1 = fold1.argsort()
+        fold1 = fold1[sort1]
+
+        if len(self.fold2) == 0:
+            left = right = numpy.zeros(len(fold1), dtype=numpy.int64)
+        else:
+            left = self._num_before(fold1 - self.window)
+            right = self._num_before(fold1 + self.window)
+
+        # Gather the positions left[i]:right[i] for every first detector
+        # trigger at once. Positions index the (virtually) repeated folded
+        # times, so are mapped back modulo the number of second detector
+        # triggers.
+        counts = right - left
+        idx1 = numpy.repeat(sort1, counts)
+        starts = counts.cumsum() - counts
+        pos = numpy.arange(counts.sum()) + numpy.repeat(left - starts, counts)
+        if self.slide_step and len(pos):
+            pos %= len(self.sort2)
+        idx2 = self.sort2[pos]
+
+        if self.slide_step:
+            diff = (t1[idx1] / self.slide_step -
+                    self.t2[idx2] / self.slide_step)
+            slide = numpy.rint(diff)
+        else:
+            slide = numpy.zeros(len(idx1))
+
+        return (idx1.astype(numpy.uint32), idx2.astype(numpy.uint32),
+                slide.astype(numpy.int32))
+
+    def iter_coincidences(self, t1, chunk_size):
+        """ Find coincidences of the first detector times in chunks
+
+        Parameters
+        ----------
+        t1 : numpy.ndarray
+            Array of trigger times from the first detector
+        chunk_size : int
+            The number of first detector triggers to process at once
+
+        Returns
+        -------
+        iterator of (idx1, idx2, slide) tuples
+            The coincidences of each chunk of first detector triggers, as
+            returned by `coincidences`, with idx1 indexing the full t1 array
+        """
+        for start in range(0, len(t1), chunk_size):
+            idx1, idx2, slide = self.coincidences(t1[start:start+chunk_size])
+            yield idx1 + numpy.uint32(start), idx2, slide
 
 
 def time_coincidence(t1, t2, window, slide_step=0):
@@ -210,41 +550,8 @@ def time_coincidence(t1, t2, window, slide_step=0):
     slide : numpy.ndarray
         Array of slide ids
     """
-    if slide_step:
-        fold1 = t1 % slide_step
-        fold2 = t2 % slide_step
-    else:
-        fold1 = t1
-        fold2 = t2
-
-    sort1 = fold1.argsort()
-    sort2 = fold2.argsort()
-    fold1 = fold1[sort1]
-    fold2 = fold2[sort2]
-
-    if slide_step:
-        # FIXME explain this
-        fold2 = numpy.concatenate([fold2 - slide_step, fold2, fold2 + slide_step])
-        sort2 = numpy.concatenate([sort2, sort2, sort2])
-
-    left = numpy.searchsorted(fold2, fold1 - window)
-    right = numpy.searchsorted(fold2, fold1 + window)
-
-    idx1 = numpy.repeat(sort1, right - left)
-    idx2 = [sort2[l:r] for l, r in zip(left, right)]
-
-    if len(idx2) > 0:
-        idx2 = numpy.concatenate(idx2)
-    else:
-        idx2 = numpy.array([], dtype=numpy.int64)
-
-    if slide_step:
-        diff = ((t1 / slide_step)[idx1] - (t2 / slide_step)[idx2])
-        slide = numpy.rint(diff)
-    else:
-        slide = numpy.zeros(len(idx1))
-
-    return idx1.astype(numpy.uint32), idx2.astype(numpy.uint32), slide.astype(numpy.int32)
+    return TimeCoincidenceEngine(t2, window,
+                                 slide_step=slide_step).coincidences(t1)
 
 
 def time_multi_coincidence(times, slide_step=0, slop=.003,
@@ -359,6 +666,114 @@ def time_multi_coincidence(times, slide_step=0, slop=.003,
     return ids, slide
 
 
+def multi_detector_coincidence(times, slide_step=0, slop=.003,
+                               pivot='H1', fixed='L1', all_combinations=True):
+    """ Find coincidences between any number of detectors
+
+    Coincidences are first found between the 'pivot' and 'fixed' detectors,
+    including timeslides, as in the two detector case. Each further
+    detector is then added in turn. Its sorted triggers are searched once
+    for those within the light travel window of the 'fixed' trigger, and
+    each candidate is kept only if it is within the light travel window of
+    every detector already in the coincidence. Pruning as each detector is
+    added keeps the number of candidate coincidences small.
+
+    Only the pivot detector is time shifted, so the further detectors are
+    matched in unshifted time against the fixed detector rather than
+    merged with the pivot in folded time, where triggers a whole number of
+    slide intervals apart would be brought together.
+
+    Parameters
+    ----------
+    times: dict of numpy.ndarrays
+        Dictionary keyed by ifo of single ifo trigger times
+    slide_step: float
+        Interval between time slides
+    slop: float
+        The amount of time to add to the TOF between detectors for coincidence
+    pivot: str
+        The ifo to which time shifts are applied in first stage coincidence
+    fixed: str
+        The other ifo used in first stage coincidence, subsequently used as a
+        time reference for additional ifos. All other ifos are not time shifted
+        relative to this ifo
+    all_combinations: bool
+        If True, every combination of triggers which is consistent between
+        all pairs of detectors is returned. Otherwise only the earliest
+        consistent trigger of each additional ifo is kept, giving at most
+        one coincidence for each pivot and fixed coincidence.
+
+    Returns
+    -------
+    ids: dict of arrays of int
+        Dictionary keyed by ifo with ids of trigger times forming
+        coincidences, so that ids[ifo][i] is the trigger of ifo in the i'th
+        coincidence
+    slide: array of int
+        Slide ids of coincident triggers in pivot ifo
+    """
+    def win(ifo1, ifo2):
+        d1 = Detector(ifo1)
+        d2 = Detector(ifo2)
+        return d1.light_travel_time_to_detector(d2) + slop
+
+    pivot_id, fix_id, slide = time_coincidence(times[pivot], times[fixed],
+                                               win(pivot, fixed),
+                                               slide_step=slide_step)
+    ids = {pivot: pivot_id, fixed: fix_id}
+
+    # Times of the triggers in each coinc, with the pivot ifo slid back to be
+    # coincident with the fixed ifo
+    ctimes = {fixed: times[fixed][fix_id],
+              pivot: times[pivot][pivot_id] - slide_step * slide}
+
+    dep_ifos = [ifo for ifo in times if ifo != fixed and ifo != pivot]
+    for ifo in dep_ifos:
+        tsort = times[ifo].argsort()
+        tsorted = times[ifo][tsort]
+
+        # Candidate triggers for each coinc, from the fixed ifo window
+        w = win(fixed, ifo)
+        left = numpy.searchsorted(tsorted, ctimes[fixed] - w)
+        right = numpy.searchsorted(tsorted, ctimes[fixed] + w)
+        counts = right - left
+        rows = numpy.repeat(numpy.arange(len(counts)), counts)
+        starts = counts.cumsum() - counts
+        cand = tsort[numpy.arange(counts.sum()) +
+                     numpy.repeat(left - starts, counts)]
+        ctime = times[ifo][cand]
+
+        # Keep only candidates consistent with every ifo already included
+        keep = numpy.ones(len(cand), dtype=bool)
+        for other in ctimes:
+            if other == fixed:
+                continue
+            w = win(other, ifo)
+            otime = ctimes[other][rows]
+            keep &= (ctime >= otime - w) & (ctime < otime + w)
+
+        rows = rows[keep]
+        cand = cand[keep]
+        ctime = ctime[keep]
+        if not all_combinations:
+            # Candidates of each coinc are in time order, so keep the first
+            first = numpy.unique(rows, return_index=True)[1]
+            if len(first) < len(rows):
+                logging.info('Keeping the earliest of several %s triggers '
+                             'in %s coincs', ifo, len(rows) - len(first))
+            rows = rows[first]
+            cand = cand[first]
+            ctime = ctime[first]
+        for other in ctimes:
+            ctimes[other] = ctimes[other][rows]
+            ids[other] = ids[other][rows]
+        slide = slide[rows]
+        ids[ifo] = cand
+        ctimes[ifo] = ctime
+
+    return ids, slide
+
+
 def cluster_coincs(stat, time1, time2, timeslide_id, slide, window, argmax=numpy.argmax):
     """Cluster coincident events for each timeslide separately, across
     templates, based on the ranking statistic
@@ -397,12 +812,8 @@ def cluster_coincs(stat, time1, time2, timeslide_id, slide, window, argmax=numpy
     else:
         time = 0.5 * (time2 + time1)
 
-    tslide = timeslide_id.astype(numpy.float128)
-    time = time.astype(numpy.float128)
-
-    span = (time.max() - time.min()) + window * 10
-    time = time + span * tslide
-    cidx = cluster_over_time(stat, time, window, argmax)
+    cidx = cluster_over_time(stat, time, window, argmax,
+                             timeslide_id=timeslide_id)
     return cidx
 
 
@@ -428,20 +839,16 @@ def cluster_coincs_multiifo(stat, time_coincs, timeslide_id, slide, window, argm
     cindex: numpy.ndarray
         The set of indices corresponding to the surviving coincidences
     """
-    time_coinc_zip = zip(*time_coincs)
-    if len(time_coinc_zip) == 0:
+    time_coincs = numpy.array(list(time_coincs), ndmin=2)
+    if time_coincs.size == 0:
         logging.info('No coincident triggers.')
         return numpy.array([])
 
-    time_avg_num = []
-    #find number of ifos and mean time over participating ifos for each coinc
-    for tc in time_coinc_zip:
-        time_avg_num.append(mean_if_greater_than_zero(tc))
-
-    time_avg, num_ifos = zip(*time_avg_num)
-
-    time_avg = numpy.array(time_avg)
-    num_ifos = numpy.array(num_ifos)
+    # find number of ifos and mean time over participating ifos for each
+    # coinc, as in mean_if_greater_than_zero
+    above_zero = time_coincs > 0
+    num_ifos = above_zero.sum(axis=0)
+    time_avg = numpy.where(above_zero, time_coincs, 0).sum(axis=0) / num_ifos
 
     # shift all but the pivot ifo by (num_ifos-1) * timeslide_id * slide
     # this leads to a mean coinc time located around pivot time
@@ -449,12 +856,8 @@ def cluster_coincs_multiifo(stat, time_coincs, timeslide_id, slide, window, argm
         nifos_minusone = (num_ifos - numpy.ones_like(num_ifos))
         time_avg = time_avg + (nifos_minusone * timeslide_id * slide)/num_ifos
 
-    tslide = timeslide_id.astype(numpy.float128)
-    time_avg = time_avg.astype(numpy.float128)
-
-    span = (time_avg.max() - time_avg.min()) + window * 10
-    time_avg = time_avg + span * tslide
-    cidx = cluster_over_time(stat, time_avg, window, argmax)
+    cidx = cluster_over_time(stat, time_avg, window, argmax,
+                             timeslide_id=timeslide_id)
 
     return cidx
 
@@ -482,7 +885,52 @@ def mean_if_greater_than_zero(vals):
     return vals[above_zero].mean(), above_zero.sum()
 
 
-def cluster_over_time(stat, time, window, argmax=numpy.argmax):
+def _cluster_over_time_sorted(stat, time, timeslide_id, window):
+    """ Return which events are the maximum of the window around them
+
+    The events must be sorted by timeslide id and then by time. This keeps
+    a monotonic deque of the candidate maxima as the window slides along,
+    so it takes linear time regardless of the number of events per window.
+    """
+    from weave import inline
+    from pycbc import WEAVE_FLAGS
+    num = len(time) # pylint:disable=unused-variable
+    keep = numpy.zeros(num, dtype=numpy.uint8)
+    queue = numpy.zeros(num, dtype=numpy.int64) # pylint:disable=unused-variable
+    window = float(window)
+    code = """
+        long head = 0, tail = 0;
+        long l = 0, r = 0;
+        for (long i = 0; i < num; i++) {
+            // Move the right edge of the window, adding new candidates.
+            // Any earlier candidate with a smaller statistic can never be
+            // the maximum again, so is dropped from the back of the queue.
+            if (r <= i) r = i;
+            while (r < num && timeslide_id[r] == timeslide_id[i] &&
+                   time[r] < time[i] + window) {
+                while (tail > head && stat[queue[tail - 1]] < stat[r])
+                    tail--;
+                queue[tail++] = r;
+                r++;
+            }
+            // Move the left edge of the window, dropping expired candidates
+            while (timeslide_id[l] != timeslide_id[i] ||
+                   time[l] < time[i] - window)
+                l++;
+            while (queue[head] < l)
+                head++;
+            // The front of the queue is the first maximum in the window
+            keep[i] = queue[head] == i;
+        }
+    """
+    inline(code, ['stat', 'time', 'timeslide_id', 'window', 'num', 'keep',
+                  'queue'],
+           extra_compile_args=[WEAVE_FLAGS])
+    return keep.astype(bool)
+
+
+def cluster_over_time(stat, time, window, argmax=numpy.argmax,
+                      timeslide_id=None):
     """Cluster generalized transient events over time via maximum stat over a
     symmetric sliding window
 
@@ -496,6 +944,9 @@ def cluster_over_time(stat, time, window, argmax=numpy.argmax):
         length to cluster over
     argmax: function
         the function used to calculate the maximum value
+    timeslide_id: numpy.ndarray, optional
+        If given, events are only clustered with events of the same
+        timeslide id
 
     Returns
     -------
@@ -504,6 +955,28 @@ def cluster_over_time(stat, time, window, argmax=numpy.argmax):
     """
     logging.info('Clustering events over %s s window', window)
 
+    if argmax is numpy.argmax and stat.dtype.names is None and window > 0:
+        if timeslide_id is None:
+            time_sorting = time.argsort()
+            tslide = numpy.zeros(len(time), dtype=numpy.int64)
+        else:
+            time_sorting = numpy.lexsort((time, timeslide_id))
+            tslide = timeslide_id[time_sorting].astype(numpy.int64)
+        keep = _cluster_over_time_sorted(
+                   stat[time_sorting].astype(numpy.float64),
+                   time[time_sorting].astype(numpy.float64),
+                   tslide, window)
+        cidx = time_sorting[keep]
+        logging.info('%d triggers remaining', len(cidx))
+        return cidx
+
+    if timeslide_id is not None:
+        # Separate the timeslides by more than the window
+        tslide = timeslide_id.astype(numpy.float128)
+        time = time.astype(numpy.float128)
+        span = (time.max() - time.min()) + window * 10
+        time = time + span * tslide
+
     indices = []
     time_sorting = time.argsort()
     stat = stat[time_sorting]
@@ -29,7 +29,7 @@ import numpy, copy, os.path
 
 from pycbc import WEAVE_FLAGS
 from pycbc.types import Array
-from pycbc.scheme import schemed
+from pycbc.scheme import schemed, mgr, CPUScheme
 from pycbc.detector import Detector
 
 from . import coinc, ranking
@@ -86,6 +86,35 @@ class ThresholdCluster(object):
         real_cls = _threshold_cluster_factory(*args, **kwargs)
         return real_cls(*args, **kwargs) # pylint:disable=not-callable
 
+@schemed("pycbc.events.threshold_")
+def _findchirp_threshold_cluster_factory(series):
+    err_msg = "This class is a stub that should be overridden using the "
+    err_msg += "scheme. You shouldn't be seeing this error!"
+    raise ValueError(err_msg)
+
+
+class FindchirpThresholdCluster(object):
+    """Create an engine that thresholds and clusters using the findchirp
+    algorithm in a single pass over the series
+
+    This gives the same triggers as calling `threshold` followed by
+    `cluster_reduce`, without the intermediate copies and passes over the
+    points above threshold.
+
+    Parameters
+    -----------
+    series : complex64
+      Input pycbc.types.Array (or subclass); it will be searched for
+      points above threshold that are then clustered
+    """
+    def __new__(cls, *args, **kwargs):
+        # The fused engine only exists for the CPU, so other schemes keep
+        # thresholding and then clustering with cluster_reduce
+        if not isinstance(mgr.state, CPUScheme):
+            return _ThresholdThenCluster(*args, **kwargs)
+        real_cls = _findchirp_threshold_cluster_factory(*args, **kwargs)
+        return real_cls(*args, **kwargs) # pylint:disable=not-callable
+
 
 # The class below should serve as the parent for all schemed classes.
 # The intention is that this class serves simply as the location for
@@ -119,6 +148,20 @@ class _BaseThresholdCluster(object):
         pass
 
 
+class _ThresholdThenCluster(_BaseThresholdCluster):
+    """Findchirp threshold and cluster engine made of separate calls to
+    `threshold` and `cluster_reduce`, for schemes without a fused engine
+    """
+    def __init__(self, series):
+        self.series = series
+
+    def threshold_and_cluster(self, value, window):
+        idx, snrv = threshold(self.series, value)
+        if len(idx) > 0:
+            idx, snrv = cluster_reduce(idx, snrv, window)
+        return snrv, idx
+
+
 def findchirp_cluster_over_window(times, values, window_length):
     """ Reduce the events by clustering over a window using
     the FindChirp clustering algorithm
@@ -189,6 +232,182 @@ def cluster_reduce(idx, snr, window_size):
     return idx.take(ind), snr.take(ind)
 
 
+def chisq_threshold_mask(events, value, delta=0):
+    """ Return a mask of the events that pass a reduced chisq threshold
+
+    Parameters
+    ----------
+    events : numpy.ndarray
+        Structured array of events with 'snr', 'chisq' and 'chisq_dof'
+        columns, where 'chisq_dof' is the 2p-2 degrees of freedom.
+    value : float
+        Events with a reduced chisq above this value are rejected.
+    delta : {0, float}, optional
+        The chisq is reduced by chisq_dof / 2 + 1 + delta * |snr|^2.
+
+    Returns
+    -------
+    keep : numpy.ndarray
+        Boolean array which is True for the events to keep.
+    """
+    snrsq = events['snr'].real ** 2 + events['snr'].imag ** 2
+    xi = events['chisq'] / (events['chisq_dof'] / 2 + 1 + delta * snrsq)
+    return ~(xi > value)
+
+
+def newsnr_threshold_mask(events, threshold):
+    """ Return a mask of the events with newsnr at or above a threshold
+
+    Parameters
+    ----------
+    events : numpy.ndarray
+        Structured array of events with 'snr', 'chisq' and 'chisq_dof'
+        columns.
+    threshold : float
+        Events with a newsnr smaller than this are rejected.
+
+    Returns
+    -------
+    keep : numpy.ndarray
+        Boolean array which is True for the events to keep.
+    """
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        rchisq = events['chisq'] / events['chisq_dof']
+    return ~(ranking.newsnr(abs(events['snr']), rchisq) < threshold)
+
+
+class TriggerStore(object):
+    """Growable columnar store for the triggers of an EventManager
+
+    Triggers are held column by column in typed arrays which grow
+    geometrically, so appending is amortized constant time per trigger.
+    Once the active chunk holds `chunk_size` triggers it is sealed and
+    either kept in memory or, if a `spill` callable was given, handed to
+    it and dropped. The full set of triggers is only assembled into a
+    single structured array when `to_array` is called.
+
+    Parameters
+    ----------
+    dtype : numpy.dtype
+        The structured dtype of the triggers.
+    chunk_size : {65536, int}, optional
+        The maximum number of triggers held in the active chunk.
+    spill : {None, callable}, optional
+        If given, this is called with each sealed chunk, as a structured
+        array, instead of keeping the chunk in memory.
+    """
+    def __init__(self, dtype, chunk_size=65536, spill=None):
+        if chunk_size < 1:
+            raise ValueError('The chunk size must be a positive integer')
+        self.dtype = numpy.dtype(dtype)
+        self.chunk_size = int(chunk_size)
+        self.spill = spill
+        self.chunks = []
+        self.nspilled = 0
+        self._new_chunk()
+
+    def _new_chunk(self, capacity=1024):
+        capacity = min(capacity, self.chunk_size)
+        self.columns = {n: numpy.empty(capacity, dtype=self.dtype[n])
+                        for n in self.dtype.names}
+        self.capacity = capacity
+        self.size = 0
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        capacity = min(capacity, self.chunk_size)
+        for n in self.dtype.names:
+            col = numpy.empty(capacity, dtype=self.dtype[n])
+            col[:self.size] = self.columns[n][:self.size]
+            self.columns[n] = col
+        self.capacity = capacity
+
+    def _seal(self):
+        chunk = numpy.empty(self.size, dtype=self.dtype)
+        for n in self.dtype.names:
+            chunk[n] = self.columns[n][:self.size]
+        if self.spill is not None:
+            self.spill(chunk)
+            self.nspilled += len(chunk)
+        else:
+            self.chunks.append(chunk)
+        self._new_chunk(self.capacity)
+
+    def __len__(self):
+        """ The number of triggers held in memory """
+        return sum(len(c) for c in self.chunks) + self.size
+
+    def append(self, events):
+        """ Append a structured array of triggers to the store
+        """
+        i = 0
+        while i < len(events):
+            num = min(len(events) - i, self.chunk_size - self.size)
+            if self.size + num > self.capacity:
+                self._grow(self.size + num)
+            for n in self.dtype.names:
+                self.columns[n][self.size:self.size + num] = \
+                    events[n][i:i + num]
+            self.size += num
+            i += num
+            if self.size == self.chunk_size:
+                self._seal()
+
+    def flush(self):
+        """ Seal the active chunk, passing it to `spill` if one was given
+        """
+        if self.size:
+            self._seal()
+
+    def to_array(self):
+        """ Return all triggers held in memory as one structured array
+
+        The store is emptied, and each sealed chunk is released as soon as
+        it has been copied, so the peak memory use is close to the size of
+        the returned array.
+        """
+        events = numpy.empty(len(self), dtype=self.dtype)
+        i = 0
+        while self.chunks:
+            chunk = self.chunks.pop(0)
+            events[i:i + len(chunk)] = chunk
+            i += len(chunk)
+        for n in self.dtype.names:
+            events[n][i:] = self.columns[n][:self.size]
+        self._new_chunk()
+        return events
+
+
+class _HDFTriggerWriter(object):
+    """ Write datasets under a common prefix, appending to existing ones """
+    def __init__(self, name, prefix, append=False):
+        import h5py
+        self.f = h5py.File(name, 'w')
+        self.prefix = prefix
+        self.append = append
+
+    def __setitem__(self, name, data):
+        col = self.prefix + '/' + name
+        if not self.append:
+            self.f.create_dataset(col, data=data,
+                                  compression='gzip',
+                                  compression_opts=9,
+                                  shuffle=True)
+        elif col not in self.f:
+            self.f.create_dataset(col, data=data, maxshape=(None,),
+                                  chunks=True,
+                                  compression='gzip',
+                                  compression_opts=9,
+                                  shuffle=True)
+        else:
+            dset = self.f[col]
+            start = len(dset)
+            dset.resize((start + len(data),))
+            dset[start:] = data
+
+
 class EventManager(object):
     def __init__(self, opt, column, column_types, **kwds):
         self.opt = opt
@@ -199,11 +418,14 @@ class EventManager(object):
             self.event_dtype.append((col, coltype))
 
         self.events = numpy.array([], dtype=self.event_dtype)
-        self.accumulate = [self.events]
+        self.trigger_store = TriggerStore(self.event_dtype)
         self.template_params = []
         self.template_index = -1
         self.template_events = numpy.array([], dtype=self.event_dtype)
         self.write_performance = False
+        self.spill_writer = None
+        self.template_filters = []
+        self.filter_counts = {}
 
     @classmethod
     def from_multi_ifo_interface(cls, opt, ifo, column, column_types, **kwds):
@@ -219,14 +441,86 @@ class EventManager(object):
                 setattr(opt, arg, getattr(opt, arg)[ifo])
         return cls(opt, column, column_types, **kwds)
 
+    @property
+    def template_events(self):
+        """ The events of the current template, as one structured array
+        """
+        if len(self._template_events) > 1:
+            self._template_events = [numpy.concatenate(self._template_events)]
+        return self._template_events[0]
+
+    @template_events.setter
+    def template_events(self, events):
+        self._template_events = [events]
+
+    def enable_hdf_spill(self, outname, chunk_size=65536):
+        """ Write triggers to the output file as they are accumulated
+
+        Every time `chunk_size` triggers have been finalized they are
+        written to `outname` and released from memory. The remaining
+        triggers and the search metadata are written by `write_events`,
+        which must be called with the same file name. Triggers are written
+        in the order their templates were filtered, so this cannot be
+        combined with methods that act on the full set of `events`.
+
+        Parameters
+        ----------
+        outname : str
+            The HDF5 file to write the triggers to.
+        chunk_size : {65536, int}, optional
+            The number of triggers to hold in memory before writing.
+        """
+        if '.hdf' not in outname:
+            raise ValueError('Cannot write to this format')
+        self.make_output_dir(outname)
+        self.spill_writer = _HDFTriggerWriter(outname,
+                                              self.opt.channel_name[0:2],
+                                              append=True)
+        self.trigger_store = TriggerStore(self.event_dtype,
+                                          chunk_size=chunk_size,
+                                          spill=self._spill_events)
+
+    def _spill_events(self, events):
+        self.write_trigger_columns(self.spill_writer, events)
+
+    @property
+    def num_spilled(self):
+        """ The number of triggers already written to the output file """
+        return self.trigger_store.nspilled
+
+    def add_template_filter(self, name, func, *args, **kwds):
+        """ Add a filter to apply to the events of each template
+
+        The filters are applied in the order they were added when the
+        events of a template are finalized, so rejected events never reach
+        the trigger store.
+
+        Parameters
+        ----------
+        name : str
+            A name for the filter, used to key `filter_counts`.
+        func : function
+            Called as func(events, *args, **kwds) with the structured array
+            of events, and returning a boolean array of the events to keep,
+            e.g. `chisq_threshold_mask`.
+        """
+        self.template_filters.append((name, func, args, kwds))
+        self.filter_counts[name] = 0
+
+    def apply_template_filters(self, events):
+        """ Return the events which pass all of the template filters
+        """
+        for name, func, args, kwds in self.template_filters:
+            if not len(events):
+                break
+            keep = func(events, *args, **kwds)
+            self.filter_counts[name] += len(events) - keep.sum()
+            events = events[keep]
+        return events
+
     def chisq_threshold(self, value, num_bins, delta=0):
-        remove = []
-        for i, event in enumerate(self.events):
-            xi = event['chisq'] / (event['chisq_dof'] / 2 + 1 +
-                                   delta * event['snr'].conj() * event['snr'])
-            if xi > value:
-                remove.append(i)
-        self.events = numpy.delete(self.events, remove)
+        self.events = self.events[chisq_threshold_mask(self.events, value,
+                                                       delta=delta)]
 
     def newsnr_threshold(self, threshold):
         """ Remove events with newsnr smaller than given threshold
@@ -235,10 +529,8 @@ class EventManager(object):
             raise RuntimeError('Chi-square test must be enabled in order to '
                                'use newsnr threshold')
 
-        remove = [i for i, e in enumerate(self.events) if
-                  ranking.newsnr(abs(e['snr']), e['chisq'] / e['chisq_dof'])
-                  < threshold]
-        self.events = numpy.delete(self.events, remove)
+        self.events = self.events[newsnr_threshold_mask(self.events,
+                                                        threshold)]
 
     def keep_near_injection(self, window, injections):
         from pycbc.events.veto import indices_within_times
@@ -316,7 +608,7 @@ class EventManager(object):
                     new_events[c] = v.numpy()
                 else:
                     new_events[c] = v
-        self.template_events = numpy.append(self.template_events, new_events)
+        self._template_events.append(new_events)
 
     def cluster_template_events(self, tcolumn, column, window_size):
         """ Cluster the internal events over the named column
@@ -337,11 +629,16 @@ class EventManager(object):
         self.template_params[-1].update(kwds)
 
     def finalize_template_events(self):
-        self.accumulate.append(self.template_events)
+        events = self.template_events
+        if self.template_filters:
+            events = self.apply_template_filters(events)
+        self.trigger_store.append(events)
         self.template_events = numpy.array([], dtype=self.event_dtype)
 
     def finalize_events(self):
-        self.events = numpy.concatenate(self.accumulate)
+        if self.spill_writer is not None:
+            self.trigger_store.flush()
+        self.events = self.trigger_store.to_array()
 
     def make_output_dir(self, outname):
         path = os.path.dirname(outname)
@@ -371,92 +668,100 @@ class EventManager(object):
         else:
             raise ValueError('Cannot write to this format')
 
-    def write_to_hdf(self, outname):
-        class fw(object):
-            def __init__(self, name, prefix):
-                import h5py
-                self.f = h5py.File(name, 'w')
-                self.prefix = prefix
+    def write_trigger_columns(self, f, events):
+        """ Write the output columns of a set of events
 
-            def __setitem__(self, name, data):
-                col = self.prefix + '/' + name
-                self.f.create_dataset(col, data=data,
-                                      compression='gzip',
-                                      compression_opts=9,
-                                      shuffle=True)
+        Parameters
+        ----------
+        f : _HDFTriggerWriter
+            The writer to set the datasets of.
+        events : numpy.ndarray
+            The structured array of events to write.
+        """
+        if not len(events):
+            return
 
-        self.events.sort(order='template_id')
         th = numpy.array([p['tmplt'].template_hash for p in
                           self.template_params])
-        tid = self.events['template_id']
-        f = fw(outname, self.opt.channel_name[0:2])
-
-        if len(self.events):
-            f['snr'] = abs(self.events['snr'])
-            try:
-                # Precessing
-                f['u_vals'] = self.events['u_vals']
-                f['coa_phase'] = self.events['coa_phase']
-                f['hplus_cross_corr'] = self.events['hplus_cross_corr']
-            except Exception:
-                # Not precessing
-                f['coa_phase'] = numpy.angle(self.events['snr'])
-            f['chisq'] = self.events['chisq']
-            f['bank_chisq'] = self.events['bank_chisq']
-            f['bank_chisq_dof'] = self.events['bank_chisq_dof']
-            f['cont_chisq'] = self.events['cont_chisq']
-            f['end_time'] = self.events['time_index'] / \
-                              float(self.opt.sample_rate) \
-                            + self.opt.gps_start_time
-            try:
-                # Precessing
-                template_sigmasq_plus = numpy.array(
-                             [t['sigmasq_plus'] for t in self.template_params],
-                                                    dtype=numpy.float32)
-                f['sigmasq_plus'] = template_sigmasq_plus[tid]
-                template_sigmasq_cross = numpy.array(
-                            [t['sigmasq_cross'] for t in self.template_params],
-                                                     dtype=numpy.float32)
-                f['sigmasq_cross'] = template_sigmasq_cross[tid]
-                # FIXME: I want to put something here, but I haven't yet
-                #        figured out what it should be. I think we would also
-                #        need information from the plus and cross correlation
-                #        (both real and imaginary(?)) to get this.
-                f['sigmasq'] = template_sigmasq_plus[tid]
-            except Exception:
-                # Not precessing
-                template_sigmasq = numpy.array(
-                                  [t['sigmasq'] for t in self.template_params],
-                                               dtype=numpy.float32)
-                f['sigmasq'] = template_sigmasq[tid]
-
-            template_durations = [p['tmplt'].template_duration for p in
-                                  self.template_params]
-            f['template_duration'] = numpy.array(template_durations,
-                                                 dtype=numpy.float32)[tid]
-
-            # FIXME: Can we get this value from the autochisq instance?
-            cont_dof = self.opt.autochi_number_points
-            if self.opt.autochi_onesided is None:
-                cont_dof = cont_dof * 2
-            if self.opt.autochi_two_phase:
-                cont_dof = cont_dof * 2
-            if self.opt.autochi_max_valued_dof:
-                cont_dof = self.opt.autochi_max_valued_dof
-            f['cont_chisq_dof'] = numpy.repeat(cont_dof, len(self.events))
-
-            if 'chisq_dof' in self.events.dtype.names:
-                f['chisq_dof'] = self.events['chisq_dof'] / 2 + 1
-            else:
-                f['chisq_dof'] = numpy.zeros(len(self.events))
+        tid = events['template_id']
+        f['snr'] = abs(events['snr'])
+        try:
+            # Precessing
+            f['u_vals'] = events['u_vals']
+            f['coa_phase'] = events['coa_phase']
+            f['hplus_cross_corr'] = events['hplus_cross_corr']
+        except Exception:
+            # Not precessing
+            f['coa_phase'] = numpy.angle(events['snr'])
+        f['chisq'] = events['chisq']
+        f['bank_chisq'] = events['bank_chisq']
+        f['bank_chisq_dof'] = events['bank_chisq_dof']
+        f['cont_chisq'] = events['cont_chisq']
+        f['end_time'] = events['time_index'] / \
+                          float(self.opt.sample_rate) \
+                        + self.opt.gps_start_time
+        try:
+            # Precessing
+            template_sigmasq_plus = numpy.array(
+                         [t['sigmasq_plus'] for t in self.template_params],
+                                                dtype=numpy.float32)
+            f['sigmasq_plus'] = template_sigmasq_plus[tid]
+            template_sigmasq_cross = numpy.array(
+                        [t['sigmasq_cross'] for t in self.template_params],
+                                                 dtype=numpy.float32)
+            f['sigmasq_cross'] = template_sigmasq_cross[tid]
+            # FIXME: I want to put something here, but I haven't yet
+            #        figured out what it should be. I think we would also
+            #        need information from the plus and cross correlation
+            #        (both real and imaginary(?)) to get this.
+            f['sigmasq'] = template_sigmasq_plus[tid]
+        except Exception:
+            # Not precessing
+            template_sigmasq = numpy.array(
+                              [t['sigmasq'] for t in self.template_params],
+                                           dtype=numpy.float32)
+            f['sigmasq'] = template_sigmasq[tid]
+
+        template_durations = [p['tmplt'].template_duration for p in
+                              self.template_params]
+        f['template_duration'] = numpy.array(template_durations,
+                                             dtype=numpy.float32)[tid]
+
+        # FIXME: Can we get this value from the autochisq instance?
+        cont_dof = self.opt.autochi_number_points
+        if self.opt.autochi_onesided is None:
+            cont_dof = cont_dof * 2
+        if self.opt.autochi_two_phase:
+            cont_dof = cont_dof * 2
+        if self.opt.autochi_max_valued_dof:
+            cont_dof = self.opt.autochi_max_valued_dof
+        f['cont_chisq_dof'] = numpy.repeat(cont_dof, len(events))
+
+        if 'chisq_dof' in events.dtype.names:
+            f['chisq_dof'] = events['chisq_dof'] / 2 + 1
+        else:
+            f['chisq_dof'] = numpy.zeros(len(events))
 
-            f['template_hash'] = th[tid]
+        f['template_hash'] = th[tid]
 
-            if 'sg_chisq' in self.events.dtype.names:
-                f['sg_chisq'] = self.events['sg_chisq']
+        if 'sg_chisq' in events.dtype.names:
+            f['sg_chisq'] = events['sg_chisq']
 
-            if self.opt.psdvar_short_segment is not None:
-                f['psd_var_val'] = self.events['psd_var_val']
+        if self.opt.psdvar_short_segment is not None:
+            f['psd_var_val'] = events['psd_var_val']
+
+    def write_to_hdf(self, outname):
+        if self.spill_writer is not None:
+            f = self.spill_writer
+            if os.path.abspath(f.f.filename) != os.path.abspath(outname):
+                raise ValueError('Triggers have already been written to %s'
+                                 % f.f.filename)
+            self.write_trigger_columns(f, self.events)
+            f.append = False
+        else:
+            self.events.sort(order='template_id')
+            f = _HDFTriggerWriter(outname, self.opt.channel_name[0:2])
+            self.write_trigger_columns(f, self.events)
 
         if self.opt.trig_start_time:
             f['search/start_time'] = numpy.array([self.opt.trig_start_time])
@@ -512,6 +817,10 @@ class EventManager(object):
                     f['gating/' + gate_type + '/pad'] = \
                             numpy.array([g[2] for g in gating_info[gate_type]])
 
+        if self.spill_writer is not None:
+            f.f.close()
+            self.spill_writer = None
+
 
 class EventManagerMultiDetBase(EventManager):
     def __init__(self, opt, ifos, column, column_types, psd=None, **kwargs):
@@ -1025,5 +1334,7 @@ class EventManagerMultiDet(EventManagerMultiDetBase):
 
 __all__ = ['threshold_and_cluster', 'findchirp_cluster_over_window',
            'threshold', 'cluster_reduce', 'ThresholdCluster',
+           'FindchirpThresholdCluster',
            'threshold_real_numpy', 'threshold_only',
+           'chisq_threshold_mask', 'newsnr_threshold_mask', 'TriggerStore',
            'EventManager', 'EventManagerMultiDet', 'EventManagerCoherent']
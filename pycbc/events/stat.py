@@ -28,6 +28,89 @@ import numpy
 from . import ranking
 
 
+class BinnedLookup(object):
+
+    """ Fast lookup of values in an N-dimensional histogram
+
+    The histogram is stored as one contiguous array and bins are located
+    arithmetically on axes whose edges are (close to) uniformly spaced, with
+    a single comparison against the stored edges to correct for rounding.
+    Other axes fall back to a binary search. Looking up many points is then
+    a vectorized gather from the flattened histogram. Points outside the
+    edges are assigned to the nearest bin.
+    """
+    def __init__(self, hist, edges):
+        """
+        Parameters
+        ----------
+        hist: numpy.ndarray
+            N-dimensional array of histogram values
+        edges: list of numpy.ndarrays
+            The bin edges of each of the N axes
+        """
+        hist = numpy.ascontiguousarray(hist)
+        if len(edges) != hist.ndim:
+            raise ValueError('Need bin edges for each of the %s axes'
+                             % hist.ndim)
+        self.values = hist.ravel()
+        self.strides = numpy.cumprod((hist.shape + (1,))[:0:-1])[::-1]
+        self.edges = []
+        self.uniform = []
+        for axis, e in enumerate(edges):
+            e = numpy.array(e, dtype=numpy.float64)
+            if len(e) != hist.shape[axis] + 1:
+                raise ValueError('Axis %s has %s bins but %s edges'
+                                 % (axis, hist.shape[axis], len(e)))
+            self.edges.append(e)
+            # The arithmetic guess is off by at most one bin if no edge is
+            # more than a quarter bin from its uniform position
+            width = (e[-1] - e[0]) / (len(e) - 1)
+            expected = e[0] + width * numpy.arange(len(e))
+            self.uniform.append(bool(width > 0) and
+                                bool(abs(e - expected).max() < 0.25 * width))
+
+    def bin_index(self, axis, x):
+        """ Return the bin of each value on the given axis
+
+        This gives the same result as `numpy.searchsorted(edges, x) - 1`
+        clipped to the valid bins.
+        """
+        e = self.edges[axis]
+        nbins = len(e) - 1
+        x = numpy.array(x, dtype=numpy.float64, ndmin=1)
+        if not self.uniform[axis]:
+            idx = numpy.searchsorted(e, x) - 1
+            return numpy.clip(idx, 0, nbins - 1)
+
+        width = (e[-1] - e[0]) / nbins
+        guess = numpy.ceil((x - e[0]) / width) - 1
+        guess[numpy.isnan(guess)] = nbins - 1
+        idx = numpy.clip(guess, 0, nbins - 1).astype(numpy.int64)
+
+        # Correct any rounding error in the guess
+        idx -= (idx > 0) & (x <= e[idx])
+        idx += (idx < nbins - 1) & (x > e[idx + 1])
+        return idx
+
+    def __call__(self, *coords):
+        """ Return the histogram value at each point
+
+        Parameters
+        ----------
+        coords: numpy.ndarrays
+            One array of coordinates for each axis
+
+        Returns
+        -------
+        numpy.ndarray
+            The value of the bin each point falls in
+        """
+        flat = self.bin_index(0, coords[0]) * self.strides[0]
+        for axis in range(1, len(coords)):
+            flat += self.bin_index(axis, coords[axis]) * self.strides[axis]
+        return self.values.take(flat)
+
+
 class Stat(object):
 
     """ Base class which should be extended to provide a coincident statistic"""
@@ -224,6 +307,11 @@ class PhaseTDStatistic(NewSNRStatistic):
         self.sbins = self.files['phasetd_newsnr']['sbins'][:]
         self.rbins = self.files['phasetd_newsnr']['rbins'][:]
 
+        # Lookup table of the histogram, built once for all coincs
+        self.lookup = BinnedLookup(self.hist, [self.tbins, self.pbins,
+                                               self.sbins, self.sbins,
+                                               self.rbins])
+
         self.single_dtype = [('snglstat', numpy.float32),
                     ('coa_phase', numpy.float32),
                     ('end_time', numpy.float64),
@@ -274,27 +362,7 @@ class PhaseTDStatistic(NewSNRStatistic):
         snr1[rd > 1] = sn0[rd > 1]
         rd[rd > 1] = 1. / rd[rd > 1]
 
-        # Find which bin each coinc falls into
-        tv = numpy.searchsorted(self.tbins, td) - 1
-        pv = numpy.searchsorted(self.pbins, pd) - 1
-        s0v = numpy.searchsorted(self.sbins, snr0) - 1
-        s1v = numpy.searchsorted(self.sbins, snr1) - 1
-        rv = numpy.searchsorted(self.rbins, rd) - 1
-
-        # Enforce that points fits into the bin boundaries: if a point lies
-        # outside the boundaries it is pushed back to the nearest bin.
-        tv[tv < 0] = 0
-        tv[tv >= len(self.tbins) - 1] = len(self.tbins) - 2
-        pv[pv < 0] = 0
-        pv[pv >= len(self.pbins) - 1] = len(self.pbins) - 2
-        s0v[s0v < 0] = 0
-        s0v[s0v >= len(self.sbins) - 1] = len(self.sbins) - 2
-        s1v[s1v < 0] = 0
-        s1v[s1v >= len(self.sbins) - 1] = len(self.sbins) - 2
-        rv[rv < 0] = 0
-        rv[rv >= len(self.rbins) - 1] = len(self.rbins) - 2
-
-        return self.hist[tv, pv, s0v, s1v, rv]
+        return self.lookup(td, pd, snr0, snr1, rd)
 
     def coinc(self, s0, s1, slide, step):
         """
@@ -334,6 +402,71 @@ class PhaseTDSGStatistic(PhaseTDStatistic):
         self.get_newsnr = ranking.get_newsnr_sgveto
 
 
+def _read_only_column(dset, memmap):
+    """Read a 1-d HDF dataset, mapping it from disk if memmap is True and
+    the dataset is stored as a single uncompressed block
+    """
+    offset = dset.id.get_offset() if dset.chunks is None else None
+    if memmap and offset is not None:
+        data = numpy.memmap(dset.file.filename, mode='r', dtype=dset.dtype,
+                            shape=dset.shape, offset=offset)
+    else:
+        data = dset[:]
+    data.flags.writeable = False
+    return data
+
+
+class TemplateFitTable(object):
+
+    """Dense table of single-ifo noise fit coefficients indexed by template id
+
+    The coefficients are looked up for many triggers at once by indexing the
+    alpha, rate, log_alpha and log_rate arrays with the template ids. All
+    arrays are read-only, so a table built before forking worker processes is
+    shared between them rather than copied.
+    """
+
+    def __init__(self, coeff_file, memmap=True):
+        """Read the fit coefficients of one ifo
+
+        Parameters
+        ----------
+        coeff_file: h5py.File
+            Fit file containing the 'template_id', 'fit_coeff' and
+            'count_above_thresh' datasets and the 'stat_threshold' attribute.
+        memmap: {True, bool}
+            Map the coefficients from the file rather than reading them into
+            memory. This is only done when the template ids of the file are
+            already 0 ... N-1 in order and the datasets are stored contiguously
+            without compression.
+        """
+        template_id = coeff_file['template_id'][:]
+        dense = (template_id == numpy.arange(len(template_id))).all()
+        alphas = _read_only_column(coeff_file['fit_coeff'], memmap and dense)
+        rates = _read_only_column(coeff_file['count_above_thresh'],
+                                  memmap and dense)
+        if not dense:
+            # the template_ids and fit coeffs are stored in an arbitrary order
+            # scatter them into arrays indexed by template_id for easier recall
+            ntemplates = template_id.max() + 1 if len(template_id) else 0
+            self.alpha = numpy.zeros(ntemplates, dtype=alphas.dtype)
+            self.rate = numpy.zeros(ntemplates, dtype=rates.dtype)
+            self.alpha[:] = numpy.nan
+            self.rate[:] = numpy.nan
+            self.alpha[template_id] = alphas
+            self.rate[template_id] = rates
+        else:
+            self.alpha, self.rate = alphas, rates
+        self.log_alpha = numpy.log(self.alpha)
+        self.log_rate = numpy.log(self.rate)
+        self.thresh = coeff_file.attrs['stat_threshold']
+        for values in [self.alpha, self.rate, self.log_alpha, self.log_rate]:
+            values.flags.writeable = False
+
+    def __getitem__(self, name):
+        return getattr(self, name)
+
+
 class ExpFitStatistic(NewSNRStatistic):
 
     """Detection statistic using an exponential falloff noise model.
@@ -362,21 +495,15 @@ class ExpFitStatistic(NewSNRStatistic):
         self.get_newsnr = ranking.get_newsnr
 
     def assign_fits(self, ifo):
-        coeff_file = self.files[ifo+'-fit_coeffs']
-        template_id = coeff_file['template_id'][:]
-        alphas = coeff_file['fit_coeff'][:]
-        rates = coeff_file['count_above_thresh'][:]
-        # the template_ids and fit coeffs are stored in an arbitrary order
-        # create new arrays in template_id order for easier recall
-        tid_sort = numpy.argsort(template_id)
-        return {'alpha':alphas[tid_sort], 'rate':rates[tid_sort],
-                'thresh':coeff_file.attrs['stat_threshold']}
+        """Return the template-indexed fit coefficient table for an ifo"""
+        return TemplateFitTable(self.files[ifo+'-fit_coeffs'])
 
     def get_ref_vals(self, ifo):
-        self.alphamax[ifo] = self.fits_by_tid[ifo]['alpha'].max()
+        # templates missing from a sparse fit file have NaN coefficients
+        self.alphamax[ifo] = numpy.nanmax(self.fits_by_tid[ifo]['alpha'])
 
-    def find_fits(self, trigs):
-        """Get fit coeffs for a specific ifo and template id(s)"""
+    def fit_table(self, trigs):
+        """Get the fit coefficient table and template id(s) of triggers"""
         try:
             tnum = trigs.template_num  # exists if accessed via coinc_findtrigs
             ifo = trigs.ifo
@@ -385,12 +512,14 @@ class ExpFitStatistic(NewSNRStatistic):
             # Should only be one ifo fit file provided
             assert len(self.ifos) == 1
             ifo = self.ifos[0]
-        # fits_by_tid is a dictionary of dictionaries of arrays
+        return self.fits_by_tid[ifo], tnum
+
+    def find_fits(self, trigs):
+        """Get fit coeffs for a specific ifo and template id(s)"""
+        # fits_by_tid is a dictionary of tables of arrays
         # indexed by ifo / coefficient name / template_id
-        alphai = self.fits_by_tid[ifo]['alpha'][tnum]
-        ratei = self.fits_by_tid[ifo]['rate'][tnum]
-        thresh = self.fits_by_tid[ifo]['thresh']
-        return alphai, ratei, thresh
+        table, tnum = self.fit_table(trigs)
+        return table.alpha[tnum], table.rate[tnum], table.thresh
 
     def lognoiserate(self, trigs):
         """
@@ -399,14 +528,14 @@ class ExpFitStatistic(NewSNRStatistic):
         Read in single trigger information, make the newsnr statistic
         and rescale by the fitted coefficients alpha and rate
         """
-        alphai, ratei, thresh = self.find_fits(trigs)
+        table, tnum = self.fit_table(trigs)
         newsnr = self.get_newsnr(trigs)
-        # alphai is constant of proportionality between single-ifo newsnr and
+        # alpha is constant of proportionality between single-ifo newsnr and
         #  negative log noise likelihood in given template
-        # ratei is rate of trigs in given template compared to average
+        # rate is rate of trigs in given template compared to average
         # thresh is stat threshold used in given ifo
-        lognoisel = - alphai * (newsnr - thresh) + numpy.log(alphai) + \
-                      numpy.log(ratei)
+        lognoisel = - table.alpha[tnum] * (newsnr - table.thresh) + \
+                      table.log_alpha[tnum] + table.log_rate[tnum]
         return numpy.array(lognoisel, ndmin=1, dtype=numpy.float32)
 
     def single(self, trigs):
@@ -446,7 +575,7 @@ class ExpFitCombinedSNR(ExpFitStatistic):
 
     def single(self, trigs):
         logr_n = self.lognoiserate(trigs)
-        _, _, thresh = self.find_fits(trigs)
+        thresh = self.fit_table(trigs)[0].thresh
         # shift by log of reference slope alpha
         logr_n += -1. * numpy.log(self.alpharef)
         # add threshold and rescale by reference slope
@@ -27,7 +27,7 @@ from pycbc import WEAVE_FLAGS
 from pycbc.weave import inline
 from .simd_threshold import thresh_cluster_support, default_segsize
 from .eventmgr import _BaseThresholdCluster
-from pycbc.opt import omp_libs, omp_flags
+from pycbc.opt import omp_support, omp_libs, omp_flags
 
 def threshold_numpy(series, value):
     arr = series.data
@@ -127,3 +127,141 @@ class CPUThresholdCluster(_BaseThresholdCluster):
 
 def _threshold_cluster_factory(series):
     return CPUThresholdCluster
+
+findchirp_thresh_cluster_support = omp_support + """
+#include <stdint.h> // For uint32_t, int64_t
+#include <complex> // Must use C++ header with weave
+
+int parallel_thresh_findchirp(std::complex<float> * __restrict inarr,
+                              const uint32_t arrlen,
+                              std::complex<float> * __restrict values,
+                              uint32_t * __restrict locs,
+                              const float thresh, const uint32_t window,
+                              const uint32_t segsize,
+                              uint32_t * __restrict segcounts){
+
+  /*
+
+  This function thresholds the complex array 'inarr' and clusters the points
+  above threshold using the findchirp algorithm: a trigger is kept unless a
+  louder one exists within 'window' samples of it, where the window is
+  measured from the loudest point found so far in the cluster.
+
+  The array is split into blocks of 'segsize' points that are thresholded
+  in parallel. The points above threshold in each block are written to the
+  part of 'values' and 'locs' that corresponds to that block, so that no
+  locking is needed, and their number to 'segcounts'. A single sweep over
+  the (usually very short) lists of points then clusters them in place.
+
+  The number of clustered triggers is returned, and their values and
+  locations are at the start of 'values' and 'locs'.
+
+  */
+
+  int64_t i, nsegs;
+  float thr_sqr = thresh * thresh;
+
+  nsegs = (arrlen + segsize - 1) / segsize;
+
+#pragma omp parallel for schedule(dynamic,1)
+  for (i = 0; i < nsegs; i++){
+    uint32_t j, c = 0;
+    uint32_t start = i * segsize;
+    uint32_t end = start + segsize;
+    float re, im;
+
+    if (end > arrlen) end = arrlen;
+    for (j = start; j < end; j++){
+      re = inarr[j].real();
+      im = inarr[j].imag();
+      if ((re * re + im * im) > thr_sqr){
+        values[start + c] = inarr[j];
+        locs[start + c] = j;
+        c++;
+      }
+    }
+    segcounts[i] = c;
+  }
+
+  // The output is written in place, which is safe as the number of
+  // clustered triggers can never exceed the number of points already read.
+  int64_t cnt = -1;
+  std::complex<float> cval;
+  uint32_t cloc = 0;
+  float cabs = 0;
+
+  for (i = 0; i < nsegs; i++){
+    uint32_t j, start = i * segsize;
+    for (j = start; j < start + segcounts[i]; j++){
+      std::complex<float> v = values[j];
+      uint32_t l = locs[j];
+      if (cnt < 0){
+        cnt = 0;
+        cval = v;
+        cloc = l;
+        cabs = std::abs(v);
+      } else if ((l - cloc) > window){
+        values[cnt] = cval;
+        locs[cnt] = cloc;
+        cnt++;
+        cval = v;
+        cloc = l;
+        cabs = std::abs(v);
+      } else {
+        float a = std::abs(v);
+        if (a > cabs){
+          cval = v;
+          cloc = l;
+          cabs = a;
+        }
+      }
+    }
+  }
+
+  if (cnt >= 0){
+    values[cnt] = cval;
+    locs[cnt] = cloc;
+    cnt++;
+  } else {
+    cnt = 0;
+  }
+
+  return cnt;
+}
+"""
+
+class CPUFindchirpThresholdCluster(_BaseThresholdCluster):
+    def __init__(self, series):
+        self.series = numpy.array(series.data, copy=False)
+
+        self.slen = len(series)
+        self.outv = numpy.zeros(self.slen, numpy.complex64)
+        self.outl = numpy.zeros(self.slen, numpy.uint32)
+        self.segsize = int(default_segsize)
+        self.segcounts = numpy.zeros(self.slen // self.segsize + 1, numpy.uint32)
+        self.code = """
+             return_val = parallel_thresh_findchirp(series, (uint32_t) slen, values, locs,
+                                         (float) threshold, (uint32_t) window, (uint32_t) segsize,
+                                         segcounts);
+              """
+        self.support = findchirp_thresh_cluster_support
+
+    def threshold_and_cluster(self, threshold, window):
+        series = self.series # pylint:disable=unused-variable
+        slen = self.slen # pylint:disable=unused-variable
+        values = self.outv
+        locs = self.outl
+        segsize = self.segsize # pylint:disable=unused-variable
+        segcounts = self.segcounts # pylint:disable=unused-variable
+        self.count = inline(self.code, ['series', 'slen', 'values', 'locs', 'threshold',
+                                        'window', 'segsize', 'segcounts'],
+                            extra_compile_args = [WEAVE_FLAGS] + omp_flags,
+                            support_code = self.support, libraries = omp_libs,
+                            auto_downcast = 1)
+        if self.count > 0:
+            return values[0:self.count], locs[0:self.count]
+        else:
+            return numpy.array([], dtype = numpy.complex64), numpy.array([], dtype = numpy.uint32)
+
+def _findchirp_threshold_cluster_factory(series):
+    return CPUFindchirpThresholdCluster
@@ -1,6 +1,12 @@
 from pycbc.types import zeros, complex64, complex128
 import numpy as _np
 import ctypes
+import os
+import atexit
+import hashlib
+import logging
+import platform
+import tempfile
 import pycbc.scheme as _scheme
 from pycbc.libutils import get_ctypes_library
 from .core import _BaseFFT, _BaseIFFT
@@ -217,6 +223,200 @@ def export_double_wisdom_to_filename(filename):
     if retval == 0:
         raise RuntimeError("Could not export wisdom to file {0}".format(filename))
 
+# Persistent on-disk wisdom cache.
+#
+# When enabled, the wisdom for each distinct transform is kept in its own
+# small file in the cache directory. The file name is a hash of the
+# transform size, batching, data types, thread count, alignment, measure
+# level and the flags of the CPU. An entry is imported the first time a
+# matching plan is requested, so nothing is read until FFTW is actually
+# used. Wisdom for transforms that were not in the cache is written back,
+# atomically, when the process exits and the least recently used entries
+# are then removed to keep the cache below its maximum size.
+
+_wisdom_cache_dir = None
+_wisdom_cache_max_size = 64 * 1024 ** 2
+_wisdom_cache_mlvl = None
+_wisdom_cache_seen = set()
+_wisdom_cache_pending = {}
+_cpu_flags_hash = None
+
+_wisdom_funcs = {'float': (float_lib.fftwf_import_wisdom_from_string,
+                           float_lib.fftwf_export_wisdom_to_filename),
+                 'double': (double_lib.fftw_import_wisdom_from_string,
+                            double_lib.fftw_export_wisdom_to_filename)}
+
+def _cpu_flags():
+    """ Return a short hash identifying the instruction set of this machine
+    """
+    global _cpu_flags_hash
+    if _cpu_flags_hash is None:
+        flags = platform.machine()
+        try:
+            with open('/proc/cpuinfo') as f:
+                for line in f:
+                    if line.startswith('flags') or line.startswith('Features'):
+                        flags += ' ' + ' '.join(sorted(line.split(':', 1)[1].split()))
+                        break
+        except (IOError, OSError):
+            flags += ' ' + platform.processor()
+        _cpu_flags_hash = hashlib.sha1(flags.encode()).hexdigest()[:16]
+    return _cpu_flags_hash
+
+def _export_wisdom_entries(precision):
+    """ Return the header line and the list of entries of the wisdom
+    currently held by FFTW for the given precision
+    """
+    export = _wisdom_funcs[precision][1]
+    export.argtypes = [ctypes.c_char_p]
+    fd, fname = tempfile.mkstemp(suffix='.wisdom')
+    os.close(fd)
+    try:
+        if export(fname.encode()) == 0:
+            raise RuntimeError("Could not export wisdom to file {0}".format(fname))
+        with open(fname) as f:
+            lines = f.read().splitlines()
+    finally:
+        os.remove(fname)
+    header = lines[0] if lines else ''
+    entries = [l for l in lines[1:] if l.strip() not in ('', ')')]
+    return header, entries
+
+def _import_wisdom_string(precision, wisdom):
+    imp = _wisdom_funcs[precision][0]
+    imp.argtypes = [ctypes.c_char_p]
+    return imp(wisdom.encode()) != 0
+
+def enable_wisdom_cache(directory, max_size=None, mlvl=None):
+    """
+    Enable the persistent wisdom cache.
+
+    Parameters
+    ----------
+    directory : str
+        The directory in which to store the cached wisdom. It is created if
+        it does not exist, and may be shared between processes.
+    max_size : {None, int}
+        The maximum total size of the cache in bytes. If None, the current
+        limit (64 MB by default) is kept.
+    mlvl : {None, int}
+        If given, the minimum measure level used to plan transforms while
+        the cache is enabled, so that transforms whose wisdom is in the cache
+        are planned at this level without paying the planning cost again.
+        If None, transforms are planned at the requested measure level.
+    """
+    global _wisdom_cache_dir, _wisdom_cache_max_size, _wisdom_cache_mlvl
+    if mlvl is not None and mlvl not in (0,1,2,3):
+        raise ValueError("Measure level can only be one of 0, 1, 2, or 3")
+    try:
+        os.makedirs(directory)
+    except OSError:
+        if not os.path.isdir(directory):
+            raise
+    if _wisdom_cache_dir is None:
+        atexit.register(write_wisdom_cache)
+    _wisdom_cache_dir = directory
+    _wisdom_cache_mlvl = mlvl
+    if max_size is not None:
+        _wisdom_cache_max_size = int(max_size)
+
+def _wisdom_cache_prepare(precision, key, mlvl):
+    """ Import any cached wisdom for the transform identified by key.
+
+    Returns the measure level with which to plan the transform and, if the
+    wisdom of the plan should be recorded in the cache, the information
+    that must then be passed to _wisdom_cache_record once planned.
+    """
+    if _wisdom_cache_dir is None:
+        return mlvl, None
+
+    if _wisdom_cache_mlvl is not None:
+        mlvl = max(mlvl, _wisdom_cache_mlvl)
+    desc = repr(key + (mlvl, _cpu_flags()))
+    fname = os.path.join(_wisdom_cache_dir, '{0}-{1}.wisdom'.format(
+                         precision, hashlib.sha1(desc.encode()).hexdigest()))
+    if fname in _wisdom_cache_seen:
+        return mlvl, None
+    _wisdom_cache_seen.add(fname)
+
+    try:
+        with open(fname) as f:
+            wisdom = f.read()
+        if _import_wisdom_string(precision, wisdom):
+            # Mark the entry as recently used for the eviction
+            os.utime(fname, None)
+            return mlvl, None
+    except (IOError, OSError):
+        pass
+
+    return mlvl, (precision, fname, _export_wisdom_entries(precision)[1])
+
+def _wisdom_cache_record(entry):
+    """ Store the wisdom gained by planning a transform not in the cache
+    """
+    if entry is None:
+        return
+    precision, fname, before = entry
+    header, after = _export_wisdom_entries(precision)
+    before = set(before)
+    new = [e for e in after if e not in before]
+    if new:
+        _wisdom_cache_pending[fname] = '\n'.join([header] + new + [')', ''])
+
+def write_wisdom_cache():
+    """
+    Write the wisdom of transforms planned since the wisdom cache was
+    enabled to the cache directory, and remove the least recently used
+    entries if the cache is larger than its maximum size. This is called
+    automatically when the process exits.
+    """
+    if _wisdom_cache_dir is None:
+        return
+
+    for fname, wisdom in _wisdom_cache_pending.items():
+        tmpname = None
+        try:
+            fd, tmpname = tempfile.mkstemp(dir=_wisdom_cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(wisdom)
+            # mkstemp only gives the owner access, but the cache may be
+            # shared, so use the permissions of a normally created file
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmpname, 0o644 & ~umask)
+            os.rename(tmpname, fname)
+        except (IOError, OSError) as e:
+            logging.warning("Could not write FFTW wisdom cache entry %s: %s",
+                            fname, e)
+            # Do not leave the partial entry behind in the cache
+            if tmpname is not None:
+                try:
+                    os.remove(tmpname)
+                except OSError:
+                    pass
+    _wisdom_cache_pending.clear()
+
+    entries = []
+    for name in os.listdir(_wisdom_cache_dir):
+        if not name.endswith('.wisdom'):
+            continue
+        path = os.path.join(_wisdom_cache_dir, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(e[1] for e in entries)
+    for _, size, path in sorted(entries):
+        if total <= _wisdom_cache_max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
 def set_planning_limit(time):
     if not _fftw_threaded_set:
         set_threads_backend()
@@ -251,6 +451,13 @@ def plan(size, idtype, odtype, direction, mlvl, aligned, nthreads, inplace):
         set_threads_backend()
     if nthreads != _fftw_current_nthreads:
         _fftw_plan_with_nthreads(nthreads)
+
+    # Import cached wisdom, if any, for this transform
+    precision = 'float' if _np.dtype(idtype).char in ['f', 'F'] else 'double'
+    key = (size, str(_np.dtype(idtype)), str(_np.dtype(odtype)), direction,
+           aligned, nthreads, inplace)
+    mlvl, cache_entry = _wisdom_cache_prepare(precision, key, mlvl)
+
     # Convert a measure-level to flags
     flags = get_flag(mlvl,aligned)
 
@@ -305,6 +512,8 @@ def plan(size, idtype, odtype, direction, mlvl, aligned, nthreads, inplace):
     # We don't need ip or op anymore
     del ip, op
 
+    _wisdom_cache_record(cache_entry)
+
     # Make the destructors
     if idtype.char in ['f', 'F']:
         destroy = float_lib.fftwf_destroy_plan
@@ -388,11 +597,11 @@ plan_many_r2c_d.restype = ctypes.c_void_p
 # translate input and output dtypes into the correct planning function.
 
 _plan_funcs_dict = { ('complex64', 'complex64') : plan_many_c2c_f,
-                     ('complex64', 'float32') : plan_many_r2c_f,
-                     ('float32', 'complex64') : plan_many_c2r_f,
+                     ('float32', 'complex64') : plan_many_r2c_f,
+                     ('complex64', 'float32') : plan_many_c2r_f,
                      ('complex128', 'complex128') : plan_many_c2c_d,
-                     ('complex128', 'float64') : plan_many_r2c_d,
-                     ('float64', 'complex128') : plan_many_c2r_d }
+                     ('float64', 'complex128') : plan_many_r2c_d,
+                     ('complex128', 'float64') : plan_many_c2r_d }
 
 # To avoid multiple-inheritance, we set up a function that returns much
 # of the initialization that will need to be handled in __init__ of both
@@ -409,18 +618,26 @@ def _fftw_setup(fftobj):
         _fftw_plan_with_nthreads(nthreads)
     mlvl = get_measure_level()
     aligned = fftobj.invec.data.isaligned and fftobj.outvec.data.isaligned
+
+    # Import cached wisdom, if any, for this transform
+    precision = 'float' if fftobj.invec.dtype.char in ['f', 'F'] else 'double'
+    key = (fftobj.size, fftobj.nbatch, len(fftobj.invec), len(fftobj.outvec),
+           fftobj.idist, fftobj.odist, str(fftobj.invec.dtype),
+           str(fftobj.outvec.dtype), fftobj.forward, aligned, nthreads)
+    mlvl, cache_entry = _wisdom_cache_prepare(precision, key, mlvl)
+
     flags = get_flag(mlvl, aligned)
     plan_func = _plan_funcs_dict[ (str(fftobj.invec.dtype), str(fftobj.outvec.dtype)) ]
     tmpin = zeros(len(fftobj.invec), dtype = fftobj.invec.dtype)
     tmpout = zeros(len(fftobj.outvec), dtype = fftobj.outvec.dtype)
     # C2C, forward
-    if fftobj.forward and (fftobj.outvec.dtype in [complex64, complex128]):
+    if fftobj.forward and (fftobj.invec.dtype in [complex64, complex128]):
         plan = plan_func(1, n.ctypes.data, fftobj.nbatch,
                          tmpin.ptr, inembed.ctypes.data, 1, fftobj.idist,
                          tmpout.ptr, onembed.ctypes.data, 1, fftobj.odist,
                          FFTW_FORWARD, flags)
     # C2C, backward
-    elif not fftobj.forward and (fftobj.invec.dtype in [complex64, complex128]):
+    elif not fftobj.forward and (fftobj.outvec.dtype in [complex64, complex128]):
         plan = plan_func(1, n.ctypes.data, fftobj.nbatch,
                          tmpin.ptr, inembed.ctypes.data, 1, fftobj.idist,
                          tmpout.ptr, onembed.ctypes.data, 1, fftobj.odist,
@@ -433,6 +650,8 @@ def _fftw_setup(fftobj):
                          flags)
     del tmpin
     del tmpout
+
+    _wisdom_cache_record(cache_entry)
     return plan
 
 class FFT(_BaseFFT):
@@ -490,6 +709,26 @@ def insert_fft_options(optgroup):
     optgroup.add_argument("--fftw-import-system-wisdom",
                           help = "If given, call fftw[f]_import_system_wisdom()",
                           action = "store_true")
+    optgroup.add_argument("--fftw-wisdom-cache-dir",
+                      help="Directory in which to keep a persistent cache of "
+                           "FFTW wisdom, shared between jobs. Cached wisdom "
+                           "is loaded when needed and new wisdom is written "
+                           "back on exit. Defaults to the value of the "
+                           "PYCBC_FFTW_WISDOM_CACHE_DIR environment variable, "
+                           "if set.",
+                      default=os.environ.get('PYCBC_FFTW_WISDOM_CACHE_DIR', None))
+    optgroup.add_argument("--fftw-wisdom-cache-max-size",
+                      help="Maximum size of the FFTW wisdom cache in MB. The "
+                           "least recently used entries are removed beyond "
+                           "this size. Default 64.",
+                      type=float, default=64)
+    optgroup.add_argument("--fftw-wisdom-cache-measure-level",
+                      help="Minimum measure level used to plan FFTW "
+                           "transforms when the wisdom cache is enabled; "
+                           "allowed values are: " + str([0,1,2,3]) + ". If "
+                           "not given, transforms are planned at the measure "
+                           "level they request.",
+                      type=int, default=None)
 
 def verify_fft_options(opt,parser):
     """Parses the FFT options and verifies that they are
@@ -515,6 +754,14 @@ def verify_fft_options(opt,parser):
         if opt.fftw_threads_backend not in ['openmp','pthreads','unthreaded']:
             parser.error("Invalid threads backend; must be 'openmp', 'pthreads' or 'unthreaded'")
 
+    if opt.fftw_wisdom_cache_measure_level is not None and \
+            opt.fftw_wisdom_cache_measure_level not in [0,1,2,3]:
+        parser.error("{0} is not a valid FFTW measure level.".format(
+                     opt.fftw_wisdom_cache_measure_level))
+
+    if opt.fftw_wisdom_cache_max_size <= 0:
+        parser.error("--fftw-wisdom-cache-max-size must be positive")
+
 def from_cli(opt):
     # Since opt.fftw_threads_backend defaults to None, the following is always
     # appropriate:
@@ -522,3 +769,8 @@ def from_cli(opt):
 
     # Set the user-provided measure level
     set_measure_level(opt.fftw_measure_level)
+
+    if opt.fftw_wisdom_cache_dir:
+        enable_wisdom_cache(opt.fftw_wisdom_cache_dir,
+                            max_size=opt.fftw_wisdom_cache_max_size * 1024 ** 2,
+                            mlvl=opt.fftw_wisdom_cache_measure_level)
@@ -149,7 +149,10 @@ class MatchedFilterControl(object):
             only apply a threshold.
         downsample_factor : {1, int}, optional
             The factor by which to reduce the sample rate when doing a heirarchical
-            matched filter
+            matched filter. The full sample rate snr is then only calculated
+            near points where the reduced rate snr is above threshold, using a
+            pruned inverse FFT. Only 'findchirp' clustering is supported in
+            this case.
         upsample_threshold : {1, float}, optional
             The fraction of the snr_threshold to trigger on the subsampled filter.
         upsample_method : {pruned_fft, str}
@@ -190,6 +193,12 @@ class MatchedFilterControl(object):
                     self.threshold_and_clusterers.append(thresh)
             elif use_cluster and (cluster_function == 'findchirp'):
                 self.matched_filter_and_cluster = self.full_matched_filter_and_cluster_fc
+                # setup the fused threasholding/clustering operations for
+                # each segment
+                self.threshold_and_clusterers = []
+                for seg in self.segments:
+                    thresh = events.FindchirpThresholdCluster(self.snr_mem[seg.analyze])
+                    self.threshold_and_clusterers.append(thresh)
             else:
                 self.matched_filter_and_cluster = self.full_matched_filter_thresh_only
 
@@ -211,13 +220,17 @@ class MatchedFilterControl(object):
             self.ifft = IFFT(self.corr_mem, self.snr_mem)
 
         elif downsample_factor >= 1:
+            if use_cluster and (cluster_function == 'symmetric'):
+                raise ValueError("MatchedFilter: heirarchical filtering only "
+                                 "supports the 'findchirp' cluster_function")
             self.matched_filter_and_cluster = self.heirarchical_matched_filter_and_cluster
+            self.use_cluster = use_cluster
             self.downsample_factor = downsample_factor
             self.upsample_method = upsample_method
             self.upsample_threshold = upsample_threshold
 
             N_full = self.tlen
-            N_red = N_full / downsample_factor
+            N_red = N_full // downsample_factor
             self.kmin_full, self.kmax_full = get_cutoff_indices(self.flow,
                                               self.fhigh, self.delta_f, N_full)
 
@@ -233,6 +246,7 @@ class MatchedFilterControl(object):
             self.corr_mem_full = FrequencySeries(zeros(N_full, dtype=self.dtype), delta_f=self.delta_f)
             self.corr_mem = Array(self.corr_mem_full[0:N_red], copy=False)
             self.inter_vec = zeros(N_full, dtype=self.dtype)
+            self.htilde_full = zeros(N_full, dtype=self.dtype)
 
         else:
             raise ValueError("Invalid downsample factor")
@@ -316,9 +330,7 @@ class MatchedFilterControl(object):
         norm = (4.0 * self.delta_f) / sqrt(template_norm)
         self.correlators[segnum].correlate()
         self.ifft.execute()
-        idx, snrv = events.threshold(self.snr_mem[self.segments[segnum].analyze],
-                                     self.snr_threshold / norm)
-        idx, snrv = events.cluster_reduce(idx, snrv, window)
+        snrv, idx = self.threshold_and_clusterers[segnum].threshold_and_cluster(self.snr_threshold / norm, window)
 
         if len(idx) == 0:
             return [], [], [], [], []
@@ -372,13 +384,18 @@ class MatchedFilterControl(object):
         corr = FrequencySeries(self.corr_mem, delta_f=self.delta_f, copy=False)
         return snr, norm, corr, idx, snrv
 
-    def heirarchical_matched_filter_and_cluster(self, segnum, template_norm, window):
+    def heirarchical_matched_filter_and_cluster(self, segnum, template_norm,
+                                                window, epoch=None):
         """ Returns the complex snr timeseries, normalization of the complex snr,
         the correlation vector frequency series, the list of indices of the
         triggers, and the snr values at the trigger locations. Returns empty
         lists for these for points that are not above the threshold.
 
-        Calculated the matched filter, threshold, and cluster.
+        Calculated the matched filter at a reduced sample rate, and then only
+        evaluates the full sample rate snr around the points where the reduced
+        rate snr is above a fraction of the threshold using a pruned inverse
+        FFT. The full rate points are then thresholded and, if clustering is
+        enabled, clustered using the findchirp algorithm.
 
         Parameters
         ----------
@@ -387,7 +404,8 @@ class MatchedFilterControl(object):
         template_norm : float
             The htilde, template normalization factor.
         window : int
-            Size of the window over which to cluster triggers, in samples
+            Size of the window over which to cluster triggers, in samples.
+            This is ignored if clustering is not enabled.
 
         Returns
         -------
@@ -415,9 +433,14 @@ class MatchedFilterControl(object):
         ifft(self.corr_mem, self.snr_mem)
 
         if not hasattr(stilde, 'red_analyze'):
+            # Each full rate point is evaluated when its nearest reduced rate
+            # point passes the threshold, so the reduced rate points nearest
+            # the end of the analysis segment are included as well
+            red_stop = (stilde.analyze.stop - 1 + self.downsample_factor // 2)\
+                       // self.downsample_factor + 1
             stilde.red_analyze = \
-                             slice(stilde.analyze.start/self.downsample_factor,
-                                   stilde.analyze.stop/self.downsample_factor)
+                             slice(stilde.analyze.start // self.downsample_factor,
+                                   min(red_stop, len(self.snr_mem)))
 
 
         idx_red, snrv_red = events.threshold(self.snr_mem[stilde.red_analyze],
@@ -425,50 +448,277 @@ class MatchedFilterControl(object):
         if len(idx_red) == 0:
             return [], None, [], [], []
 
-        idx_red, _ = events.cluster_reduce(idx_red, snrv_red, window / self.downsample_factor)
+        if self.use_cluster:
+            idx_red, _ = events.cluster_reduce(idx_red, snrv_red,
+                                               window // self.downsample_factor)
+        else:
+            idx_red = numpy.array(idx_red)
         logging.info("%s points above threshold at reduced resolution"\
                       %(str(len(idx_red)),))
 
         # The fancy upsampling is here
         if self.upsample_method=='pruned_fft':
-            idx = (idx_red + stilde.analyze.start/self.downsample_factor)\
+            idx = (idx_red + stilde.analyze.start // self.downsample_factor)\
                    * self.downsample_factor
 
             idx = smear(idx, self.downsample_factor)
 
-            # cache transposed  versions of htilde and stilde
+            # Only keep the points which are within the analysis segment
+            idx = idx[(idx >= stilde.analyze.start) & (idx < stilde.analyze.stop)]
+
             if not hasattr(self.corr_mem_full, 'transposed'):
                 self.corr_mem_full.transposed = zeros(len(self.corr_mem_full), dtype=self.dtype)
 
-            if not hasattr(htilde, 'transposed'):
-                htilde.transposed = zeros(len(self.corr_mem_full), dtype=self.dtype)
-                htilde.transposed[self.kmin_full:self.kmax_full] = htilde[self.kmin_full:self.kmax_full]
-                htilde.transposed = fft_transpose(htilde.transposed)
+            # htilde is the shared template memory, so it is transposed
+            # again for every template; only stilde's transpose is cached
+            self.htilde_full[self.kmin_full:self.kmax_full] = htilde[self.kmin_full:self.kmax_full]
+            htilde_transposed = fft_transpose(self.htilde_full)
 
             if not hasattr(stilde, 'transposed'):
                 stilde.transposed = zeros(len(self.corr_mem_full), dtype=self.dtype)
                 stilde.transposed[self.kmin_full:self.kmax_full] = stilde[self.kmin_full:self.kmax_full]
                 stilde.transposed = fft_transpose(stilde.transposed)
 
-            correlate(htilde.transposed, stilde.transposed, self.corr_mem_full.transposed)
+            correlate(htilde_transposed, stilde.transposed, self.corr_mem_full.transposed)
             snrv = pruned_c2cifft(self.corr_mem_full.transposed, self.inter_vec, idx, pretransposed=True)
             idx = idx - stilde.analyze.start
-            idx2, snrv = events.threshold(Array(snrv, copy=False), self.snr_threshold / norm)
+            idx2, snrv = events.threshold_only(Array(snrv, copy=False),
+                                               self.snr_threshold / norm)
 
             if len(idx2) > 0:
                 correlate(htilde[self.kmax_red:self.kmax_full],
                           stilde[self.kmax_red:self.kmax_full],
                           self.corr_mem_full[self.kmax_red:self.kmax_full])
-                idx, snrv = events.cluster_reduce(idx[idx2], snrv, window)
+                if self.use_cluster:
+                    idx, snrv = events.cluster_reduce(idx[idx2], snrv, window)
+                else:
+                    idx = idx[idx2]
             else:
                 idx, snrv = [], []
 
             logging.info("%s points at full rate and clustering" % len(idx))
-            return self.snr_mem, norm, self.corr_mem_full, idx, snrv
+            snr = TimeSeries(self.snr_mem, epoch=epoch,
+                             delta_t=self.delta_t * self.downsample_factor,
+                             copy=False)
+            return snr, norm, self.corr_mem_full, idx, snrv
         else:
             raise ValueError("Invalid upsample method")
 
 
+class BatchMatchedFilterControl(object):
+    def __init__(self, low_frequency_cutoff, high_frequency_cutoff,
+                 snr_threshold, tlen, delta_f, dtype, segment_list,
+                 batch_size, use_cluster, cluster_function='symmetric'):
+        """ Create a matched filter engine which filters a batch of templates
+        of the same length against a segment at once.
+
+        The templates of a batch are correlated against the segment as a
+        block and a single batched inverse FFT is used to compute all of
+        their SNR time series. Each row is then thresholded and clustered
+        in the same way as in `MatchedFilterControl`.
+
+        Parameters
+        ----------
+        low_frequency_cutoff : {None, float}, optional
+            The frequency to begin the filter calculation. If None, begin at the
+            first frequency after DC.
+        high_frequency_cutoff : {None, float}, optional
+            The frequency to stop the filter calculation. If None, continue to the
+            the nyquist frequency.
+        snr_threshold : float
+            The minimum snr to return when filtering
+        tlen : int
+            The length of the data segments and templates in the time domain
+        delta_f : float
+            The frequency resolution of the data segments and templates
+        dtype : complex64
+            The data type of the data segments and templates
+        segment_list : list
+            List of FrequencySeries that are the Fourier-transformed data segments
+        batch_size : int
+            The maximum number of templates filtered at once.
+        use_cluster : boolean
+            If true, cluster triggers above threshold using a window; otherwise,
+            only apply a threshold.
+        cluster_function : {symmetric, str}, optional
+            Which method is used to cluster triggers over time. If 'findchirp', a
+            sliding forward window; if 'symmetric', each window's peak is compared
+            to the windows before and after it, and only kept as a trigger if larger
+            than both.
+        """
+        self.tlen = tlen
+        self.flen = self.tlen // 2 + 1
+        self.delta_f = delta_f
+        self.delta_t = 1.0/(self.delta_f * self.tlen)
+        self.dtype = dtype
+        self.snr_threshold = snr_threshold
+        self.flow = low_frequency_cutoff
+        self.fhigh = high_frequency_cutoff
+        self.batch_size = int(batch_size)
+        if not isinstance(pycbc.scheme.mgr.state, pycbc.scheme.CPUScheme):
+            raise ValueError("BatchMatchedFilter: only the CPU processing "
+                             "scheme is supported")
+        if cluster_function not in ['symmetric', 'findchirp']:
+            raise ValueError("BatchMatchedFilter: 'cluster_function' must be either 'symmetric' or 'findchirp'")
+        self.cluster_function = cluster_function
+        self.use_cluster = use_cluster
+        self.segments = segment_list
+
+        # Contiguous workspace memory for the whole batch, each template has
+        # its own row of the template, correlation and snr memory
+        self.template_mem = zeros(self.flen * self.batch_size, dtype=self.dtype)
+        self.corr_mem = zeros(self.tlen * self.batch_size, dtype=self.dtype)
+        self.snr_mem = zeros(self.tlen * self.batch_size, dtype=self.dtype)
+
+        self.htildes, self.corrs, self.snrs = [], [], []
+        for i in range(self.batch_size):
+            self.htildes.append(self.template_mem[i * self.flen:(i + 1) * self.flen])
+            self.corrs.append(self.corr_mem[i * self.tlen:(i + 1) * self.tlen])
+            self.snrs.append(self.snr_mem[i * self.tlen:(i + 1) * self.tlen])
+
+        self.kmin, self.kmax = get_cutoff_indices(self.flow, self.fhigh,
+                                                  self.delta_f, self.tlen)
+
+        # The same correlation engine is used for every segment, as only
+        # the data vector changes
+        self.corr_slice = slice(self.kmin, self.kmax)
+        self.correlator = self._correlator(range(self.batch_size))
+
+        # Inverse FFTs of the first rows of the batch, keyed by the number
+        # of rows, so that a partial batch only transforms its own rows
+        self.iffts = {self.batch_size: IFFT(self.corr_mem, self.snr_mem,
+                                            nbatch=self.batch_size,
+                                            size=self.tlen)}
+
+        # setup the threasholding/clustering operations for each row. Most
+        # segments share the same analysis slice, so only create one for
+        # each distinct slice to limit the memory used by the engines.
+        if use_cluster:
+            if cluster_function == 'symmetric':
+                engine = events.ThresholdCluster
+            else:
+                engine = events.FindchirpThresholdCluster
+
+            self.threshold_and_clusterers = []
+            for snr_mem in self.snrs:
+                threshs = {}
+                for seg in self.segments:
+                    key = (seg.analyze.start, seg.analyze.stop)
+                    if key not in threshs:
+                        threshs[key] = engine(snr_mem[seg.analyze])
+                self.threshold_and_clusterers.append(threshs)
+
+    def _correlator(self, rows):
+        """ Create a correlation engine for the given rows of the batch
+        """
+        return BatchCorrelator([self.htildes[r][self.corr_slice] for r in rows],
+                               [self.corrs[r][self.corr_slice] for r in rows],
+                               self.kmax - self.kmin)
+
+    def _ifft(self, num_rows):
+        """ Return the inverse FFT engine of the first num_rows of the batch
+        """
+        if num_rows not in self.iffts:
+            size = num_rows * self.tlen
+            self.iffts[num_rows] = IFFT(self.corr_mem[0:size],
+                                        self.snr_mem[0:size],
+                                        nbatch=num_rows, size=self.tlen)
+        return self.iffts[num_rows]
+
+    def _threshold_and_cluster(self, row, segnum, threshold, window):
+        """ Threshold and cluster a single row of the batched snr memory
+        using the configured clustering method.
+        """
+        if self.use_cluster:
+            analyze = self.segments[segnum].analyze
+            key = (analyze.start, analyze.stop)
+            clusterer = self.threshold_and_clusterers[row][key]
+            snrv, idx = clusterer.threshold_and_cluster(threshold, window)
+            # The engine output memory is reused between segments, so copy
+            # the results out as they may be kept until the batch is done
+            snrv, idx = snrv.copy(), idx.copy()
+        else:
+            snr_mem = self.snrs[row][self.segments[segnum].analyze]
+            idx, snrv = events.threshold_only(snr_mem, threshold)
+        return idx, snrv
+
+    def matched_filter_and_cluster(self, segnum, template_norms, windows,
+                                   epoch=None):
+        """ Filter the templates currently held in the template memory
+        against a single segment.
+
+        Returns a list with one entry per template norm given. Each entry
+        holds the complex snr timeseries, normalization of the complex snr,
+        the correlation vector frequency series, the list of indices of the
+        triggers, and the snr values at the trigger locations, in the same
+        form as returned by `MatchedFilterControl.matched_filter_and_cluster`.
+        Empty lists are returned for templates which have no points above
+        the threshold.
+
+        Parameters
+        ----------
+        segnum : int
+            Index into the list of segments at construction against which
+            to filter.
+        template_norms : list of floats
+            The htilde, template normalization factor of each template in
+            the batch. Only the first len(template_norms) rows of the batch
+            are filtered, and rows whose norm is None are skipped.
+        windows : list of ints
+            Size of the window over which to cluster the triggers of each
+            template, in samples.
+
+        Returns
+        -------
+        results : list of tuples
+            (snr, norm, corr, idx, snrv) for each template in the batch.
+        """
+        if len(template_norms) > self.batch_size:
+            raise ValueError("More templates given than the batch size")
+
+        # Only correlate the rows holding a template to filter. Skipped rows
+        # before the last one still pass through the batched inverse FFT,
+        # so their stale correlation is cleared.
+        rows = [row for row, norm in enumerate(template_norms)
+                if norm is not None]
+        if not rows:
+            return [([], [], [], [], []) for _ in template_norms]
+        if len(rows) == self.batch_size:
+            correlator = self.correlator
+        else:
+            correlator = self._correlator(rows)
+        correlator.execute(self.segments[segnum][self.kmin:self.kmax])
+        for row in range(rows[-1] + 1):
+            if template_norms[row] is None:
+                self.corrs[row][self.corr_slice].clear()
+        self._ifft(rows[-1] + 1).execute()
+
+        results = []
+        for row, (template_norm, window) in enumerate(zip(template_norms,
+                                                          windows)):
+            if template_norm is None:
+                results.append(([], [], [], [], []))
+                continue
+
+            norm = (4.0 * self.delta_f) / sqrt(template_norm)
+            idx, snrv = self._threshold_and_cluster(row, segnum,
+                                                    self.snr_threshold / norm,
+                                                    window)
+
+            if len(idx) == 0:
+                results.append(([], [], [], [], []))
+                continue
+
+            logging.info("%s points above threshold" % str(len(idx)))
+
+            snr = TimeSeries(self.snrs[row], epoch=epoch,
+                             delta_t=self.delta_t, copy=False)
+            corr = FrequencySeries(self.corrs[row], delta_f=self.delta_f,
+                                   copy=False)
+            results.append((snr, norm, corr, idx, snrv))
+        return results
+
+
 def compute_max_snr_over_sky_loc_stat(hplus, hcross, hphccorr,
                                                       hpnorm=None, hcnorm=None,
                                                       out=None, thresh=0,
@@ -1275,7 +1525,7 @@ def smear(idx, factor):
 
     s = [idx]
     for i in range(factor+1):
-        a = i - factor/2
+        a = i - factor // 2
         s += [idx + a]
     return numpy.unique(numpy.concatenate(s))
 
@@ -1894,7 +2144,8 @@ def compute_followup_snr_series(data_reader, htilde, trig_time,
 __all__ = ['match', 'matched_filter', 'sigmasq', 'sigma', 'get_cutoff_indices',
            'sigmasq_series', 'make_frequency_series', 'overlap',
            'overlap_cplx', 'matched_filter_core', 'correlate',
-           'MatchedFilterControl', 'LiveBatchMatchedFilter',
+           'MatchedFilterControl', 'BatchMatchedFilterControl',
+           'LiveBatchMatchedFilter',
            'MatchedFilterSkyMaxControl', 'MatchedFilterSkyMaxControlNoPhase',
            'compute_max_snr_over_sky_loc_stat_no_phase',
            'compute_max_snr_over_sky_loc_stat',
@@ -6,6 +6,7 @@ import h5py
 import numpy as np
 import logging
 import inspect
+from multiprocessing.pool import ThreadPool
 from six.moves import range
 
 from lal import LIGOTimeGPS, YRJUL_SI
@@ -22,6 +23,46 @@ from pycbc import events, conversions, pnutils
 from pycbc.events import ranking
 from pycbc.events.stat import sngl_statistic_dict
 
+# Comparison operators usable in HFile.select predicates, and whether a chunk
+# with the given minimum and maximum value may contain passing elements
+_predicate_ops = {
+    '>': (np.greater, lambda low, high, value: high > value),
+    '>=': (np.greater_equal, lambda low, high, value: high >= value),
+    '<': (np.less, lambda low, high, value: low < value),
+    '<=': (np.less_equal, lambda low, high, value: low <= value),
+    '==': (np.equal, lambda low, high, value: (low <= value) & (high >= value)),
+}
+
+
+def store_chunk_stats(dset, chunksize=int(1e6), values=None):
+    """ Store the minimum and maximum of each chunk of a dataset
+
+    The values are stored as the 'chunk_min' and 'chunk_max' attributes of
+    the dataset, along with the number of elements per chunk as
+    'chunk_stats_size'. HFile.select uses them to skip chunks which cannot
+    satisfy its predicates.
+
+    Parameters
+    ----------
+    dset : h5py.Dataset
+        A one dimensional numeric dataset.
+    chunksize : {1e6, int}, optional
+        Number of elements summarized by each minimum and maximum.
+    values : numpy.ndarray, optional
+        The contents of the dataset, if already in memory. Otherwise they are
+        read from the dataset a chunk at a time.
+    """
+    source = dset if values is None else values
+    low, high = [], []
+    for i in range(0, len(dset), chunksize):
+        part = source[i:i + chunksize]
+        low.append(np.nanmin(part))
+        high.append(np.nanmax(part))
+    dset.attrs['chunk_min'] = np.array(low, dtype=dset.dtype)
+    dset.attrs['chunk_max'] = np.array(high, dtype=dset.dtype)
+    dset.attrs['chunk_stats_size'] = chunksize
+
+
 class HFile(h5py.File):
     """ Low level extensions to the capabilities of reading an hdf5 File
     """
@@ -32,7 +73,8 @@ class HFile(h5py.File):
         ----------
         fcn : a function
             A function that accepts the same number of argument as keys given
-            and returns a boolean array of the same length.
+            and returns a boolean array of the same length. May be None if
+            only predicates are given.
 
         args : strings
             A variable number of strings that are keys into the hdf5. These must
@@ -44,6 +86,16 @@ class HFile(h5py.File):
         return_indices : bool, optional
             If True, also return the indices of elements passing the function.
 
+        predicates : list of tuples, optional
+            Conditions (key, operator, value) which elements must also
+            satisfy, for example ('H1/snr', '>', 6). The operator is one of
+            '>', '>=', '<', '<=' or '=='. Chunks are skipped without being
+            read if the minimum and maximum values stored for the key by
+            store_chunk_stats show that none of their elements can pass.
+
+        nthreads : {1, int}, optional
+            Number of threads reading and processing chunks concurrently.
+
         Returns
         -------
         values : np.ndarrays
@@ -53,49 +105,91 @@ class HFile(h5py.File):
 
         >>> f = HFile(filename)
         >>> snr = f.select(lambda snr: snr > 6, 'H1/snr')
+        >>> snr, chisq = f.select(None, 'H1/snr', 'H1/chisq',
+        ...                       predicates=[('H1/snr', '>', 6)])
         """
 
         # get references to each array
         refs = {}
-        data = {}
         for arg in args:
             refs[arg] = self[arg]
-            data[arg] = []
 
         return_indices = kwds.get('return_indices', False)
-        indices = np.array([], dtype=np.uint64)
+        predicates = kwds.get('predicates', [])
+        for key, op, _ in predicates:
+            if op not in _predicate_ops:
+                raise ValueError('Unknown predicate operator %s' % op)
+            refs[key] = self[key]
 
         # To conserve memory read the array in chunks
         chunksize = kwds.get('chunksize', int(1e6))
-        size = len(refs[arg])
-
-        i = 0
-        while i < size:
+        size = len(refs[args[0]])
+
+        def may_pass(i, r):
+            # Use the stored chunk statistics to check whether any element
+            # from i to r could pass the predicates
+            for key, op, value in predicates:
+                attrs = refs[key].attrs
+                if 'chunk_stats_size' not in attrs:
+                    continue
+                stats_size = attrs['chunk_stats_size']
+                first, last = i // stats_size, (r - 1) // stats_size + 1
+                low = attrs['chunk_min'][first:last]
+                high = attrs['chunk_max'][first:last]
+                if not _predicate_ops[op][1](low, high, value).any():
+                    return False
+            return True
+
+        def process(i):
             r = i + chunksize if i + chunksize < size else size
+            if not may_pass(i, r):
+                return None
 
-            #Read each chunks worth of data and find where it passes the function
+            #Read each chunks worth of data and find where it passes the
+            #function and predicates
             partial = [refs[arg][i:r] for arg in args]
-            keep = fcn(*partial)
-            if return_indices:
-                indices = np.concatenate([indices, np.flatnonzero(keep) + i])
+            keep = np.ones(r - i, dtype=bool)
+            if fcn is not None:
+                keep &= fcn(*partial)
+            for key, op, value in predicates:
+                part = partial[args.index(key)] if key in args \
+                       else refs[key][i:r]
+                keep &= _predicate_ops[op][0](part, value)
 
             #store only the results that pass the function
-            for arg, part in zip(args, partial):
-                data[arg].append(part[keep])
+            return np.flatnonzero(keep) + i, [part[keep] for part in partial]
 
-            i += chunksize
+        nthreads = kwds.get('nthreads', 1)
+        if nthreads > 1:
+            pool = ThreadPool(nthreads)
+            results = pool.imap(process, range(0, size, chunksize))
+        else:
+            pool = None
+            results = (process(i) for i in range(0, size, chunksize))
+
+        indices = [np.array([], dtype=np.uint64)]
+        data = [[refs[arg][0:0]] for arg in args]
+        for result in results:
+            if result is None:
+                continue
+            indices.append(result[0])
+            for values, part in zip(data, result[1]):
+                values.append(part)
+        if pool is not None:
+            pool.close()
 
         # Combine the partial results into full arrays
+        indices = np.concatenate(indices).astype(np.uint64)
+        res = tuple(np.concatenate(values) for values in data)
         if len(args) == 1:
-            res = np.concatenate(data[args[0]])
+            res = res[0]
             if return_indices:
-                return indices.astype(np.uint64), res
+                return indices, res
             else:
                 return res
         else:
-            res = tuple(np.concatenate(data[arg]) for arg in args)
             if return_indices:
-                return (indices.astype(np.uint64),) + res
+                return (indices,) + res
             else:
                 return res
 
@@ -370,18 +464,173 @@ class DataFromFiles(object):
         return np.concatenate(vals)
 
 
+class ReadByTemplate(object):
+    """ Read the triggers of one template at a time from a merged
+    single-detector trigger file
+
+    Both layouts written by pycbc_coinc_mergetrigs are supported. By default
+    the triggers of each template are found by dereferencing the
+    '<column>_template' region references. Files written with
+    --contiguous-templates store the triggers sorted by template id, and each
+    template's triggers are read as a slice between consecutive entries of
+    'template_boundaries'.
+    """
+    def __init__(self, filename, bank=None, segment_name=[], veto_files=[]):
+        self.filename = filename
+        self.bank_filename = bank
+        self.open()
+        self.ifo = list(self.file.keys())[0]
+        self.valid = None
+        self.template_num = None
+
+        self.contiguous = bool(self.file[self.ifo].attrs.get(
+                                              'contiguous_templates', False))
+        self.boundaries = self.file['%s/template_boundaries' % self.ifo][:]
+
+        # Determine the segments which define the boundaries of valid times
+        # to use triggers
+        key = '%s/search/' % self.ifo
+        s, e = self.file[key + 'start_time'][:], self.file[key + 'end_time'][:]
+        self.segs = events.veto.start_end_to_segments(s, e).coalesce()
+        for vfile, name in zip(veto_files, segment_name):
+            veto_segs = events.veto.select_segments_by_definer(vfile,
+                                                        ifo=self.ifo,
+                                                        segment_name=name)
+            self.segs = (self.segs - veto_segs).coalesce()
+        self.valid = events.veto.segments_to_start_end(self.segs)
+
+    def open(self):
+        """ Open the trigger and bank files
+
+        This is called again by each worker process, which then reads through
+        its own file handles while sharing the segments of the parent.
+        """
+        self.file = h5py.File(self.filename, 'r')
+        self.bank = None
+        if self.bank_filename:
+            self.bank = h5py.File(self.bank_filename, 'r')
+
+    def get_data(self, col, num):
+        """ Get a column of data for template with id 'num'
+
+        Parameters
+        ----------
+        col: str
+            Name of column to read
+        num: int
+            The template id to read triggers for
+
+        Returns
+        -------
+        data: numpy.ndarray
+            The requested column of data
+        """
+        dset = self.file['%s/%s' % (self.ifo, col)]
+        if self.contiguous:
+            return dset[self.boundaries[num]:self.boundaries[num + 1]]
+        ref = self.file['%s/%s_template' % (self.ifo, col)][num]
+        return dset[ref]
+
+    def set_template(self, num):
+        """ Set the active template to read from
+
+        Parameters
+        ----------
+        num: int
+            The template id to read triggers for
+
+        Returns
+        -------
+        trigger_id: numpy.ndarray
+            The indices of this templates triggers
+        """
+        self.template_num = num
+        times = self.get_data('end_time', num)
+
+        # Determine which of these template's triggers are kept after
+        # applying vetoes
+        if self.valid:
+            self.keep = events.veto.indices_within_times(times, self.valid[0],
+                                                         self.valid[1])
+            logging.info('applying vetoes')
+        else:
+            self.keep = np.arange(0, len(times))
+
+        if self.bank is not None:
+            self.param = {}
+            if 'parameters' in self.bank.attrs:
+                for col in self.bank.attrs['parameters']:
+                    self.param[col] = self.bank[col][self.template_num]
+            else:
+                for col in self.bank:
+                    self.param[col] = self.bank[col][self.template_num]
+
+        # Calculate the trigger id by adding the relative offset in self.keep
+        # to the absolute beginning index of this templates triggers stored
+        # in 'template_boundaries'
+        trigger_id = self.keep + self.boundaries[num]
+        return trigger_id
+
+    def __getitem__(self, col):
+        """ Return the column of data for current active template after
+        applying vetoes
+
+        Parameters
+        ----------
+        col: str
+            Name of column to read
+
+        Returns
+        -------
+        data: numpy.ndarray
+            The requested column of data
+        """
+        if self.template_num is None:
+            raise ValueError('You must call set_template to first pick the '
+                             'template to read data from')
+        data = self.get_data(col, self.template_num)
+        data = data[self.keep] if self.valid else data
+        return data
+
+
+def _mask_cached(func):
+    """ Make a SingleDetTriggers property which, in lazy mode, is computed
+    once and kept until the mask changes
+    """
+    name = func.__name__
+    def cached(self):
+        if not self.lazy:
+            return func(self)
+        if name not in self._cache:
+            self._cache[name] = func(self)
+        return self._cache[name]
+    cached.__name__ = name
+    cached.__doc__ = func.__doc__
+    return property(cached)
+
+
 class SingleDetTriggers(object):
     """
     Provides easy access to the parameters of single-detector CBC triggers.
+
+    In lazy mode only the masked rows of the trigger file are read, a chunk
+    of rows at a time, and columns and derived parameters are cached until
+    the mask changes. This avoids loading whole columns of large merged
+    trigger files when only a few triggers are used.
     """
     # FIXME: Some of these are optional and should be kwargs.
     def __init__(self, trig_file, bank_file, veto_file,
-                 segment_name, filter_func, detector, premask=None):
+                 segment_name, filter_func, detector, premask=None,
+                 lazy=False, chunk_size=2**20):
         logging.info('Loading triggers')
         self.trigs_f = HFile(trig_file, 'r')
         self.trigs = self.trigs_f[detector]
         self.ifo = detector  # convenience attributes
         self.detector = detector
+        self.lazy = lazy
+        self.chunk_size = chunk_size
+        self._cache = {}
+        self._bank_cache = {}
         if bank_file:
             logging.info('Loading bank')
             self.bank = HFile(bank_file, 'r')
@@ -407,33 +656,132 @@ class SingleDetTriggers(object):
             idx = np.flatnonzero(self.mask)[self.veto_mask]
             self.mask[:] = False
             self.mask[idx] = True
+            self._cache = {}
             logging.info('%i triggers remain after vetoes',
                           len(self.veto_mask))
 
+        if filter_func and lazy:
+            # evaluate the filter a chunk of triggers at a time
+            logging.info('Setting up filter function')
+            self.filter_mask = np.zeros(len(self.trigs['end_time']),
+                                        dtype=bool)
+            for start in range(0, len(self.filter_mask), chunk_size):
+                rows = slice(start, start + chunk_size)
+                self._set_filter_columns(filter_func, rows)
+                self.filter_mask[rows] = \
+                    eval(filter_func.replace('self.', 'self._'))
+                self._del_filter_columns(filter_func)
+            self.mask = self.mask & self.filter_mask
+            logging.info('%i triggers remain after cut on %s',
+                         sum(self.mask), filter_func)
+
         # FIXME this should use the hfile select interface to avoid
         # memory and processing limitations.
-        if filter_func:
+        elif filter_func:
             # get required columns into the namespace with dummy attribute
             # names to avoid confusion with other class properties
             logging.info('Setting up filter function')
-            for c in self.trigs.keys():
-                if c in filter_func:
-                    setattr(self, '_'+c, self.trigs[c][:])
-            for c in self.bank.keys():
-                if c in filter_func:
-                    # get template parameters corresponding to triggers
-                    setattr(self, '_'+c,
-                          np.array(self.bank[c])[self.trigs['template_id'][:]])
-
+            self._set_filter_columns(filter_func, slice(None))
             self.filter_mask = eval(filter_func.replace('self.', 'self._'))
             # remove the dummy attributes
-            for c in self.trigs.keys() + self.bank.keys():
-                if c in filter_func: delattr(self, '_'+c)
+            self._del_filter_columns(filter_func)
 
             self.mask = self.mask & self.filter_mask
             logging.info('%i triggers remain after cut on %s',
                          sum(self.mask), filter_func)
 
+    def _set_filter_columns(self, filter_func, rows):
+        """ Read the columns used by the filter function for a range of rows
+        into attributes with a leading underscore
+        """
+        for c in self.trigs.keys():
+            if c in filter_func:
+                setattr(self, '_'+c, self.trigs[c][rows])
+        for c in self.bank.keys():
+            if c in filter_func:
+                # get template parameters corresponding to triggers
+                setattr(self, '_'+c,
+                        np.array(self.bank[c])[self.trigs['template_id'][rows]])
+
+    def _del_filter_columns(self, filter_func):
+        for c in list(self.trigs.keys()) + list(self.bank.keys()):
+            if c in filter_func: delattr(self, '_'+c)
+
+    @property
+    def mask(self):
+        """ Boolean array, or list of indices, of the triggers to use """
+        return self._mask
+
+    @mask.setter
+    def mask(self, value):
+        self._mask = value
+        self._cache = {}
+
+    def read_masked(self, dset):
+        """ Read the masked rows of a dataset
+
+        In lazy mode the rows are read a chunk at a time, skipping chunks
+        that contain no masked rows.
+
+        Parameters
+        ----------
+        dset: h5py.Dataset
+            Dataset parallel to the triggers
+
+        Returns
+        -------
+        data: numpy.ndarray
+            The values of the masked rows
+        """
+        mask = self.mask
+        if mask is None:
+            return dset[:]
+        if not self.lazy or np.ndim(mask) != 1:
+            return dset[mask]
+
+        mask = np.asarray(mask)
+        idx = np.flatnonzero(mask) if mask.dtype == bool else mask
+        # read the rows in increasing order and restore the mask's order
+        order = idx.argsort(kind='mergesort')
+        idx = idx[order]
+        data = np.empty(len(idx), dtype=dset.dtype)
+        edges = np.searchsorted(idx, np.arange(0, len(dset) + self.chunk_size,
+                                               self.chunk_size))
+        for l, r in zip(edges[:-1], edges[1:]):
+            if l == r:
+                continue
+            first, last = idx[l], idx[r - 1] + 1
+            data[l:r] = dset[first:last][idx[l:r] - first]
+        out = np.empty_like(data)
+        out[order] = data
+        return out
+
+    def iter_trig_dicts(self):
+        """ Iterate over the masked triggers a chunk of rows at a time
+
+        Returns
+        -------
+        trigs: generator of dicts
+            Dictionaries of the masked trigger values in each chunk
+        """
+        mask = self.mask
+        if mask is None:
+            mask = np.ones(len(self.trigs['end_time']), dtype=bool)
+        mask = np.asarray(mask)
+        idx = np.flatnonzero(mask) if mask.dtype == bool else np.sort(mask)
+        num = len(self.trigs['end_time'])
+        for start in range(0, num, self.chunk_size):
+            l, r = np.searchsorted(idx, [start, start + self.chunk_size])
+            if l == r:
+                continue
+            first, last = idx[l], idx[r - 1] + 1
+            rows = idx[l:r] - first
+            mtrigs = {}
+            for k in self.trigs:
+                if len(self.trigs[k]) == num:
+                    mtrigs[k] = self.trigs[k][first:last][rows]
+            yield mtrigs
+
     def checkbank(self, param):
         if self.bank == {}:
             return RuntimeError("Can't get %s values without a bank file"
@@ -444,17 +792,14 @@ class SingleDetTriggers(object):
         mtrigs = {}
         for k in self.trigs:
             if len(self.trigs[k]) == len(self.trigs['end_time']):
-                if self.mask is not None:
-                    mtrigs[k] = self.trigs[k][self.mask]
-                else:
-                    mtrigs[k] = self.trigs[k][:]
+                mtrigs[k] = self.read_masked(self.trigs[k])
         return mtrigs
 
     @classmethod
     def get_param_names(cls):
         """Returns a list of plottable CBC parameter variables"""
         return [m[0] for m in inspect.getmembers(cls) \
-            if type(m[1]) == property]
+            if type(m[1]) == property and m[0] != 'mask']
 
     def apply_mask(self, logic_mask):
         """Apply a boolean array to the set of triggers"""
@@ -462,6 +807,7 @@ class SingleDetTriggers(object):
             orig_indices = self.mask.nonzero()[0][logic_mask]
             self.mask[:] = False
             self.mask[orig_indices] = True
+            self._cache = {}
         else:
             self.mask = list(np.array(self.mask)[logic_mask])
 
@@ -472,9 +818,17 @@ class SingleDetTriggers(object):
         single detector events as ranked by ranking statistic. Events are
         clustered so that no more than 1 event within +/- cluster-window will
         be considered."""
-        # If this becomes memory intensive we can optimize
         stat_instance = sngl_statistic_dict[ranking_statistic]([])
-        stat = stat_instance.single(self.trig_dict())
+        if self.lazy:
+            # calculate the statistic a chunk of triggers at a time
+            stat = [stat_instance.single(t) for t in self.iter_trig_dicts()]
+            stat = np.concatenate(stat) if stat else np.array([])
+            if isinstance(self.mask, list) or self.mask.dtype != bool:
+                # the chunks are in order of trigger index, not mask order
+                unsort = np.argsort(self.mask, kind='mergesort')
+                stat[unsort] = stat.copy()
+        else:
+            stat = stat_instance.single(self.trig_dict())
 
         # Used for naming in plots ... Seems an odd place for this to live!
         if ranking_statistic == "newsnr":
@@ -513,73 +867,63 @@ class SingleDetTriggers(object):
         elif isinstance(self.mask, list):
             self.mask = list(np.array(self.mask)[index])
 
-    @property
+    @_mask_cached
     def template_id(self):
-        return self.trigs['template_id'][self.mask]
+        return self.get_column('template_id')
 
-    @property
+    @_mask_cached
     def mass1(self):
-        self.checkbank('mass1')
-        return self.bank['mass1'][:][self.template_id]
+        return self.get_bank_column('mass1')
 
-    @property
+    @_mask_cached
     def mass2(self):
-        self.checkbank('mass2')
-        return self.bank['mass2'][:][self.template_id]
+        return self.get_bank_column('mass2')
 
-    @property
+    @_mask_cached
     def spin1z(self):
-        self.checkbank('spin1z')
-        return self.bank['spin1z'][:][self.template_id]
+        return self.get_bank_column('spin1z')
 
-    @property
+    @_mask_cached
     def spin2z(self):
-        self.checkbank('spin2z')
-        return self.bank['spin2z'][:][self.template_id]
+        return self.get_bank_column('spin2z')
 
-    @property
+    @_mask_cached
     def spin2x(self):
-        self.checkbank('spin2x')
-        return self.bank['spin2x'][:][self.template_id]
+        return self.get_bank_column('spin2x')
 
-    @property
+    @_mask_cached
     def spin2y(self):
-        self.checkbank('spin2y')
-        return self.bank['spin2y'][:][self.template_id]
+        return self.get_bank_column('spin2y')
 
-    @property
+    @_mask_cached
     def spin1x(self):
-        self.checkbank('spin1x')
-        return self.bank['spin1x'][:][self.template_id]
+        return self.get_bank_column('spin1x')
 
-    @property
+    @_mask_cached
     def spin1y(self):
-        self.checkbank('spin1y')
-        return self.bank['spin1y'][:][self.template_id]
+        return self.get_bank_column('spin1y')
 
-    @property
+    @_mask_cached
     def inclination(self):
-        self.checkbank('inclination')
-        return self.bank['inclination'][:][self.template_id]
+        return self.get_bank_column('inclination')
 
-    @property
+    @_mask_cached
     def f_lower(self):
-        self.checkbank('f_lower')
-        return self.bank['f_lower'][:][self.template_id]
+        return self.get_bank_column('f_lower')
 
-    @property
+    @_mask_cached
     def mtotal(self):
         return self.mass1 + self.mass2
 
-    @property
+    @_mask_cached
     def mchirp(self):
         return conversions.mchirp_from_mass1_mass2(self.mass1, self.mass2)
 
-    @property
+    @_mask_cached
     def eta(self):
         return conversions.eta_from_mass1_mass2(self.mass1, self.mass2)
 
-    @property
+    @_mask_cached
     def effective_spin(self):
         # FIXME assumes aligned spins
         return conversions.chi_eff(self.mass1, self.mass2,
@@ -588,12 +932,12 @@ class SingleDetTriggers(object):
     # IMPROVEME: would like to have a way to access all get_freq and/or
     # other pnutils.* names rather than hard-coding each one
     # - eg make this part of a fancy interface to the bank file ?
-    @property
+    @_mask_cached
     def f_seobnrv2_peak(self):
         return pnutils.get_freq('fSEOBNRv2Peak', self.mass1, self.mass2,
                                 self.spin1z, self.spin2z)
 
-    @property
+    @_mask_cached
     def f_seobnrv4_peak(self):
         return pnutils.get_freq('fSEOBNRv4Peak', self.mass1, self.mass2,
                                 self.spin1z, self.spin2z)
@@ -618,7 +962,7 @@ class SingleDetTriggers(object):
     def u_vals(self):
         return self.get_column('u_vals')
 
-    @property
+    @_mask_cached
     def rchisq(self):
         return self.get_column('chisq') \
             / (self.get_column('chisq_dof') * 2 - 2)
@@ -627,24 +971,36 @@ class SingleDetTriggers(object):
     def psd_var_val(self):
         return self.get_column('psd_var_val')
 
-    @property
+    @_mask_cached
     def newsnr(self):
         return ranking.newsnr(self.snr, self.rchisq)
 
-    @property
+    @_mask_cached
     def newsnr_sgveto(self):
         return ranking.newsnr_sgveto(self.snr, self.rchisq, self.sgchisq)
 
-    @property
+    @_mask_cached
     def newsnr_sgveto_psdvar(self):
         return ranking.newsnr_sgveto_psdvar(self.snr, self.rchisq,
                                            self.sgchisq, self.psd_var_val)
 
     def get_column(self, cname):
-        if self.mask is not None:
-            return self.trigs[cname][self.mask]
-        else:
-            return self.trigs[cname][:]
+        if not self.lazy:
+            return self.read_masked(self.trigs[cname])
+        key = 'column/' + cname
+        if key not in self._cache:
+            self._cache[key] = self.read_masked(self.trigs[cname])
+        return self._cache[key]
+
+    def get_bank_column(self, param):
+        """ Return a template bank parameter for each masked trigger """
+        self.checkbank(param)
+        if self.lazy:
+            # the bank is small, so keep whole columns
+            if param not in self._bank_cache:
+                self._bank_cache[param] = self.bank[param][:]
+            return self._bank_cache[param][self.template_id]
+        return self.bank[param][:][self.template_id]
 
 
 class ForegroundTriggers(object):
@@ -18,7 +18,7 @@
 This module defines optimization flags and determines hardware features that some
 other modules and packages may use in addition to some optimized utilities.
 """
-import os, sys
+import os, sys, hashlib
 import logging
 from collections import OrderedDict
 import pycbc
@@ -210,3 +210,72 @@ class LimitedSizeDict(OrderedDict):
         if self.size_limit is not None:
             while len(self) > self.size_limit:
                 self.popitem(last=False)
+
+class LRUCache(object):
+    """ Least recently used cache limited by the total size of its values
+
+    The size of each value is taken from its nbytes attribute, as provided by
+    numpy and pycbc arrays, or from sys.getsizeof otherwise. Values larger
+    than the whole cache are not stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+
+    @staticmethod
+    def _size(value):
+        size = getattr(value, 'nbytes', None)
+        return sys.getsizeof(value) if size is None else size
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, key):
+        # Move the value to the most recently used end
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self._data:
+            self.nbytes -= self._size(self._data.pop(key))
+        size = self._size(value)
+        if size > self.max_bytes:
+            return
+        self._data[key] = value
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            _, old = self._data.popitem(last=False)
+            self.nbytes -= self._size(old)
+
+def content_hash(series, store=True):
+    """ Return a hash of the values and sample spacing of an array
+
+    Parameters
+    ----------
+    series: pycbc.types.Array
+        The array to hash, for example a PSD.
+    store: {True, bool}
+        Store the hash on the array and return it on later calls. The array
+        must then not be modified after the first call.
+
+    Returns
+    -------
+    hash: str
+        Hex digest identifying the contents of the array.
+    """
+    if not store or not hasattr(series, '_content_hash'):
+        digest = hashlib.sha1(series.numpy().tobytes())
+        digest.update(str(series.dtype).encode())
+        for attr in ['delta_f', 'delta_t']:
+            if hasattr(series, attr):
+                digest.update(repr(float(getattr(series, attr))).encode())
+        if not store:
+            return digest.hexdigest()
+        series._content_hash = digest.hexdigest()
+    return series._content_hash
@@ -27,7 +27,8 @@ from pycbc.types import required_opts, required_opts_multi_ifo
 from pycbc.types import ensure_one_opt, ensure_one_opt_multi_ifo
 
 def from_cli(opt, length, delta_f, low_frequency_cutoff,
-             strain=None, dyn_range_factor=1, precision=None):
+             strain=None, dyn_range_factor=1, precision=None,
+             welch_estimator=None):
     """Parses the CLI options related to the noise PSD and returns a
     FrequencySeries with the corresponding PSD. If necessary, the PSD is
     linearly interpolated to achieve the resolution specified in the CLI.
@@ -58,6 +59,10 @@ def from_cli(opt, length, delta_f, low_frequency_cutoff,
         If 'single' the PSD will be converted to float32, if not already in
         that precision. If 'double' the PSD will be converted to float64, if
         not already in that precision.
+    welch_estimator : {None, WelchEstimator}
+        If given, used in place of `welch` when estimating the PSD from
+        `strain`, so that segment PSDs shared with other estimates are not
+        recomputed.
 
     Returns
     -------
@@ -107,11 +112,12 @@ def from_cli(opt, length, delta_f, low_frequency_cutoff,
 
     elif psd_estimation:
         # estimate PSD from data
-        psd = welch(strain, avg_method=opt.psd_estimation,
-                    seg_len=int(opt.psd_segment_length * sample_rate),
-                    seg_stride=int(opt.psd_segment_stride * sample_rate),
-                    num_segments=opt.psd_num_segments,
-                    require_exact_data_fit=False)
+        estimate = welch if welch_estimator is None else welch_estimator.welch
+        psd = estimate(strain, avg_method=opt.psd_estimation,
+                       seg_len=int(opt.psd_segment_length * sample_rate),
+                       seg_stride=int(opt.psd_segment_stride * sample_rate),
+                       num_segments=opt.psd_num_segments,
+                       require_exact_data_fit=False)
 
         if delta_f != psd.delta_f:
             psd = interpolate(psd, delta_f)
@@ -455,6 +461,8 @@ def generate_overlapping_psds(opt, gwstrain, flen, delta_f, flow,
         num_psd_measurements = int(2 * (input_data_len-1) / psd_data_len)
         psd_stride = int((input_data_len - psd_data_len) / num_psd_measurements)
 
+    # The PSD windows overlap, so share the segment PSDs between them
+    estimator = WelchEstimator(gwstrain)
     for idx in range(num_psd_measurements):
         if idx == (num_psd_measurements - 1):
             start_idx = input_data_len - psd_data_len
@@ -464,7 +472,8 @@ def generate_overlapping_psds(opt, gwstrain, flen, delta_f, flow,
             end_idx = psd_data_len + psd_stride * idx
         strain_part = gwstrain[start_idx:end_idx]
         psd = from_cli(opt, flen, delta_f, flow, strain=strain_part,
-                       dyn_range_factor=dyn_range_factor, precision=precision)
+                       dyn_range_factor=dyn_range_factor, precision=precision,
+                       welch_estimator=estimator)
         psds_and_times.append( (start_idx, end_idx, psd) )
     return psds_and_times
 
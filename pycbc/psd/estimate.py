@@ -19,9 +19,16 @@
 from six.moves import range
 
 import numpy
+from pycbc import scheme as _scheme
 from pycbc.types import Array, FrequencySeries, TimeSeries, zeros
 from pycbc.types import real_same_precision_as, complex_same_precision_as
-from pycbc.fft import fft, ifft
+from pycbc.fft import fft, ifft, FFT
+from pycbc.fft.backend_support import get_backend
+from pycbc.opt import LRUCache, content_hash
+
+_window_map = {
+    'hann': numpy.hanning
+}
 
 def median_bias(n):
     """Calculate the bias of the median average PSD computed from `n` segments.
@@ -88,20 +95,7 @@ def welch(timeseries, seg_len=4096, seg_stride=2048, window='hann',
     -----
     See arXiv:gr-qc/0509116 for details.
     """
-    window_map = {
-        'hann': numpy.hanning
-    }
-
-    # sanity checks
-    if isinstance(window, numpy.ndarray) and window.size != seg_len:
-        raise ValueError('Invalid window: incorrect window length')
-    if not isinstance(window, numpy.ndarray) and window not in window_map:
-        raise ValueError('Invalid window: unknown window {!r}'.format(window))
-    if avg_method not in ('mean', 'median', 'median-mean'):
-        raise ValueError('Invalid averaging method')
-    if type(seg_len) is not int or type(seg_stride) is not int \
-        or seg_len <= 0 or seg_stride <= 0:
-        raise ValueError('Segment length and stride must be positive integers')
+    _check_welch_args(seg_len, seg_stride, window, avg_method)
 
     if timeseries.precision == 'single':
         fs_dtype = numpy.complex64
@@ -109,37 +103,13 @@ def welch(timeseries, seg_len=4096, seg_stride=2048, window='hann',
         fs_dtype = numpy.complex128
 
     num_samples = len(timeseries)
-    if num_segments is None:
-        num_segments = int(num_samples // seg_stride)
-        # NOTE: Is this not always true?
-        if (num_segments - 1) * seg_stride + seg_len > num_samples:
-            num_segments -= 1
-
-    if not require_exact_data_fit:
-        data_len = (num_segments - 1) * seg_stride + seg_len
+    start, end, num_segments = _welch_data_span(num_samples, seg_len,
+                                                seg_stride, num_segments,
+                                                require_exact_data_fit)
+    if (start, end) != (0, num_samples):
+        timeseries = timeseries[start:end]
 
-        # Get the correct amount of data
-        if data_len < num_samples:
-            diff = num_samples - data_len
-            start = diff // 2
-            end = num_samples - diff // 2
-            # Want this to be integers so if diff is odd, catch it here.
-            if diff % 2:
-                start = start + 1
-
-            timeseries = timeseries[start:end]
-            num_samples = len(timeseries)
-        if data_len > num_samples:
-            err_msg = "I was asked to estimate a PSD on %d " %(data_len)
-            err_msg += "data samples. However the data provided only contains "
-            err_msg += "%d data samples." %(num_samples)
-
-    if num_samples != (num_segments - 1) * seg_stride + seg_len:
-        raise ValueError('Incorrect choice of segmentation parameters')
-
-    if not isinstance(window, numpy.ndarray):
-        window = window_map[window](seg_len)
-    w = Array(window.astype(timeseries.dtype))
+    w = _welch_window(window, seg_len, timeseries.dtype)
 
     # calculate psd of each segment
     delta_f = 1. / timeseries.delta_t / seg_len
@@ -165,7 +135,62 @@ def welch(timeseries, seg_len=4096, seg_stride=2048, window='hann',
         segment_psds.append(seg_psd)
 
     segment_psds = numpy.array(segment_psds)
+    psd = _average_segment_psds(segment_psds, avg_method)
+    psd *= 2 * delta_f * seg_len / (w*w).sum()
+
+    return FrequencySeries(psd, delta_f=delta_f, dtype=timeseries.dtype,
+                           epoch=timeseries.start_time)
+
+def _check_welch_args(seg_len, seg_stride, window, avg_method):
+    """Sanity checks shared by the Welch estimators."""
+    if isinstance(window, numpy.ndarray) and window.size != seg_len:
+        raise ValueError('Invalid window: incorrect window length')
+    if not isinstance(window, numpy.ndarray) and window not in _window_map:
+        raise ValueError('Invalid window: unknown window {!r}'.format(window))
+    if avg_method not in ('mean', 'median', 'median-mean'):
+        raise ValueError('Invalid averaging method')
+    if type(seg_len) is not int or type(seg_stride) is not int \
+        or seg_len <= 0 or seg_stride <= 0:
+        raise ValueError('Segment length and stride must be positive integers')
+
+def _welch_data_span(num_samples, seg_len, seg_stride, num_segments=None,
+                     require_exact_data_fit=False):
+    """Return the (start, end) samples of the data used by a Welch estimate
+    of `num_samples` samples, and the number of segments it averages.
+    """
+    if num_segments is None:
+        num_segments = int(num_samples // seg_stride)
+        # NOTE: Is this not always true?
+        if (num_segments - 1) * seg_stride + seg_len > num_samples:
+            num_segments -= 1
+
+    start, end = 0, num_samples
+    if not require_exact_data_fit:
+        data_len = (num_segments - 1) * seg_stride + seg_len
+
+        # Get the correct amount of data
+        if data_len < num_samples:
+            diff = num_samples - data_len
+            start = diff // 2
+            end = num_samples - diff // 2
+            # Want this to be integers so if diff is odd, catch it here.
+            if diff % 2:
+                start = start + 1
+
+    if end - start != (num_segments - 1) * seg_stride + seg_len:
+        raise ValueError('Incorrect choice of segmentation parameters')
+    return start, end, num_segments
+
+def _welch_window(window, seg_len, dtype):
+    """Return the window applied to each Welch segment as an Array."""
+    if not isinstance(window, numpy.ndarray):
+        window = _window_map[window](seg_len)
+    return Array(window.astype(dtype))
 
+def _average_segment_psds(segment_psds, avg_method):
+    """Average a stack of segment PSDs, one per row, with the given method.
+    """
+    num_segments = len(segment_psds)
     if avg_method == 'mean':
         psd = numpy.mean(segment_psds, axis=0)
     elif avg_method == 'median':
@@ -178,17 +203,272 @@ def welch(timeseries, seg_len=4096, seg_stride=2048, window='hann',
         even_median = numpy.median(even_psds, axis=0) / \
             median_bias(len(even_psds))
         psd = (odd_median + even_median) / 2
+    return psd
 
-    psd *= 2 * delta_f * seg_len / (w*w).sum()
+def welch_segment_psds(timeseries, seg_len, starts, window='hann',
+                       batch_size=64):
+    """Return the unaveraged PSDs of Welch segments of a time series.
 
-    return FrequencySeries(psd, delta_f=delta_f, dtype=timeseries.dtype,
-                           epoch=timeseries.start_time)
+    On the CPU the segments are Fourier transformed in batches with a single
+    FFT plan; other processing schemes, and FFT backends without a class
+    based interface, transform one segment at a time.
+    Each PSD is normalized as in `welch` before averaging.
+
+    Parameters
+    ----------
+    timeseries : TimeSeries
+        Time series containing the segments.
+    seg_len : int
+        Segment length in samples.
+    starts : array of ints
+        The sample of `timeseries` at which each segment starts.
+    window : {'hann', numpy.ndarray}
+        Function used to window segments before Fourier transforming, or
+        a `numpy.ndarray` that specifies the window.
+    batch_size : {64, int}
+        Maximum number of segments to Fourier transform at once.
+
+    Returns
+    -------
+    segment_psds : numpy.ndarray
+        Array with the PSD of each segment as a row.
+    """
+    if timeseries.precision == 'single':
+        fs_dtype = numpy.complex64
+    elif timeseries.precision == 'double':
+        fs_dtype = numpy.complex128
+
+    flen = seg_len // 2 + 1
+    segment_psds = numpy.zeros((len(starts), flen), dtype=timeseries.dtype)
+    if not len(starts):
+        return segment_psds
+
+    if not isinstance(_scheme.mgr.state, _scheme.CPUScheme) or \
+            not hasattr(get_backend(), 'FFT'):
+        # The batched transform below writes through host views of its
+        # buffers, which are only copies outside the CPU scheme, and needs
+        # a backend with batched FFT plans, so otherwise transform each
+        # segment in the current scheme as welch does
+        w = _welch_window(window, seg_len, timeseries.dtype)
+        segment_tilde = FrequencySeries(
+            numpy.zeros(flen),
+            delta_f=1. / timeseries.delta_t / seg_len,
+            dtype=fs_dtype,
+        )
+        for i, start in enumerate(starts):
+            fft(timeseries[start:start + seg_len] * w, segment_tilde)
+            segment_psds[i] = \
+                abs(segment_tilde * segment_tilde.conj()).numpy()
+    else:
+        nbatch = min(batch_size, len(starts))
+        invec = zeros(nbatch * seg_len, dtype=timeseries.dtype)
+        outvec = zeros(nbatch * flen, dtype=fs_dtype)
+        engine = FFT(invec, outvec, nbatch=nbatch, size=seg_len)
+        segs = invec.numpy().reshape(nbatch, seg_len)
+        tildes = outvec.numpy().reshape(nbatch, flen)
+
+        data = timeseries.numpy()
+        w = _welch_window(window, seg_len, timeseries.dtype).numpy()
+        for i in range(0, len(starts), nbatch):
+            block = numpy.array(starts[i:i + nbatch])
+            idx = block[:, None] + numpy.arange(seg_len)
+            segs[:len(block)] = data[idx] * w
+            segs[len(block):] = 0
+            engine.execute()
+            # Apply the scaling of the function based FFT
+            tilde = tildes[:len(block)] * timeseries.delta_t
+            segment_psds[i:i + len(block)] = abs(tilde * tilde.conj())
+
+    #halve the DC and Nyquist components to be consistent with TO10095
+    segment_psds[:, 0] /= 2
+    segment_psds[:, -1] /= 2
+    return segment_psds
+
+class WelchEstimator(object):
+    """Welch PSD estimator for sub-series of one long time series.
+
+    The PSD of every Welch segment is computed once, with batched FFTs, and
+    reused by all the PSD estimates whose segments start at the same sample.
+    Overlapping PSD windows whose offsets are multiples of the segment
+    stride therefore share most of their work.
+
+    Parameters
+    ----------
+    timeseries : TimeSeries
+        The time series from which all PSDs will be estimated.
+    window : {'hann', numpy.ndarray}
+        Function used to window segments before Fourier transforming, or
+        a `numpy.ndarray` that specifies the window.
+    batch_size : {64, int}
+        Maximum number of segments to Fourier transform at once.
+    """
+    def __init__(self, timeseries, window='hann', batch_size=64):
+        self.timeseries = timeseries
+        self.window = window
+        self.batch_size = batch_size
+        self._segment_psds = {}
+
+    def offset(self, timeseries):
+        """Return the sample at which `timeseries` starts within the time
+        series of this estimator, or None if it is not contained in it.
+        """
+        if timeseries.delta_t != self.timeseries.delta_t:
+            return None
+        dt = float(timeseries.start_time - self.timeseries.start_time)
+        offset = int(round(dt / self.timeseries.delta_t))
+        if offset < 0 or offset + len(timeseries) > len(self.timeseries):
+            return None
+        return offset
+
+    def segment_psds(self, seg_len, starts):
+        """Return the PSDs of the segments of `seg_len` samples starting at
+        the samples `starts`, one per row, computing any not already known.
+        """
+        known = self._segment_psds.setdefault(seg_len, {})
+        todo = [s for s in numpy.unique(starts) if s not in known]
+        if todo:
+            known.update(zip(todo, welch_segment_psds(self.timeseries,
+                                                      seg_len, todo,
+                                                      window=self.window,
+                                                      batch_size=self.batch_size)))
+        return numpy.array([known[s] for s in starts])
+
+    def welch(self, timeseries, seg_len=4096, seg_stride=2048,
+              avg_method='median', num_segments=None,
+              require_exact_data_fit=False):
+        """Estimate the PSD of `timeseries` as `welch` does, reusing the
+        segment PSDs of this estimator when `timeseries` is part of its time
+        series. Other time series are passed on to `welch`.
+        """
+        offset = self.offset(timeseries)
+        if offset is None:
+            return welch(timeseries, seg_len=seg_len, seg_stride=seg_stride,
+                         window=self.window, avg_method=avg_method,
+                         num_segments=num_segments,
+                         require_exact_data_fit=require_exact_data_fit)
+
+        _check_welch_args(seg_len, seg_stride, self.window, avg_method)
+        start, end, num_segments = _welch_data_span(len(timeseries), seg_len,
+                                                    seg_stride, num_segments,
+                                                    require_exact_data_fit)
+        starts = offset + start + numpy.arange(num_segments) * seg_stride
+        segment_psds = self.segment_psds(seg_len, starts)
+
+        w = _welch_window(self.window, seg_len, timeseries.dtype)
+        delta_f = 1. / timeseries.delta_t / seg_len
+        psd = _average_segment_psds(segment_psds, avg_method)
+        psd *= 2 * delta_f * seg_len / (w*w).sum()
+
+        return FrequencySeries(psd, delta_f=delta_f, dtype=timeseries.dtype,
+                               epoch=timeseries.start_time +
+                                     start * timeseries.delta_t)
+
+class StreamingWelch(object):
+    """Welch PSD estimator for the most recent data of a time series that
+    is continually advanced, such as the buffer of a low latency search.
+
+    The PSDs of the Welch segments are kept keyed by their absolute start
+    sample, so each new estimate only Fourier transforms segments that have
+    arrived since the previous one. Segment PSDs overlapping data that is
+    later modified must be discarded with `invalidate`.
+
+    Parameters
+    ----------
+    seg_len : int
+        Segment length in samples.
+    seg_stride : int
+        Separation between consecutive segments, in samples.
+    num_segments : int
+        Number of segments averaged in each estimate.
+    avg_method : {'median', 'mean', 'median-mean'}
+        Method used for averaging individual segment PSDs.
+    window : {'hann', numpy.ndarray}
+        Function used to window segments before Fourier transforming, or
+        a `numpy.ndarray` that specifies the window.
+    """
+    def __init__(self, seg_len, seg_stride, num_segments,
+                 avg_method='median', window='hann'):
+        _check_welch_args(seg_len, seg_stride, window, avg_method)
+        self.seg_len = seg_len
+        self.seg_stride = seg_stride
+        self.num_segments = num_segments
+        self.avg_method = avg_method
+        self.window = window
+        self.data_len = (num_segments - 1) * seg_stride + seg_len
+        self._segment_psds = {}
+
+    @staticmethod
+    def _first_sample(timeseries):
+        return int(round(float(timeseries.start_time) / timeseries.delta_t))
+
+    def invalidate(self, timeseries, index=0):
+        """Discard the segment PSDs which include samples of `timeseries`
+        from `index` onwards, as the data there has been or will be changed.
+        """
+        first_changed = self._first_sample(timeseries) + index
+        for start in list(self._segment_psds):
+            if start + self.seg_len > first_changed:
+                del self._segment_psds[start]
+
+    def psd(self, timeseries):
+        """Estimate the PSD of the last samples of `timeseries`.
+
+        The estimate is the same as that of `welch` applied to the final
+        (num_segments - 1) * seg_stride + seg_len samples.
+
+        Parameters
+        ----------
+        timeseries : TimeSeries
+            The time series whose latest data is used.
+
+        Returns
+        -------
+        psd : FrequencySeries
+            Frequency series containing the estimated PSD.
+        """
+        offset = len(timeseries) - self.data_len
+        if offset < 0:
+            raise ValueError('Time series is shorter than the %d samples '
+                             'needed to estimate a PSD' % self.data_len)
+
+        first = self._first_sample(timeseries)
+        starts = offset + numpy.arange(self.num_segments) * self.seg_stride
+
+        # Forget the segments that have left the estimate
+        for start in list(self._segment_psds):
+            if start < first + starts[0]:
+                del self._segment_psds[start]
+
+        new = [s for s in starts if first + s not in self._segment_psds]
+        new_psds = welch_segment_psds(timeseries, self.seg_len, new,
+                                      window=self.window,
+                                      batch_size=self.num_segments)
+        for start, seg_psd in zip(new, new_psds):
+            self._segment_psds[first + start] = seg_psd
+
+        segment_psds = numpy.array([self._segment_psds[first + s]
+                                    for s in starts])
+        w = _welch_window(self.window, self.seg_len, timeseries.dtype)
+        delta_f = 1. / timeseries.delta_t / self.seg_len
+        psd = _average_segment_psds(segment_psds, self.avg_method)
+        psd *= 2 * delta_f * self.seg_len / (w*w).sum()
+
+        return FrequencySeries(psd, delta_f=delta_f, dtype=timeseries.dtype,
+                               epoch=timeseries.start_time +
+                                     offset * timeseries.delta_t)
+
+# Truncated inverse spectra shared by all callers in this process, keyed by
+# the contents of the input PSD and the truncation settings
+_truncation_cache = LRUCache(2**26)
 
 def inverse_spectrum_truncation(psd, max_filter_len, low_frequency_cutoff=None, trunc_method=None):
     """Modify a PSD such that the impulse response associated with its inverse
     square root is no longer than `max_filter_len` time samples. In practice
     this corresponds to a coarse graining or smoothing of the PSD.
 
+    Results are cached by the contents of `psd` and the truncation settings,
+    so repeating the truncation of the same PSD does not repeat the FFTs.
+
     Parameters
     ----------
     psd : FrequencySeries
@@ -215,6 +495,49 @@ def inverse_spectrum_truncation(psd, max_filter_len, low_frequency_cutoff=None,
     -----
     See arXiv:gr-qc/0509116 for details.
     """
+    return inverse_spectrum_truncation_multi(psd, [psd.delta_f],
+                                             max_filter_len,
+                                             low_frequency_cutoff,
+                                             trunc_method)[psd.delta_f]
+
+def inverse_spectrum_truncation_multi(psd, delta_fs, max_filter_len,
+                                      low_frequency_cutoff=None,
+                                      trunc_method=None):
+    """Truncate the inverse spectrum of a PSD as `inverse_spectrum_truncation`
+    does, and return the result at several frequency resolutions.
+
+    The time-domain filter is truncated once and then zero padded to the
+    length of each requested resolution, so each additional resolution
+    costs a single FFT. At the resolution of `psd` the result is that of
+    `inverse_spectrum_truncation`. Results are cached by the contents of
+    `psd` and the truncation settings.
+
+    Parameters
+    ----------
+    psd : FrequencySeries
+        PSD whose inverse spectrum is to be truncated.
+    delta_fs : list of floats
+        The frequency steps of the output PSDs.
+    max_filter_len : int
+        Maximum length of the time-domain filter in samples.
+    low_frequency_cutoff : {None, int}
+        Frequencies below `low_frequency_cutoff` are zeroed in the output.
+    trunc_method : {None, 'hann'}
+        Function used for truncating the time-domain filter.
+        None produces a hard truncation at `max_filter_len`.
+
+    Returns
+    -------
+    psds : dict
+        Dictionary of the truncated PSDs keyed by frequency step.
+
+    Raises
+    ------
+    ValueError
+        For invalid types or values of `max_filter_len` and
+        `low_frequency_cutoff`, and for resolutions too coarse to hold the
+        filter.
+    """
     # sanity checks
     if type(max_filter_len) is not int or max_filter_len <= 0:
         raise ValueError('max_filter_len must be a positive integer')
@@ -222,6 +545,15 @@ def inverse_spectrum_truncation(psd, max_filter_len, low_frequency_cutoff=None,
         or low_frequency_cutoff > psd.sample_frequencies[-1]:
         raise ValueError('low_frequency_cutoff must be within the bandwidth of the PSD')
 
+    key = (content_hash(psd, store=False), max_filter_len,
+           low_frequency_cutoff, trunc_method)
+    psds = {}
+    for delta_f in delta_fs:
+        if key + (delta_f,) in _truncation_cache:
+            psds[delta_f] = _truncation_cache[key + (delta_f,)].copy()
+    if len(psds) == len(delta_fs):
+        return psds
+
     N = (len(psd)-1)*2
 
     inv_asd = FrequencySeries((1. / psd)**0.5, delta_f=psd.delta_f, \
@@ -248,15 +580,33 @@ def inverse_spectrum_truncation(psd, max_filter_len, low_frequency_cutoff=None,
         q[0:trunc_start] *= trunc_window[max_filter_len//2:max_filter_len]
         q[trunc_end:N] *= trunc_window[0:max_filter_len//2]
 
-    if trunc_start < trunc_end:
-        q[trunc_start:trunc_end] = 0
-    psd_trunc = FrequencySeries(numpy.zeros(len(psd)), delta_f=psd.delta_f, \
-                                dtype=complex_same_precision_as(psd))
-    fft(q, psd_trunc)
-    psd_trunc *= psd_trunc.conj()
-    psd_out = 1. / abs(psd_trunc)
-
-    return psd_out
+    for delta_f in delta_fs:
+        if delta_f in psds:
+            continue
+
+        # Zero pad the two ends of the truncated filter to the new length.
+        # The resolution of the PSD always holds the filter, which is left
+        # untruncated if it is no shorter than the PSD.
+        M = int(round(1. / (delta_f * q.delta_t)))
+        if M != N and (M - trunc_start < N - trunc_end or M < trunc_start):
+            raise ValueError('Frequency step %s is too coarse for a filter '
+                             'of %d samples' % (delta_f, max_filter_len))
+        qpad = TimeSeries(numpy.zeros(M), delta_t=q.delta_t, dtype=q.dtype)
+        qpad._epoch = q._epoch
+        qpad[0:trunc_start] = q[0:trunc_start]
+        qpad[M - (N - trunc_end):M] = q[trunc_end:N]
+
+        psd_trunc = FrequencySeries(numpy.zeros(M // 2 + 1),
+                                    delta_f=delta_f,
+                                    dtype=complex_same_precision_as(psd))
+        fft(qpad, psd_trunc)
+        psd_trunc *= psd_trunc.conj()
+        psd_out = 1. / abs(psd_trunc)
+
+        _truncation_cache[key + (delta_f,)] = psd_out
+        psds[delta_f] = psd_out.copy()
+
+    return psds
 
 def interpolate(series, delta_f):
     """Return a new PSD that has been interpolated to the desired delta_f.
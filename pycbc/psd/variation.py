@@ -3,7 +3,7 @@
 import numpy
 import pycbc.psd
 
-from pycbc.types import TimeSeries, FrequencySeries, zeros
+from pycbc.types import TimeSeries, FrequencySeries, Array, zeros
 
 def calc_psd_variation(strain, psd_short_segment, psd_long_segment,
                        short_psd_duration, short_psd_stride, psd_avg_method,
@@ -60,26 +60,29 @@ def calc_psd_variation(strain, psd_short_segment, psd_long_segment,
                          delta_t=psd_short_segment, copy=False,
                          epoch=start_time)
 
+    seg_len = int(short_psd_duration * strain.sample_rate)
+    seg_stride = int(short_psd_stride * strain.sample_rate)
+
     ind = 0
     for tlong in times_long:
+        # The short segments are made of the same Welch segments as the
+        # long segment, so share their PSDs rather than recomputing them
+        estimator = pycbc.psd.WelchEstimator(strain)
+
         # Calculate PSD for long segment and separate the long segment in to
         # overlapping shorter segments
         if tlong + psd_long_segment <= end_time:
-            psd_long = pycbc.psd.welch(
+            psd_long = estimator.welch(
                            strain.time_slice(tlong, tlong + psd_long_segment),
-                           seg_len=int(short_psd_duration * strain.sample_rate),
-                           seg_stride=int(short_psd_stride *
-                                          strain.sample_rate),
+                           seg_len=seg_len, seg_stride=seg_stride,
                            avg_method=psd_avg_method)
             times_short = numpy.arange(tlong, tlong + psd_long_segment,
                                        psd_short_segment)
         else:
-            psd_long = pycbc.psd.welch(
+            psd_long = estimator.welch(
                            strain.time_slice(end_time - psd_long_segment,
                                              end_time),
-                           seg_len=int(short_psd_duration * strain.sample_rate),
-                           seg_stride=int(short_psd_stride *
-                                          strain.sample_rate),
+                           seg_len=seg_len, seg_stride=seg_stride,
                            avg_method=psd_avg_method)
             times_short = numpy.arange(tlong, end_time, psd_short_segment)
 
@@ -87,24 +90,19 @@ def calc_psd_variation(strain, psd_short_segment, psd_long_segment,
         psd_short = []
         for tshort in times_short:
             if tshort + psd_short_segment <= end_time:
-                pshort = pycbc.psd.welch(
+                pshort = estimator.welch(
                             strain.time_slice(tshort, tshort +
                                               psd_short_segment),
-                            seg_len=int(short_psd_duration *
-                                        strain.sample_rate),
-                            seg_stride=int(short_psd_stride *
-                                           strain.sample_rate),
+                            seg_len=seg_len, seg_stride=seg_stride,
                             avg_method=psd_avg_method)
             else:
-                pshort = pycbc.psd.welch(
+                pshort = estimator.welch(
                             strain.time_slice(tshort - psd_short_segment,
                                               end_time),
-                            seg_len=int(short_psd_duration *
-                                        strain.sample_rate),
-                            seg_stride=int(short_psd_stride *
-                                           strain.sample_rate),
+                            seg_len=seg_len, seg_stride=seg_stride,
                             avg_method=psd_avg_method)
-            psd_short.append(pshort)
+            psd_short.append(pshort.numpy())
+        psd_short = numpy.array(psd_short)
 
         # Estimate the range of the PSD to compare
         kmin = int(low_freq / psd_long.delta_f)
@@ -121,13 +119,11 @@ def calc_psd_variation(strain, psd_short_segment, psd_long_segment,
         weight = numpy.array(
                      freqs[kmin:kmax]**(-7./3.) / psd_long[kmin:kmax])
         weight /= weight.sum()
-        diff = numpy.array([(weight * numpy.array(p_short[kmin:kmax] /
-                             psd_long[kmin:kmax])).sum()
-                             for p_short in psd_short])
+        ratio = psd_short[:, kmin:kmax] / psd_long.numpy()[kmin:kmax]
+        diff = (weight * ratio).sum(axis=1)
 
         # Store variation value
-        for i, val in enumerate(diff):
-            psd_var[ind+i] = val
+        psd_var[ind:ind+len(diff)] = Array(diff, dtype=psd_var.dtype)
 
         ind = ind+len(diff)
 
@@ -36,6 +36,7 @@ import pycbc.fft
 import pycbc.events
 import pycbc.frame
 import pycbc.filter
+from pycbc import scheme as _scheme
 from scipy.signal import kaiserord
 
 def next_power_of_2(n):
@@ -885,11 +886,17 @@ class StrainSegments(object):
     def __init__(self, strain, segment_length=None, segment_start_pad=0,
                  segment_end_pad=0, trigger_start=None, trigger_end=None,
                  filter_inj_only=False, injection_window=None,
-                 allow_zero_padding=False):
+                 allow_zero_padding=False, batch_fft=False):
         """ Determine how to chop up the strain data into smaller segments
             for analysis.
+
+            If `batch_fft` is True, the Fourier segments are computed with
+            batched FFTs into rows of a single aligned block of memory, and
+            are returned as views into it.
         """
         self._fourier_segments = None
+        self._fourier_block = None
+        self.batch_fft = batch_fft
         self.strain = strain
 
         self.delta_t = strain.delta_t
@@ -1034,7 +1041,13 @@ class StrainSegments(object):
         of the segment to analyze for triggers. The value 'cumulative_index'
         indexes from the beginning of the original strain series.
         """
-        if not self._fourier_segments:
+        # The batched block is filled through host views of its memory, so
+        # other schemes transform the segments one at a time
+        batched = self.batch_fft and isinstance(_scheme.mgr.state,
+                                                _scheme.CPUScheme)
+        if not self._fourier_segments and batched:
+            self._fourier_segments = self._batched_fourier_segments()
+        elif not self._fourier_segments:
             self._fourier_segments = []
             for seg_slice, ana in zip(self.segment_slices, self.analyze_slices):
                 if seg_slice.start >= 0 and seg_slice.stop <= len(self.strain):
@@ -1056,6 +1069,91 @@ class StrainSegments(object):
 
         return self._fourier_segments
 
+    # Number of segments Fourier transformed at once in batched mode
+    fft_batch_size = 8
+
+    def _batched_fourier_segments(self):
+        """ Fourier transform the segments in batches into the rows of one
+        block, returning a FrequencySeries view of each row.
+        """
+        num_segs = len(self.segment_slices)
+        tlen = int(self.time_len)
+        flen = tlen // 2 + 1
+        fdtype = complex_same_precision_as(self.strain)
+
+        # Pad the rows so that each segment is aligned like a freshly
+        # allocated array, as the SIMD correlation requires
+        align = pycbc.PYCBC_ALIGNMENT // numpy.dtype(fdtype).itemsize
+        stride = -(-flen // align) * align
+        block = zeros(num_segs * stride, dtype=fdtype)
+        rows = block.numpy().reshape(num_segs, stride)
+
+        nbatch = min(self.fft_batch_size, num_segs)
+        tvec = zeros(nbatch * tlen, dtype=self.strain.dtype)
+        fvec = zeros(nbatch * flen, dtype=fdtype)
+        fft = pycbc.fft.FFT(tvec, fvec, nbatch=nbatch, size=tlen)
+        tin = tvec.numpy().reshape(nbatch, tlen)
+        fout = fvec.numpy().reshape(nbatch, flen)
+
+        data = self.strain.numpy()
+        for i in range(0, num_segs, nbatch):
+            slices = self.segment_slices[i:i + nbatch]
+            tin[:] = 0
+            for j, seg_slice in enumerate(slices):
+                # Segments running off either end are zero padded
+                start = max(seg_slice.start, 0)
+                stop = min(seg_slice.stop, len(data))
+                tin[j, start - seg_slice.start:stop - seg_slice.start] = \
+                    data[start:stop]
+            fft.execute()
+            # Apply the scaling of the function based FFT
+            rows[i:i + len(slices), :flen] = fout[:len(slices)] * self.delta_t
+
+        delta_f = 1.0 / (self.delta_t * tlen)
+        segments = []
+        for i, (seg_slice, ana) in enumerate(zip(self.segment_slices,
+                                                 self.analyze_slices)):
+            freq_seg = FrequencySeries(block[i * stride:i * stride + flen],
+                                       delta_f=delta_f, copy=False)
+            if seg_slice.start >= 0:
+                freq_seg._epoch = self.strain._epoch + \
+                                  seg_slice.start * self.delta_t
+            else:
+                freq_seg._epoch = self.strain._epoch - \
+                                  (-seg_slice.start) * self.delta_t
+            freq_seg.analyze = ana
+            freq_seg.cumulative_index = seg_slice.start + ana.start
+            freq_seg.seg_slice = seg_slice
+            segments.append(freq_seg)
+
+        self._fourier_block = rows[:, :flen]
+        return segments
+
+    def overwhiten_segments(self):
+        """ Divide each Fourier segment in place by the PSD in its `psd`
+        attribute. In batched mode the segments sharing a PSD are divided
+        in a single operation on the block holding them.
+        """
+        segments = self.fourier_segments()
+        if self._fourier_block is None:
+            for seg in segments:
+                seg /= seg.psd
+            return
+
+        groups = {}
+        for i, seg in enumerate(segments):
+            groups.setdefault(id(seg.psd), (seg.psd, []))[1].append(i)
+        for psd, idx in groups.values():
+            # Refuse a mismatched PSD as the per-segment division does,
+            # rather than letting numpy cast the result into the block
+            seg = segments[idx[0]]
+            seg._typecheck(psd)
+            if len(psd) != len(seg):
+                raise ValueError('lengths do not match')
+            if psd.precision != seg.precision:
+                raise TypeError('precisions do not match')
+            self._fourier_block[idx] = self._fourier_block[idx] / psd.numpy()
+
     @classmethod
     def from_cli(cls, opt, strain):
         """Calculate the segmentation of the strain data for analysis from
@@ -1068,7 +1166,8 @@ class StrainSegments(object):
                    trigger_end=opt.trig_end_time,
                    filter_inj_only=opt.filter_inj_only,
                    injection_window=opt.injection_window,
-                   allow_zero_padding=opt.allow_zero_padding)
+                   allow_zero_padding=opt.allow_zero_padding,
+                   batch_fft=opt.batch_fourier_segments)
 
     @classmethod
     def insert_segment_option_group(cls, parser):
@@ -1093,6 +1192,11 @@ class StrainSegments(object):
         segment_group.add_argument("--allow-zero-padding", action='store_true',
                                    help="Allow for zero padding of data to "
                                         "analyze requested times, if needed.")
+        segment_group.add_argument("--batch-fourier-segments",
+                          action='store_true',
+                          help="Fourier transform the segments in batches "
+                               "into a single block of memory. Only used "
+                               "with the CPU processing scheme.")
         # Injection optimization options
         segment_group.add_argument("--filter-inj-only", action='store_true',
                           help="Analyze only segments that contain an injection.")
@@ -1338,6 +1442,12 @@ class StrainBuffer(pycbc.frame.DataBuffer):
         self.psd = None
         self.psds = {}
 
+        # Keeps the PSDs of the Welch segments so that each PSD
+        # re-estimation only transforms the newly arrived data
+        seg_len = int(self.sample_rate * self.psd_segment_length)
+        self.psd_estimator = pycbc.psd.StreamingWelch(seg_len, seg_len // 2,
+                                                      self.psd_samples)
+
         strain_len = int(sample_rate * self.raw_buffer.delta_t * len(self.raw_buffer))
         self.strain = TimeSeries(zeros(strain_len, dtype=numpy.float32),
                                  delta_t=1.0/self.sample_rate,
@@ -1396,11 +1506,7 @@ class StrainBuffer(pycbc.frame.DataBuffer):
     def recalculate_psd(self):
         """ Recalculate the psd
         """
-
-        seg_len = self.sample_rate * self.psd_segment_length
-        e = len(self.strain)
-        s = e - ((self.psd_samples + 1) * self.psd_segment_length / 2) * self.sample_rate
-        psd = pycbc.psd.welch(self.strain[s:e], seg_len=seg_len, seg_stride=seg_len / 2)
+        psd = self.psd_estimator.psd(self.strain)
 
         psd.dist = spa_distance(psd, 1.4, 1.4, self.low_frequency_cutoff) * pycbc.DYN_RANGE_FAC
 
@@ -1417,12 +1523,11 @@ class StrainBuffer(pycbc.frame.DataBuffer):
                 logging.info("%s PSD is CRAZY, aborting!!!!, %s-%s",
                              self.detector, self.psd.dist, psd.dist)
                 self.psd = psd
-                self.psds = {}
                 return False
 
-        # If the new estimate replaces the current one, invalide the ineterpolate PSDs
+        # If the new estimate replaces the current one, the interpolated PSDs
+        # are refreshed from it when next used
         self.psd = psd
-        self.psds = {}
         logging.info("Recalculating %s PSD, %s", self.detector, psd.dist)
         return True
 
@@ -1446,20 +1551,28 @@ class StrainBuffer(pycbc.frame.DataBuffer):
             s = int(e - buffer_length * self.sample_rate - self.reduced_pad * 2)
             fseries = make_frequency_series(self.strain[s:e])
 
-            # we haven't calculated a resample psd for this delta_f
-            if delta_f not in self.psds:
-                psdt = pycbc.psd.interpolate(self.psd, fseries.delta_f)
-                psdt = pycbc.psd.inverse_spectrum_truncation(psdt,
+            # we haven't calculated a resample psd for this delta_f from
+            # the current psd. An entry made from an older psd is rebuilt
+            # from scratch; entries are only reused while the psd they were
+            # made from is still current.
+            if delta_f not in self.psds or \
+                    self.psds[delta_f].source is not self.psd:
+                psd = pycbc.psd.interpolate(self.psd, delta_f)
+                psd = pycbc.psd.inverse_spectrum_truncation(psd,
                                        int(self.sample_rate * self.psd_inverse_length),
                                        low_frequency_cutoff=self.low_frequency_cutoff)
-                psdt._delta_f = fseries.delta_f
 
-                psd = pycbc.psd.interpolate(self.psd, delta_f)
-                psd = pycbc.psd.inverse_spectrum_truncation(psd,
+                if fseries.delta_f == delta_f and len(fseries) == len(psd):
+                    psdt = psd
+                else:
+                    psdt = pycbc.psd.interpolate(self.psd, fseries.delta_f)
+                    psdt = pycbc.psd.inverse_spectrum_truncation(psdt,
                                        int(self.sample_rate * self.psd_inverse_length),
                                        low_frequency_cutoff=self.low_frequency_cutoff)
+                    psdt._delta_f = fseries.delta_f
 
                 psd.psdt = psdt
+                psd.source = self.psd
                 self.psds[delta_f] = psd
 
             psd = self.psds[delta_f]
@@ -1514,6 +1627,8 @@ class StrainBuffer(pycbc.frame.DataBuffer):
         # We should roll this off at some point too...
         self.strain[len(self.strain) - csize + self.corruption:] = 0
         self.strain.start_time += blocksize
+        self.psd_estimator.invalidate(self.strain,
+                                      len(self.strain) - csize + self.corruption)
 
         # The next time we need strain will need to be tapered
         self.taper_immediate_strain = True
@@ -1597,6 +1712,8 @@ class StrainBuffer(pycbc.frame.DataBuffer):
         self.strain.roll(-sample_step)
         self.strain[len(self.strain) - csize + self.corruption:] = strain[:]
         self.strain.start_time += blocksize
+        self.psd_estimator.invalidate(self.strain,
+                                      len(self.strain) - csize + self.corruption)
 
         # apply gating if need be: NOT YET IMPLEMENTED
         if self.psd is None and self.wait_duration <=0:
@@ -27,6 +27,7 @@ from pycbc.types import zeros, real_same_precision_as, TimeSeries, complex_same_
 from pycbc.filter import sigmasq_series, make_frequency_series, matched_filter_core, get_cutoff_indices
 from pycbc.scheme import schemed
 import pycbc.pnutils
+from pycbc.opt import LRUCache, content_hash
 
 BACKEND_PREFIX="pycbc.vetoes.chisq_"
 
@@ -303,7 +304,8 @@ class SingleDetPowerChisq(object):
     """Class that handles precomputation and memory management for efficiently
     running the power chisq in a single detector inspiral analysis.
     """
-    def __init__(self, num_bins=0, snr_threshold=None):
+    def __init__(self, num_bins=0, snr_threshold=None,
+                 bin_cache_bytes=2**24):
         if not (num_bins == "0" or num_bins == 0):
             self.do = True
             self.column_name = "chisq"
@@ -312,6 +314,7 @@ class SingleDetPowerChisq(object):
         else:
             self.do = False
         self.snr_threshold = snr_threshold
+        self.bin_cache_bytes = bin_cache_bytes
 
     @staticmethod
     def parse_option(row, arg):
@@ -321,30 +324,62 @@ class SingleDetPowerChisq(object):
         safe_dict.update(pycbc.pnutils.__dict__)
         return eval(arg, {"__builtins__":None}, safe_dict)
 
-    def cached_chisq_bins(self, template, psd):
-        from pycbc.opt import LimitedSizeDict
-
-        key = id(psd)
-        if not hasattr(psd, '_chisq_cached_key'):
-            psd._chisq_cached_key = {}
-
-        if not hasattr(template, '_bin_cache'):
-            template._bin_cache = LimitedSizeDict(size_limite=2**2)
+    def calculate_chisq_bins(self, template, psd, num_bins=None):
+        """ Obtain the chisq bins for this template and PSD.
 
-        if key not in template._bin_cache or id(template.params) not in psd._chisq_cached_key:
-            psd._chisq_cached_key[id(template.params)] = True
+        The cumulative power is taken from the filter norm of the PSD, or
+        from the weighted template power already computed by
+        `sigma_cached`, before falling back to recomputing it from scratch.
+        """
+        if num_bins is None:
             num_bins = int(self.parse_option(template, self.num_bins))
 
-            if hasattr(psd, 'sigmasq_vec') and template.approximant in psd.sigmasq_vec:
-                kmin = int(template.f_lower / psd.delta_f)
-                kmax = template.end_idx
-                bins = power_chisq_bins_from_sigmasq_series(
-                    psd.sigmasq_vec[template.approximant], num_bins, kmin, kmax)
-            else:
-                bins = power_chisq_bins(template, num_bins, psd, template.f_lower)
-            template._bin_cache[key] = bins
+        if hasattr(psd, 'sigmasq_vec') and \
+                                       template.approximant in psd.sigmasq_vec:
+            kmin = int(template.f_lower / psd.delta_f)
+            kmax = template.end_idx
+            bins = power_chisq_bins_from_sigmasq_series(
+                   psd.sigmasq_vec[template.approximant], num_bins, kmin, kmax)
+        elif hasattr(template, 'sigma_view') and \
+                getattr(psd, 'invsqrt_slice', None) == template.sslice and \
+                template.sslice.start <= int(template.f_lower /
+                                             template.delta_f):
+            # Reuse the weighted power from sigma_cached. This is only valid
+            # if psd.invsqrt was built over the same slice as sigma_view,
+            # which sigma_cached records in psd.invsqrt_slice. The template
+            # is zero above sslice, so the cumulative power is flat there
+            # and only the final edge needs to extend to the end of the
+            # vector.
+            kmin, kmax = get_cutoff_indices(template.f_lower, None,
+                                            template.delta_f,
+                                            (len(template) - 1) * 2)
+            start = kmin - template.sslice.start
+            power = template.sigma_view.numpy()[start:] * \
+                    psd.invsqrt.numpy()[start:]
+            sigma_vec = power.cumsum()
+            edge_vec = numpy.arange(0, num_bins) * sigma_vec[-1] / num_bins
+            bins = numpy.searchsorted(sigma_vec, edge_vec, side='right')
+            bins = numpy.append(bins + kmin, kmax)
+        else:
+            bins = power_chisq_bins(template, num_bins, psd, template.f_lower)
+        return bins
 
-        return template._bin_cache[key]
+    def cached_chisq_bins(self, template, psd):
+        """ Obtain the chisq bins for this template and PSD, reusing bins
+        computed for the same template, PSD contents and number of bins.
+        """
+        num_bins = int(self.parse_option(template, self.num_bins))
+        key = (template.params.template_hash, template.f_lower,
+               content_hash(psd), num_bins)
+
+        # Subclasses (e.g. SingleDetSGChisq) do not always call __init__
+        if not hasattr(self, '_bin_cache'):
+            self._bin_cache = LRUCache(getattr(self, 'bin_cache_bytes',
+                                               2**24))
+        if key not in self._bin_cache:
+            self._bin_cache[key] = self.calculate_chisq_bins(template, psd,
+                                                             num_bins)
+        return self._bin_cache[key]
 
     def values(self, corr, snrv, snr_norm, psd, indices, template):
         """ Calculate the chisq at points given by indices.
@@ -399,21 +434,6 @@ class SingleDetSkyMaxPowerChisq(SingleDetPowerChisq):
         self.template_mem = None
         self.corr_mem = None
 
-    def calculate_chisq_bins(self, template, psd):
-        """ Obtain the chisq bins for this template and PSD.
-        """
-        num_bins = int(self.parse_option(template, self.num_bins))
-        if hasattr(psd, 'sigmasq_vec') and \
-                                       template.approximant in psd.sigmasq_vec:
-            kmin = int(template.f_lower / psd.delta_f)
-            kmax = template.end_idx
-            bins = power_chisq_bins_from_sigmasq_series(
-                   psd.sigmasq_vec[template.approximant], num_bins, kmin, kmax)
-        else:
-            bins = power_chisq_bins(template, num_bins, psd, template.f_lower)
-        return bins
-
-
     def values(self, corr_plus, corr_cross, snrv, psd,
                indices, template_plus, template_cross, u_vals,
                hplus_cross_corr, hpnorm, hcnorm):
@@ -28,7 +28,9 @@ This module provides classes that describe banks of waveforms
 import types
 import logging
 import os.path
+import threading
 import h5py
+from six.moves import queue
 from copy import copy
 import numpy as np
 from glue.ligolw import ligolw, table, lsctables, utils as ligolw_utils
@@ -38,6 +40,7 @@ import pycbc.waveform.compress
 from pycbc import DYN_RANGE_FAC
 from pycbc.types import FrequencySeries, zeros
 import pycbc.io
+from pycbc.scheme import mgr, CPUScheme
 
 def sigma_cached(self, psd):
     """ Cache sigma calculate for use in tandem with the FilterBank class
@@ -84,6 +87,7 @@ def sigma_cached(self, psd):
 
             if not hasattr(psd, 'invsqrt'):
                 psd.invsqrt = 1.0 / psd[self.sslice]
+                psd.invsqrt_slice = self.sslice
 
             self._sigmasq[key] = self.sigma_view.inner(psd.invsqrt)
     return self._sigmasq[key]
@@ -620,6 +624,10 @@ class FilterBank(TemplateBank):
         super(FilterBank, self).__init__(filename, approximant=approximant,
             parameters=parameters, **kwds)
         self.ensure_standard_filter_columns(low_frequency_cutoff=low_frequency_cutoff)
+        self._prefetch_thread = None
+        # FFTW planning is not thread safe, so templates are generated by
+        # one thread at a time
+        self._generate_lock = threading.Lock()
 
     def get_decompressed_waveform(self, tempout, index, f_lower=None,
                                   approximant=None, df=None):
@@ -697,6 +705,104 @@ class FilterBank(TemplateBank):
                 distance=1./DYN_RANGE_FAC, delta_t=1./(2.*max_freq))
         return htilde
 
+    def start_prefetch(self, indices, num_buffers=2):
+        """Generate templates ahead of their use in a background thread.
+
+        The templates with the given indices are generated, in order, into
+        a bounded set of preallocated buffers while the caller filters
+        earlier templates. Requesting one of these templates from the bank
+        then only requires copying it into the output memory. Templates
+        which are not requested in order are generated on demand as usual.
+
+        Only the CPU processing scheme is supported, as the templates are
+        generated outside of the thread holding the scheme context.
+
+        Parameters
+        ----------
+        indices : list of ints
+            The indices of the templates, in the order in which they will be
+            requested.
+        num_buffers : {2, int}
+            The maximum number of templates generated ahead of their use.
+        """
+        if not isinstance(mgr.state, CPUScheme):
+            raise ValueError("Templates can only be prefetched with the CPU "
+                             "processing scheme")
+        self.stop_prefetch()
+        self._prefetch_free = queue.Queue()
+        self._prefetch_ready = queue.Queue()
+        self._prefetch_stop = threading.Event()
+        for _ in range(num_buffers):
+            self._prefetch_free.put(zeros(self.filter_length, dtype=self.dtype))
+        self._prefetch_order = dict((index, i) for i, index in enumerate(indices))
+        self._prefetch_pos = 0
+
+        self._prefetch_thread = threading.Thread(target=self._prefetch_worker,
+                                                 args=(list(indices),))
+        self._prefetch_thread.daemon = True
+        self._prefetch_thread.start()
+
+    def stop_prefetch(self):
+        """Stop generating templates in the background, if doing so."""
+        if self._prefetch_thread is None:
+            return
+        self._prefetch_stop.set()
+        # Make sure the worker is not blocked waiting for a free buffer
+        self._prefetch_free.put(None)
+        self._prefetch_thread.join()
+        self._prefetch_thread = None
+
+    def _prefetch_worker(self, indices):
+        for index in indices:
+            tempout = self._prefetch_free.get()
+            if tempout is None or self._prefetch_stop.is_set():
+                return
+            try:
+                with self._generate_lock:
+                    htilde = self._generate(index, tempout)
+            except Exception as e: # pylint:disable=broad-except
+                self._prefetch_ready.put((index, None, e))
+                return
+            self._prefetch_ready.put((index, htilde, tempout))
+
+    def _get_prefetched(self, index, tempout):
+        """Return the template with the given index from the prefetch queue
+        copied into tempout, or None if it will not be prefetched.
+        """
+        pos = self._prefetch_order.get(index)
+        if pos is None or pos < self._prefetch_pos:
+            return None
+
+        while True:
+            pindex, htilde, buf = self._prefetch_ready.get()
+            self._prefetch_pos += 1
+            if htilde is None:
+                # The worker stopped at the template it failed to generate.
+                # Its error belongs to that template only, so a later one is
+                # generated on demand.
+                self._prefetch_thread = None
+                if pindex == index:
+                    raise buf
+                return None
+            if pindex == index:
+                break
+            # Skip templates that were not requested
+            self._prefetch_free.put(buf)
+
+        poke  = tempout.data # pylint:disable=unused-variable
+        tempout.clear()
+        tempout[0:len(htilde)] = htilde
+        out = FrequencySeries(tempout[0:len(htilde)], delta_f=htilde.delta_f,
+                              epoch=htilde.epoch, copy=False)
+        for attr in ['f_lower', 'min_f_lower', 'end_idx', 'params',
+                     'chirp_length', 'length_in_time', 'approximant',
+                     'end_frequency']:
+            setattr(out, attr, getattr(htilde, attr))
+
+        # Return the buffer so that the next template can be generated
+        self._prefetch_free.put(buf)
+        return out
+
     def __getitem__(self, index):
         # Make new memory for templates if we aren't given output memory
         if self.out is None:
@@ -704,6 +810,20 @@ class FilterBank(TemplateBank):
         else:
             tempout = self.out
 
+        htilde = None
+        if self._prefetch_thread is not None:
+            htilde = self._get_prefetched(index, tempout)
+        if htilde is None:
+            with self._generate_lock:
+                htilde = self._generate(index, tempout)
+
+        # Add sigmasq as a method of this instance
+        htilde.sigmasq = types.MethodType(sigma_cached, htilde)
+        htilde._sigmasq = {}
+        return htilde
+
+    def _generate(self, index, tempout):
+        """Generate the template with the given index into tempout"""
         approximant = self.approximant(index)
         f_end = self.end_frequency(index)
         if f_end is None or f_end >= (self.filter_length * self.delta_f):
@@ -757,10 +877,6 @@ class FilterBank(TemplateBank):
         htilde.length_in_time = ttotal
         htilde.approximant = approximant
         htilde.end_frequency = f_end
-
-        # Add sigmasq as a method of this instance
-        htilde.sigmasq = types.MethodType(sigma_cached, htilde)
-        htilde._sigmasq = {}
         return htilde
 
 def find_variable_start_frequency(approximant, parameters, f_start, max_length,
@@ -125,6 +125,81 @@ class TestChisq(unittest.TestCase):
             max_diff = max(abs(chisq_full[ifo] - chisq_quick[ifo]))
             self.assertTrue(max_diff < 1E-5)
 
+    def test_cached_bins(self):
+        from pycbc.vetoes import SingleDetPowerChisq
+        from pycbc.io.record import FieldArray
+        power_chisq = SingleDetPowerChisq(num_bins=26)
+        self.hp.f_lower = 20.0
+        self.hp.approximant = 'IMRPhenomD'
+        self.hp.params = FieldArray.from_kwargs(template_hash=[1234])[0]
+        for ifo in self.ifos:
+            bins = power_chisq.cached_chisq_bins(self.hp, self.psd[ifo])
+            ref = power_chisq_bins(self.hp, 26, self.psd[ifo],
+                                   low_frequency_cutoff=20.0)
+            self.assertTrue((numpy.array(bins) == numpy.array(ref)).all())
+
+            # A PSD with the same contents reuses the cached bins
+            psd = self.psd[ifo].copy()
+            self.assertTrue(power_chisq.cached_chisq_bins(self.hp, psd)
+                            is bins)
+
+    def test_sigma_cached_bins(self):
+        import types
+        from pycbc.vetoes import SingleDetPowerChisq
+        from pycbc.waveform.bank import sigma_cached
+        power_chisq = SingleDetPowerChisq(num_bins=26)
+        for ifo in self.ifos:
+            hp = self.hp.copy()
+            hp.f_lower = hp.min_f_lower = 20.0
+            hp.end_frequency = None
+            hp.approximant = 'IMRPhenomD'
+            hp.sigmasq = types.MethodType(sigma_cached, hp)
+            psd = self.psd[ifo].copy()
+
+            # Computing sigma first leaves sigma_view and psd.invsqrt behind,
+            # which the bin calculation then reuses
+            hp.sigmasq(psd)
+            self.assertEqual(psd.invsqrt_slice, hp.sslice)
+            bins = power_chisq.calculate_chisq_bins(hp, psd, 26)
+            ref = power_chisq_bins(hp, 26, psd, low_frequency_cutoff=20.0)
+            self.assertTrue((numpy.array(bins) == numpy.array(ref)).all())
+
+            # An inverse PSD built over a different slice is not reused
+            psd.invsqrt_slice = slice(hp.sslice.start + 1, hp.sslice.stop)
+            bins = power_chisq.calculate_chisq_bins(hp, psd, 26)
+            self.assertTrue((numpy.array(bins) == numpy.array(ref)).all())
+
+    def test_sg_chisq(self):
+        from pycbc.vetoes.sgchisq import SingleDetSGChisq
+        from pycbc.io.record import FieldArray
+
+        class Bank(object):
+            table = FieldArray.from_kwargs(template_hash=[1234],
+                                           mtotal=[62.72])
+
+        sg_chisq = SingleDetSGChisq(Bank(), num_bins=26, snr_threshold=0,
+                                    chisq_locations=['mtotal>40:20-30,20-45'])
+        self.hp.f_lower = 20.0
+        self.hp.approximant = 'IMRPhenomD'
+        self.hp.params = Bank.table[0]
+        indices = numpy.arange(27402, 27492)
+        for ifo in self.ifos:
+            stilde = self.data[ifo].to_frequencyseries()
+            stilde /= self.psd[ifo]
+            snrv = self.snr_unnorm[ifo][indices].data
+            bins = power_chisq_bins(self.hp, 26, self.psd[ifo],
+                                    low_frequency_cutoff=20.0)
+            bchisq = power_chisq_at_points_from_precomputed(
+                self.corr[ifo], snrv, self.norm[ifo], bins, indices=indices)
+            bchisq_dof = numpy.zeros(len(indices)) + 50
+
+            chisq = sg_chisq.values(stilde, self.hp, self.psd[ifo], snrv,
+                                    self.norm[ifo], bchisq, bchisq_dof,
+                                    indices)
+            self.assertEqual(len(chisq), len(indices))
+            self.assertTrue(numpy.isfinite(chisq).all())
+            self.assertTrue((chisq >= 0).all())
+
 
 suite = unittest.TestSuite()
 suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestChisq))
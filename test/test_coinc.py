@@ -0,0 +1,186 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for the pycbc.events.coinc module
+"""
+import unittest, numpy
+from numpy.random import uniform, seed
+from pycbc.events import coinc
+from utils import simple_exit
+seed(0)
+
+
+def brute_time_coincidence(t1, t2, window, slide_step=0):
+    pairs = set()
+    for i, a in enumerate(t1):
+        for j, b in enumerate(t2):
+            if slide_step:
+                diff = (a - b) / slide_step
+                slide = numpy.rint(diff)
+                if abs(a - b - slide * slide_step) < window:
+                    pairs.add((i, j, int(slide)))
+            elif abs(a - b) < window:
+                pairs.add((i, j, 0))
+    return pairs
+
+
+class TestCoinc(unittest.TestCase):
+    def setUp(self):
+        self.t1 = uniform(1126000000.0, 1126001000.0, size=300)
+        self.t2 = uniform(1126000000.0, 1126001000.0, size=200)
+
+    def test_time_coincidence(self):
+        for window, slide_step in [(0.5, 0), (0.015, 0.1), (0.015, 1.0)]:
+            idx1, idx2, slide = coinc.time_coincidence(self.t1, self.t2,
+                                                       window, slide_step)
+            found = set(zip(idx1.tolist(), idx2.tolist(), slide.tolist()))
+            expected = brute_time_coincidence(self.t1, self.t2, window,
+                                              slide_step)
+            self.assertEqual(found, expected)
+
+    def test_time_coincidence_chunks(self):
+        idx1, idx2, slide = coinc.time_coincidence(self.t1, self.t2,
+                                                   0.015, 0.1)
+        engine = coinc.TimeCoincidenceEngine(self.t2, 0.015, 0.1)
+        chunks = list(engine.iter_coincidences(self.t1, 37))
+        found = set()
+        for cidx1, cidx2, cslide in chunks:
+            found.update(zip(cidx1.tolist(), cidx2.tolist(), cslide.tolist()))
+        self.assertEqual(found, set(zip(idx1.tolist(), idx2.tolist(),
+                                        slide.tolist())))
+
+    def test_cluster_over_time(self):
+        # A generic argmax uses the reference implementation
+        def argmax(v):
+            return numpy.argmax(v)
+
+        stat = uniform(0, 10, size=len(self.t1))
+        for window in [0.1, 1.0, 10.0]:
+            cidx = coinc.cluster_over_time(stat, self.t1, window)
+            ref = coinc.cluster_over_time(stat, self.t1, window, argmax)
+            self.assertTrue((cidx == ref).all())
+
+    def test_cluster_coincs(self):
+        def argmax(v):
+            return numpy.argmax(v)
+
+        stat = uniform(0, 10, size=len(self.t1))
+        tslide = numpy.random.randint(-5, 5, size=len(self.t1))
+        time2 = self.t1 - tslide * 0.1
+        cidx = coinc.cluster_coincs(stat, self.t1, time2, tslide, 0.1, 1.0)
+        ref = coinc.cluster_coincs(stat, self.t1, time2, tslide, 0.1, 1.0,
+                                   argmax=argmax)
+        self.assertEqual(set(cidx), set(ref))
+
+    def test_timeslide_durations(self):
+        from pycbc.events import veto
+        start1 = numpy.sort(uniform(0, 10000, size=50))
+        end1 = start1 + uniform(0, 300, size=50)
+        start2 = numpy.sort(uniform(0, 10000, size=40))
+        end2 = start2 + uniform(0, 300, size=40)
+        offsets = numpy.arange(-50, 50) * 7.0
+
+        durations = coinc.timeslide_durations(start1, start2, end1, end2,
+                                              offsets)
+        seg2 = veto.start_end_to_segments(start2, end2).coalesce()
+        for offset, duration in zip(offsets, durations):
+            seg1 = veto.start_end_to_segments(start1 + offset,
+                                              end1 + offset).coalesce()
+            self.assertAlmostEqual(abs((seg1 & seg2).coalesce()), duration,
+                                   places=6)
+
+    def test_louder_index(self):
+        bstat = uniform(0, 10, size=1000)
+        dec = numpy.random.randint(1, 5, size=1000)
+        fstat = uniform(0, 11, size=50)
+        index = coinc.LouderIndex(bstat, dec)
+
+        def reference(bstat, dec):
+            return numpy.array([dec[bstat >= f].sum() for f in fstat])
+
+        self.assertTrue(numpy.allclose(index.n_louder(fstat),
+                                       reference(bstat, dec)))
+
+        # Remove some events and insert new ones
+        index.remove(bstat[:10])
+        new_stat = uniform(0, 10, size=20)
+        index.insert(new_stat)
+        bstat = numpy.concatenate([bstat[10:], new_stat])
+        dec = numpy.concatenate([dec[10:], numpy.ones(20)])
+        self.assertTrue(numpy.allclose(index.n_louder(fstat),
+                                       reference(bstat, dec)))
+        self.assertTrue(numpy.allclose(index.ifar(fstat, 100.),
+                                       100. / (reference(bstat, dec) + 1)))
+
+    def test_multi_detector_coincidence(self):
+        from pycbc.detector import Detector
+        ifos = ['H1', 'L1', 'V1']
+        times = {ifo: uniform(0, 100, size=100) for ifo in ifos}
+        # Dense enough that some coincs have several V1 triggers
+        times['V1'] = uniform(0, 100, size=2000)
+        slop = 0.003
+
+        dets = {ifo: Detector(ifo) for ifo in ifos}
+        def win(ifo1, ifo2):
+            return dets[ifo1].light_travel_time_to_detector(dets[ifo2]) + slop
+
+        ids, slide = coinc.multi_detector_coincidence(times, 0.2, slop,
+                                                      'H1', 'L1')
+        found = set(zip(ids['H1'].tolist(), ids['L1'].tolist(),
+                        ids['V1'].tolist(), slide.tolist()))
+
+        expected = set()
+        pid, fid, pslide = coinc.time_coincidence(times['H1'], times['L1'],
+                                                  win('H1', 'L1'), 0.2)
+        for p, f, s in zip(pid, fid, pslide):
+            ptime = times['H1'][p] - 0.2 * s
+            vtime = times['V1']
+            match = ((abs(vtime - ptime) < win('H1', 'V1')) &
+                     (abs(vtime - times['L1'][f]) < win('L1', 'V1')))
+            for v in match.nonzero()[0]:
+                expected.add((p, f, v, s))
+        self.assertEqual(found, expected)
+
+        # Keeping one coinc for each pivot and fixed coinc picks the
+        # earliest consistent third detector trigger
+        ids, slide = coinc.multi_detector_coincidence(times, 0.2, slop,
+                                                      'H1', 'L1',
+                                                      all_combinations=False)
+        found = list(zip(ids['H1'].tolist(), ids['L1'].tolist(),
+                         ids['V1'].tolist(), slide.tolist()))
+        first = {}
+        for p, f, v, s in expected:
+            if (p, f, s) not in first or \
+                    times['V1'][v] < times['V1'][first[(p, f, s)]]:
+                first[(p, f, s)] = v
+        self.assertTrue(len(first) < len(expected))
+        self.assertEqual(len(found), len(first))
+        self.assertEqual(set(found),
+                         set((p, f, v, s) for (p, f, s), v in first.items()))
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestCoinc))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
@@ -0,0 +1,139 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unit-tests for the persistent wisdom cache of the
+pycbc.fft.fftw subpackage.
+"""
+import os, shutil, tempfile, time, unittest
+from sys import exit as _exit
+import pycbc.fft
+from pycbc.types import zeros, complex128
+from utils import parse_args_cpu_only, simple_exit
+
+parse_args_cpu_only("FFTW wisdom cache")
+
+if 'fftw' in pycbc.fft.get_backend_names():
+    import pycbc.fft.fftw as fftw
+else:
+    print("FFTW does not seem to be an available CPU backend; skipping wisdom cache tests")
+    _exit(0)
+
+
+class TestWisdomCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.max_size = fftw._wisdom_cache_max_size
+        fftw.enable_wisdom_cache(self.cache_dir, mlvl=1)
+
+    def tearDown(self):
+        fftw._wisdom_cache_dir = None
+        fftw._wisdom_cache_max_size = self.max_size
+        fftw._wisdom_cache_mlvl = None
+        fftw._wisdom_cache_pending.clear()
+        fftw._wisdom_cache_seen.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def write_entry(self, name, size, mtime):
+        path = os.path.join(self.cache_dir, name)
+        with open(path, 'w') as f:
+            f.write('x' * size)
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def transform(self):
+        fftw.fft(zeros(1458, dtype=complex128),
+                 zeros(1458, dtype=complex128), None, None, None)
+
+    def test_write(self):
+        # Plan a transform that is not in the cache
+        self.transform()
+        self.assertEqual(len(fftw._wisdom_cache_pending), 1)
+        fname = list(fftw._wisdom_cache_pending.keys())[0]
+        wisdom = fftw._wisdom_cache_pending[fname]
+
+        fftw.write_wisdom_cache()
+        self.assertEqual(os.listdir(self.cache_dir),
+                         [os.path.basename(fname)])
+        with open(fname) as f:
+            self.assertEqual(f.read(), wisdom)
+        self.assertEqual(len(fftw._wisdom_cache_pending), 0)
+
+        # The entry can be read by other users of a shared cache
+        umask = os.umask(0)
+        os.umask(umask)
+        self.assertEqual(os.stat(fname).st_mode & 0o777, 0o644 & ~umask)
+
+        # A later process imports the entry, which marks it as recently
+        # used, and has nothing more to write for it
+        now = time.time()
+        os.utime(fname, (now - 1000, now - 1000))
+        fftw._wisdom_cache_seen.clear()
+        self.transform()
+        self.assertEqual(len(fftw._wisdom_cache_pending), 0)
+        self.assertTrue(os.stat(fname).st_mtime > now - 10)
+
+    def test_measure_level(self):
+        # The measure level of the cache is only a minimum if one is given
+        key = ('test', 1458)
+        self.assertEqual(fftw._wisdom_cache_prepare('double', key, 0)[0], 1)
+        self.assertEqual(fftw._wisdom_cache_prepare('double', key, 2)[0], 2)
+        fftw.enable_wisdom_cache(self.cache_dir)
+        self.assertEqual(fftw._wisdom_cache_prepare('double', key, 0)[0], 0)
+
+    def test_failed_write(self):
+        # An entry that cannot be renamed into place leaves no temporary
+        # file in the cache
+        fname = os.path.join(self.cache_dir, 'missing', 'double-x.wisdom')
+        fftw._wisdom_cache_pending[fname] = 'wisdom'
+        fftw.write_wisdom_cache()
+        self.assertEqual(os.listdir(self.cache_dir), [])
+        self.assertEqual(len(fftw._wisdom_cache_pending), 0)
+
+    def test_eviction(self):
+        now = time.time()
+        old = self.write_entry('double-old.wisdom', 400, now - 300)
+        mid = self.write_entry('float-mid.wisdom', 400, now - 200)
+        new = self.write_entry('double-new.wisdom', 400, now - 100)
+        other = self.write_entry('notes.txt', 1000, now - 400)
+
+        # Nothing is removed while the cache is within its size
+        fftw.enable_wisdom_cache(self.cache_dir, max_size=1200, mlvl=1)
+        fftw.write_wisdom_cache()
+        self.assertEqual(len(os.listdir(self.cache_dir)), 4)
+
+        # The least recently used entries are removed first, and files
+        # which are not cache entries are left alone
+        fftw.enable_wisdom_cache(self.cache_dir, max_size=500, mlvl=1)
+        fftw.write_wisdom_cache()
+        self.assertFalse(os.path.exists(old))
+        self.assertFalse(os.path.exists(mid))
+        self.assertTrue(os.path.exists(new))
+        self.assertTrue(os.path.exists(other))
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestWisdomCache))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
@@ -0,0 +1,119 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for the template generation of
+pycbc.waveform.bank.FilterBank
+"""
+import os, shutil, tempfile, unittest
+import h5py, numpy
+from pycbc.types import zeros, complex64
+from pycbc.waveform.bank import FilterBank
+from utils import simple_exit
+
+
+class TestFilterBank(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bank_file = os.path.join(self.tmpdir, 'bank.hdf')
+        numpy.random.seed(0)
+        num = 6
+        with h5py.File(self.bank_file, 'w') as f:
+            f['mass1'] = numpy.random.uniform(5, 10, size=num)
+            f['mass2'] = numpy.random.uniform(5, 10, size=num)
+            f['spin1z'] = numpy.random.uniform(-0.5, 0.5, size=num)
+            f['spin2z'] = numpy.random.uniform(-0.5, 0.5, size=num)
+        self.filter_length = 4097
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def bank(self, out=None):
+        return FilterBank(self.bank_file, self.filter_length, 0.25,
+                          complex64, out=out, approximant='TaylorF2',
+                          low_frequency_cutoff=30.)
+
+    def check_template(self, htilde, index):
+        ref = self.ref_bank._generate(index, zeros(self.filter_length,
+                                                   dtype=complex64))
+        self.assertEqual(len(htilde), len(ref))
+        self.assertEqual(htilde.delta_f, ref.delta_f)
+        self.assertTrue((htilde.numpy() == ref.numpy()).all())
+        for attr in ['f_lower', 'min_f_lower', 'end_idx', 'chirp_length',
+                     'length_in_time', 'approximant', 'end_frequency']:
+            self.assertEqual(getattr(htilde, attr), getattr(ref, attr),
+                             msg=attr)
+        self.assertEqual(htilde.params.template_hash,
+                         ref.params.template_hash)
+        self.assertEqual(htilde.sigmasq.__name__, 'sigma_cached')
+
+    def test_prefetch(self):
+        self.ref_bank = self.bank()
+        # Reuse one output buffer, as pycbc_inspiral does
+        bank = self.bank(out=zeros(self.filter_length, dtype=complex64))
+        bank.start_prefetch([0, 1, 2, 3, 4, 5], num_buffers=2)
+
+        # Templates 1 and 4 are skipped over, and those passed or never
+        # prefetched are generated on demand
+        for index in [0, 2, 3, 1, 5, 4, 3]:
+            self.check_template(bank[index], index)
+        self.assertTrue(bank._prefetch_thread is not None)
+        bank.stop_prefetch()
+        self.assertTrue(bank._prefetch_thread is None)
+
+    def test_prefetch_error(self):
+        self.ref_bank = self.bank()
+        bank = self.bank()
+        bank.start_prefetch([0, 100], num_buffers=1)
+        self.check_template(bank[0], 0)
+        # The error of generating a template is raised when it is requested
+        self.assertRaises(IndexError, bank.__getitem__, 100)
+        self.assertTrue(bank._prefetch_thread is None)
+        self.check_template(bank[1], 1)
+
+    def test_prefetch_skipped_error(self):
+        self.ref_bank = self.bank()
+        bank = self.bank()
+        bank.start_prefetch([0, 100, 2], num_buffers=1)
+        self.check_template(bank[0], 0)
+        # Template 100 is never requested, so its error is not raised and
+        # the next template is generated on demand
+        self.check_template(bank[2], 2)
+        self.assertTrue(bank._prefetch_thread is None)
+
+    def test_prefetch_off_cpu(self):
+        from pycbc.scheme import mgr, Scheme
+        bank = self.bank()
+        state = mgr.state
+        mgr.shift_to(Scheme.__new__(Scheme))
+        try:
+            self.assertRaises(ValueError, bank.start_prefetch, [0, 1])
+        finally:
+            mgr.shift_to(state)
+        self.assertTrue(bank._prefetch_thread is None)
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestFilterBank))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
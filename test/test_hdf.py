@@ -0,0 +1,281 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for reading trigger files with pycbc.io.hdf
+"""
+import os, shutil, tempfile, unittest
+import h5py, numpy
+from pycbc.io.hdf import HFile, ReadByTemplate, SingleDetTriggers
+from pycbc.io.hdf import store_chunk_stats
+from utils import simple_exit
+
+
+def write_merged(fname, trigs, hashes, contiguous):
+    """ Write triggers in either layout of pycbc_coinc_mergetrigs
+
+    Parameters
+    ----------
+    fname: str
+        Name of the file to write
+    trigs: list of dicts
+        The columns of the triggers of each template, by template id
+    hashes: numpy.ndarray
+        The template hash of each template, which orders the templates in
+        the layout using region references
+    contiguous: bool
+        Write the contiguous template-sorted layout
+    """
+    order = numpy.arange(len(trigs)) if contiguous else hashes.argsort()
+    num = numpy.array([len(t['snr']) for t in trigs])
+    counts = num[order]
+    boundaries = numpy.concatenate([[0], counts.cumsum()])
+    with h5py.File(fname, 'w') as f:
+        f['H1/search/start_time'] = numpy.array([0., 200.])
+        f['H1/search/end_time'] = numpy.array([100., 300.])
+        f['H1/template_id'] = numpy.repeat(order, counts)
+        for col in trigs[0]:
+            f['H1/' + col] = numpy.concatenate([trigs[tid][col]
+                                                for tid in order])
+        if contiguous:
+            f['H1'].attrs['contiguous_templates'] = True
+            f['H1/template_boundaries'] = boundaries
+            return
+
+        # The boundaries of the region reference layout are the start of
+        # each template's triggers, by template id
+        start = numpy.zeros(len(trigs), dtype=int)
+        start[order] = boundaries[:-1]
+        f['H1/template_boundaries'] = start
+        ref_dtype = h5py.special_dtype(ref=h5py.RegionReference)
+        for col in trigs[0]:
+            dset = f['H1/' + col]
+            refs = f.create_dataset('H1/%s_template' % col, (len(trigs),),
+                                    dtype=ref_dtype)
+            for tid in range(len(trigs)):
+                refs[tid] = dset.regionref[start[tid]:start[tid] + num[tid]]
+
+
+class TestReadByTemplate(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        numpy.random.seed(0)
+        self.hashes = numpy.random.permutation(1000)[:20]
+        # Some triggers fall in the gap between the search segments
+        self.trigs = [{'snr': numpy.random.uniform(5, 10, size=num),
+                       'end_time': numpy.random.uniform(0, 300, size=num)}
+                      for num in numpy.random.randint(0, 30, size=20)]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check_layout(self, contiguous):
+        fname = os.path.join(self.tmpdir, 'merged.hdf')
+        write_merged(fname, self.trigs, self.hashes, contiguous)
+        reader = ReadByTemplate(fname)
+        self.assertEqual(reader.contiguous, contiguous)
+        with h5py.File(fname, 'r') as f:
+            for tid, trigs in enumerate(self.trigs):
+                trigger_id = reader.set_template(tid)
+                keep = (trigs['end_time'] < 100) | (trigs['end_time'] > 200)
+                self.assertEqual(len(trigger_id), keep.sum())
+                for col in trigs:
+                    values = numpy.sort(reader[col])
+                    self.assertTrue((values ==
+                                     numpy.sort(trigs[col][keep])).all())
+                    # the trigger ids index the full columns
+                    self.assertTrue((f['H1/' + col][:][trigger_id] ==
+                                     reader[col]).all())
+                self.assertTrue((f['H1/template_id'][:][trigger_id] ==
+                                 tid).all())
+
+    def test_region_references(self):
+        self.check_layout(False)
+
+    def test_contiguous_templates(self):
+        self.check_layout(True)
+
+
+class TestSingleDetTriggers(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        numpy.random.seed(0)
+        num, ntemplates = 500, 20
+        self.trig_file = os.path.join(self.tmpdir, 'trigs.hdf')
+        self.bank_file = os.path.join(self.tmpdir, 'bank.hdf')
+        with h5py.File(self.trig_file, 'w') as f:
+            f['H1/snr'] = numpy.random.uniform(5, 10, size=num)
+            f['H1/chisq'] = numpy.random.uniform(5, 50, size=num)
+            f['H1/chisq_dof'] = numpy.random.randint(5, 20, size=num)
+            f['H1/end_time'] = numpy.random.uniform(0, 1000, size=num)
+            f['H1/template_id'] = numpy.random.randint(0, ntemplates,
+                                                       size=num)
+        with h5py.File(self.bank_file, 'w') as f:
+            f['mass1'] = numpy.random.uniform(1, 10, size=ntemplates)
+            f['mass2'] = numpy.random.uniform(1, 10, size=ntemplates)
+            f['spin1z'] = numpy.zeros(ntemplates)
+            f['spin2z'] = numpy.zeros(ntemplates)
+        self.bool_mask = numpy.random.uniform(size=num) < 0.3
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def triggers(self, mask, lazy, filter_func=None):
+        # copy the mask, which the triggers modify in place
+        mask = mask.copy() if isinstance(mask, numpy.ndarray) else list(mask)
+        return SingleDetTriggers(self.trig_file, self.bank_file, None, None,
+                                 filter_func, 'H1', premask=mask, lazy=lazy,
+                                 chunk_size=7)
+
+    def check_equal(self, trigs, ref, params=('snr', 'end_time',
+                    'template_id', 'mass1', 'mchirp', 'rchisq', 'newsnr')):
+        for param in params:
+            self.assertTrue((getattr(trigs, param) ==
+                             getattr(ref, param)).all(), msg=param)
+        tdict, ref_dict = trigs.trig_dict(), ref.trig_dict()
+        self.assertEqual(sorted(tdict.keys()), sorted(ref_dict.keys()))
+        for key in tdict:
+            self.assertTrue((tdict[key] == ref_dict[key]).all(), msg=key)
+
+    def test_bool_mask(self):
+        self.check_equal(self.triggers(self.bool_mask, True),
+                         self.triggers(self.bool_mask, False))
+
+    def test_list_mask(self):
+        idx = list(numpy.flatnonzero(self.bool_mask))
+        self.check_equal(self.triggers(idx, True),
+                         self.triggers(idx, False))
+
+        # Only the lazy mode reads indices out of order, so compare with
+        # the corresponding reordering of the sorted indices
+        order = numpy.random.permutation(len(idx))
+        trigs = self.triggers(numpy.array(idx)[order], True)
+        ref = self.triggers(idx, False)
+        for param in ('snr', 'template_id', 'mass1', 'newsnr'):
+            self.assertTrue((getattr(trigs, param) ==
+                             getattr(ref, param)[order]).all(), msg=param)
+
+    def test_apply_mask(self):
+        for mask in (self.bool_mask, list(numpy.flatnonzero(self.bool_mask))):
+            trigs = self.triggers(mask, True)
+            ref = self.triggers(mask, False)
+            # fill the cache of the lazy triggers before changing the mask
+            self.check_equal(trigs, ref)
+            keep = ref.snr > 7
+            trigs.apply_mask(keep)
+            ref.apply_mask(keep)
+            self.check_equal(trigs, ref)
+
+    def test_filter_func(self):
+        for filter_func in ('self.snr > 7', 'self.mass1 > 5'):
+            trigs = self.triggers(self.bool_mask, True, filter_func)
+            ref = self.triggers(self.bool_mask, False, filter_func)
+            self.assertTrue((trigs.mask == ref.mask).all())
+            self.check_equal(trigs, ref)
+
+    def test_loudest_events(self):
+        for mask in (self.bool_mask, list(numpy.flatnonzero(self.bool_mask))):
+            trigs = self.triggers(mask, True)
+            ref = self.triggers(mask, False)
+            trigs.mask_to_n_loudest_clustered_events(n_loudest=5)
+            ref.mask_to_n_loudest_clustered_events(n_loudest=5)
+            self.assertEqual(list(trigs.mask), list(ref.mask))
+            self.assertTrue((trigs.stat == ref.stat).all())
+            self.check_equal(trigs, ref)
+
+        # The same events are found through unsorted indices
+        idx = numpy.flatnonzero(self.bool_mask)
+        trigs = self.triggers(list(numpy.random.permutation(idx)), True)
+        trigs.mask_to_n_loudest_clustered_events(n_loudest=5)
+        self.assertEqual(sorted(trigs.mask), list(ref.mask))
+        self.assertEqual(sorted(trigs.stat), sorted(ref.stat))
+
+
+class TestHFileSelect(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        numpy.random.seed(0)
+        self.fname = os.path.join(self.tmpdir, 'trigs.hdf')
+        # The snr drifts along the file so that whole chunks fail the cuts
+        num = 10000
+        with h5py.File(self.fname, 'w') as f:
+            f['H1/snr'] = numpy.linspace(4, 12, num) + \
+                          numpy.random.uniform(-1, 1, size=num)
+            f['H1/end_time'] = numpy.random.uniform(0, 1000, size=num)
+            for key in ('H1/snr', 'H1/end_time'):
+                store_chunk_stats(f[key], chunksize=250)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def check_select(self, predicates, fcn, **kwds):
+        with HFile(self.fname, 'r') as f:
+            res = f.select(None, 'H1/snr', 'H1/end_time',
+                           predicates=predicates, return_indices=True,
+                           chunksize=250, **kwds)
+            ref = f.select(fcn, 'H1/snr', 'H1/end_time',
+                           return_indices=True, chunksize=250)
+        self.assertTrue(len(ref[0]) > 0)
+        for values, ref_values in zip(res, ref):
+            self.assertEqual(values.dtype, ref_values.dtype)
+            self.assertTrue((values == ref_values).all())
+
+    def test_predicates(self):
+        self.check_select([('H1/snr', '>', 10)],
+                          lambda snr, t: snr > 10)
+        self.check_select([('H1/snr', '<=', 5), ('H1/end_time', '>=', 500)],
+                          lambda snr, t: (snr <= 5) & (t >= 500))
+        self.check_select([('H1/snr', '<', 6)],
+                          lambda snr, t: snr < 6, nthreads=3)
+
+    def test_skip_chunks(self):
+        # Chunks whose stored range cannot pass are skipped without being
+        # read, so misleading statistics drop their triggers
+        with h5py.File(self.fname, 'a') as f:
+            high = f['H1/snr'].attrs['chunk_max']
+            high[:len(high) // 2] = 0
+            f['H1/snr'].attrs['chunk_max'] = high
+        with HFile(self.fname, 'r') as f:
+            idx, snr = f.select(None, 'H1/snr', return_indices=True,
+                                predicates=[('H1/snr', '>', 4)],
+                                chunksize=250)
+            ref_idx, ref_snr = f.select(lambda snr: snr > 4, 'H1/snr',
+                                        return_indices=True, chunksize=250)
+        self.assertTrue(len(idx) < len(ref_idx))
+        self.assertTrue(idx.min() >= 250 * (len(high) // 2))
+        keep = ref_idx >= 250 * (len(high) // 2)
+        self.assertTrue((idx == ref_idx[keep]).all())
+        self.assertTrue((snr == ref_snr[keep]).all())
+
+    def test_unknown_operator(self):
+        with HFile(self.fname, 'r') as f:
+            self.assertRaises(ValueError, f.select, None, 'H1/snr',
+                              predicates=[('H1/snr', '!=', 6)])
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestReadByTemplate))
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestSingleDetTriggers))
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestHFileSelect))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
@@ -141,6 +141,184 @@ class TestMatchedFilter(unittest.TestCase):
 
             self.assertRaises(ValueError,match,self.filt,self.filt[0:len(self.filt)-1])
 
+    def test_batch_matched_filter(self):
+        # Batched filtering is only available on the CPU
+        if self.scheme != 'cpu':
+            return
+        with self.context:
+            # Check that filtering a batch of templates gives the same
+            # triggers as filtering them one at a time
+            from numpy.random import normal
+            tlen = 4096
+            delta_f = 1.0
+
+            # Hide a loud copy of each template in the middle of the data
+            data = normal(0, 0.1, tlen)
+            tmplts = []
+            for i in range(3):
+                t = normal(0, 1, tlen)
+                data += 10 * numpy.roll(t, tlen // 2)
+                t = TimeSeries(t, dtype=float32, delta_t=1.0/tlen)
+                tmplts.append(make_frequency_series(t))
+
+            data = TimeSeries(data, dtype=float32, delta_t=1.0/tlen)
+            stilde = make_frequency_series(data)
+            stilde.analyze = slice(tlen // 4, 3 * tlen // 4)
+            flen = len(stilde)
+
+            template_mem = zeros(tlen, dtype=complex64)
+            single = MatchedFilterControl(None, None, 2.0, tlen, delta_f,
+                                          complex64, [stilde], template_mem,
+                                          False)
+            batch = BatchMatchedFilterControl(None, None, 2.0, tlen, delta_f,
+                                              complex64, [stilde], 4, False)
+
+            norms = []
+            for i, tmplt in enumerate(tmplts):
+                batch.htildes[i][0:flen] = tmplt
+                norms.append(sigmasq(tmplt))
+
+            results = batch.matched_filter_and_cluster(0, norms,
+                                                       [0] * len(norms))
+            self.assertEqual(len(results), len(tmplts))
+
+            for tmplt, norm, result in zip(tmplts, norms, results):
+                template_mem[0:flen] = tmplt
+                _, snorm, _, sidx, ssnrv = \
+                    single.matched_filter_and_cluster(0, norm, None)
+                _, bnorm, _, bidx, bsnrv = result
+                self.assertAlmostEqual(snorm, bnorm, places=5)
+                self.assertTrue(len(sidx) > 0)
+                self.assertTrue((numpy.array(sidx) == numpy.array(bidx)).all())
+                self.assertTrue(numpy.allclose(ssnrv, bsnrv, rtol=1e-4))
+
+            # Filter a partial batch whose second row is skipped. The rows
+            # still hold templates from the full batch, so are only left
+            # alone if they are not filtered again.
+            batch.htildes[3][0:flen] = tmplts[0]
+            batch.matched_filter_and_cluster(0, norms + [norms[0]],
+                                             [0] * 4)
+            for row in (1, 3):
+                batch.snrs[row][:] = 1
+            results = batch.matched_filter_and_cluster(0,
+                                            [norms[0], None, norms[2]],
+                                            [0] * 3)
+            self.assertEqual(len(results), 3)
+            self.assertEqual(len(results[1][3]), 0)
+            self.assertTrue((batch.snrs[1].numpy() == 0).all())
+            self.assertTrue((batch.snrs[3].numpy() == 1).all())
+            for row in (0, 2):
+                template_mem[0:flen] = tmplts[row]
+                _, _, _, sidx, ssnrv = \
+                    single.matched_filter_and_cluster(0, norms[row], None)
+                _, _, _, bidx, bsnrv = results[row]
+                self.assertTrue((numpy.array(sidx) == numpy.array(bidx)).all())
+                self.assertTrue(numpy.allclose(ssnrv, bsnrv, rtol=1e-4))
+
+    def test_heirarchical_matched_filter(self):
+        # The pruned FFT used to upsample is only available on the CPU
+        if self.scheme != 'cpu':
+            return
+        with self.context:
+            # Check that the heirarchical filter gives the same triggers as
+            # the full rate filter for a sequence of templates sharing the
+            # same template memory. A tiny upsample threshold selects every
+            # reduced rate point, so the full rate snr is evaluated everywhere.
+            from numpy.random import normal
+            tlen = 4096
+            delta_f = 1.0
+
+            # Hide a loud copy of each template in the middle of the data
+            data = normal(0, 0.1, tlen)
+            tmplts = []
+            for i in range(3):
+                t = normal(0, 1, tlen)
+                data += 10 * numpy.roll(t, tlen // 2)
+                t = TimeSeries(t, dtype=float32, delta_t=1.0/tlen)
+                tmplts.append(make_frequency_series(t))
+
+            data = TimeSeries(data, dtype=float32, delta_t=1.0/tlen)
+            stilde = make_frequency_series(data)
+            stilde.analyze = slice(tlen // 4, 3 * tlen // 4)
+            flen = len(stilde)
+
+            template_mem = zeros(tlen, dtype=complex64)
+            full = MatchedFilterControl(None, None, 2.0, tlen, delta_f,
+                                        complex64, [stilde], template_mem,
+                                        False)
+            heir = MatchedFilterControl(None, None, 2.0, tlen, delta_f,
+                                        complex64, [stilde], template_mem,
+                                        False, downsample_factor=4,
+                                        upsample_threshold=1e-6)
+
+            for tmplt in tmplts:
+                template_mem[0:flen] = tmplt
+                norm = sigmasq(tmplt)
+
+                _, fnorm, _, fidx, fsnrv = \
+                    full.matched_filter_and_cluster(0, norm, None)
+                _, hnorm, _, hidx, hsnrv = \
+                    heir.matched_filter_and_cluster(0, norm, None)
+                self.assertAlmostEqual(fnorm, hnorm, places=5)
+                self.assertTrue(len(fidx) > 0)
+                self.assertTrue((numpy.array(fidx) == numpy.array(hidx)).all())
+                self.assertTrue(numpy.allclose(fsnrv, hsnrv, rtol=1e-4))
+
+    def test_heirarchical_upsample_threshold(self):
+        if self.scheme != 'cpu':
+            return
+        with self.context:
+            # With a realistic upsample threshold only the full rate points
+            # near loud reduced rate points are evaluated. The templates are
+            # band limited to the reduced rate, so these points are those
+            # found by the full rate filter, and the pruned inverse FFT must
+            # give the snr of the full inverse FFT at each of them.
+            from numpy.random import normal
+            tlen = 4096
+            delta_f = 1.0
+            flen = tlen // 2 + 1
+
+            data = normal(0, 1, tlen)
+            tmplts = []
+            for i in range(3):
+                t = TimeSeries(normal(0, 1, tlen), dtype=float32,
+                               delta_t=1.0/tlen)
+                t = make_frequency_series(t)
+                t[tlen // 8:] = 0
+                tmplts.append(t)
+                # Place a loud signal near the end of the analysis segment
+                shift = 3 * tlen // 4 - 1 - 37 * i
+                data += 16 * numpy.roll(t.to_timeseries().numpy(), shift)
+
+            data = TimeSeries(data, dtype=float32, delta_t=1.0/tlen)
+            stilde = make_frequency_series(data)
+            stilde.analyze = slice(tlen // 4, 3 * tlen // 4)
+
+            template_mem = zeros(tlen, dtype=complex64)
+            full = MatchedFilterControl(None, None, 8.0, tlen, delta_f,
+                                        complex64, [stilde], template_mem,
+                                        False)
+            heir = MatchedFilterControl(None, None, 8.0, tlen, delta_f,
+                                        complex64, [stilde], template_mem,
+                                        False, downsample_factor=4,
+                                        upsample_threshold=0.9)
+
+            for tmplt in tmplts:
+                template_mem[0:flen] = tmplt
+                norm = sigmasq(tmplt)
+
+                fsnr, _, _, fidx, fsnrv = \
+                    full.matched_filter_and_cluster(0, norm, None)
+                _, _, _, hidx, hsnrv = \
+                    heir.matched_filter_and_cluster(0, norm, None)
+                fsnr = fsnr.numpy()[stilde.analyze]
+
+                self.assertTrue(len(hidx) > 0)
+                self.assertTrue(set(hidx) <= set(fidx))
+                self.assertTrue(numpy.argmax(abs(fsnr)) in hidx)
+                self.assertTrue(numpy.allclose(hsnrv, fsnr[hidx],
+                                               rtol=1e-4, atol=1e-3))
+
 
 suite = unittest.TestSuite()
 suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestMatchedFilter))
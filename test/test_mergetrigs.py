@@ -0,0 +1,131 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for the pycbc_coinc_mergetrigs program
+"""
+import os, shutil, subprocess, sys, tempfile, unittest
+import h5py, numpy
+from utils import simple_exit
+
+mergetrigs = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                          'bin', 'hdfcoinc', 'pycbc_coinc_mergetrigs')
+
+
+class TestMergeTrigs(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        numpy.random.seed(0)
+        ntemplates = 30
+        self.hashes = numpy.random.permutation(10 * ntemplates)[:ntemplates]
+        self.bank = os.path.join(self.tmpdir, 'bank.hdf')
+        with h5py.File(self.bank, 'w') as f:
+            f['template_hash'] = self.hashes
+
+        # Each file holds triggers of a random subset of the templates, in
+        # an arbitrary order. The last file is empty.
+        self.files = []
+        self.triggers = []
+        for i, num in enumerate([200, 150, 300, 0]):
+            tids = numpy.random.randint(0, ntemplates, size=num)
+            trigs = {'template_hash': self.hashes[tids],
+                     'snr': numpy.random.uniform(5, 20, size=num),
+                     'end_time': numpy.random.uniform(0, 1000, size=num)}
+            fname = os.path.join(self.tmpdir, 'trigs%d.hdf' % i)
+            with h5py.File(fname, 'w') as f:
+                f['H1/search/start_time'] = numpy.array([i * 1000.])
+                f['H1/search/end_time'] = numpy.array([(i + 1) * 1000.])
+                if num:
+                    for col in trigs:
+                        f['H1/' + col] = trigs[col]
+            self.files.append(fname)
+            self.triggers.append((tids, trigs))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def merge(self, *opts):
+        out = os.path.join(self.tmpdir, 'merged.hdf')
+        subprocess.check_call([sys.executable, mergetrigs,
+                               '--trigger-files'] + self.files +
+                              ['--bank-file', self.bank,
+                               '--output-file', out] + list(opts))
+        self.assertEqual(os.listdir(self.tmpdir).count('merged.hdf'), 1)
+        # the temporary arrays have been removed
+        self.assertEqual(len(os.listdir(self.tmpdir)), len(self.files) + 2)
+        return out
+
+    def expected(self, tid):
+        """ The triggers of a template in input file order, as the per
+        template contents of the previous merge
+        """
+        rows = [numpy.flatnonzero(tids == tid) for tids, _ in self.triggers]
+        return {col: numpy.concatenate([trigs[col][r] for r, (_, trigs)
+                                        in zip(rows, self.triggers)])
+                for col in ['snr', 'end_time']}
+
+    def check_merge(self, contiguous, *opts):
+        if contiguous:
+            opts += ('--contiguous-templates', '--chunk-size', '16')
+        with h5py.File(self.merge(*opts), 'r') as f:
+            num = sum(len(tids) for tids, _ in self.triggers)
+            self.assertEqual(len(f['H1/snr']), num)
+            self.assertEqual(len(f['H1/search/start_time']), len(self.files))
+            for tid in range(len(self.hashes)):
+                expected = self.expected(tid)
+                if contiguous:
+                    self.assertTrue(f['H1'].attrs['contiguous_templates'])
+                    l, r = f['H1/template_boundaries'][tid:tid + 2]
+                    got = {col: f['H1/' + col][l:r] for col in expected}
+                    tid_col = f['H1/template_id'][l:r]
+                    # the triggers keep the order of the input files
+                    for col in expected:
+                        self.assertTrue((got[col] == expected[col]).all())
+                else:
+                    l = f['H1/template_boundaries'][tid]
+                    r = l + len(expected['snr'])
+                    got = {col: f['H1/' + col][f['H1/%s_template' % col][tid]]
+                           for col in expected}
+                    tid_col = f['H1/template_id'][l:r]
+                    # the order within a template was not defined before
+                    order = got['end_time'].argsort()
+                    ref_order = expected['end_time'].argsort()
+                    for col in expected:
+                        self.assertTrue((got[col][order] ==
+                                         expected[col][ref_order]).all())
+                self.assertTrue((tid_col == tid).all())
+
+    def test_region_references(self):
+        self.check_merge(False)
+
+    def test_contiguous_templates(self):
+        self.check_merge(True)
+
+    def test_cores(self):
+        self.check_merge(True, '--cores', '2')
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestMergeTrigs))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
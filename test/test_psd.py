@@ -106,6 +106,100 @@ class TestPSD(unittest.TestCase):
                         msg='seg_len=%d seg_stride=%d method=%s -> rms=%.3f' % \
                         (seg_len, seg_stride, method, err_rms))
 
+    def test_welch_estimator(self):
+        """Test the Welch estimator sharing segments between PSDs"""
+        seg_len = 4096
+        with self.context:
+            estimator = pycbc.psd.WelchEstimator(self.noise, batch_size=5)
+            for start, end in ((0, 262144), (65536, 327680), (1000, 263145)):
+                part = self.noise[start:end]
+                for method in ('mean', 'median', 'median-mean'):
+                    psd = pycbc.psd.welch(part, seg_len=seg_len,
+                                          seg_stride=seg_len//2,
+                                          avg_method=method)
+                    psd_est = estimator.welch(part, seg_len=seg_len,
+                                              seg_stride=seg_len//2,
+                                              avg_method=method)
+                    self.assertEqual(psd.delta_f, psd_est.delta_f)
+                    self.assertEqual(psd.epoch, psd_est.epoch)
+                    self.assertTrue(numpy.allclose(psd.numpy(),
+                                                   psd_est.numpy(),
+                                                   rtol=1e-6, atol=0))
+
+    def test_welch_segments_numpy_backend(self):
+        """Test the Welch segment PSDs with a backend without FFT classes"""
+        if self.scheme != 'cpu':
+            return
+        from pycbc.fft import backend_cpu
+        from pycbc.psd.estimate import welch_segment_psds
+        seg_len = 4096
+        starts = numpy.arange(0, 40000, seg_len // 2)
+        with self.context:
+            ref = welch_segment_psds(self.noise, seg_len, starts)
+            backend = backend_cpu.cpu_backend
+            backend_cpu.set_backend(['numpy'])
+            try:
+                psds = welch_segment_psds(self.noise, seg_len, starts)
+            finally:
+                backend_cpu.set_backend([backend])
+        self.assertTrue(numpy.allclose(psds, ref, rtol=1e-6, atol=0))
+
+    def test_streaming_welch(self):
+        """Test the streaming Welch estimator on an advancing buffer"""
+        seg_len = 4096
+        num_segments = 15
+        data_len = (num_segments + 1) * seg_len // 2
+        estimator = pycbc.psd.StreamingWelch(seg_len, seg_len // 2,
+                                             num_segments)
+        with self.context:
+            for end in (data_len + 10000, data_len + 18192, data_len + 30000):
+                buf = self.noise[end - data_len - 10000:end]
+                psd = pycbc.psd.welch(buf[10000:], seg_len=seg_len,
+                                      seg_stride=seg_len // 2)
+                psd_est = estimator.psd(buf)
+                self.assertEqual(psd.epoch, psd_est.epoch)
+                self.assertTrue(numpy.allclose(psd.numpy(),
+                                               psd_est.numpy(),
+                                               rtol=1e-6, atol=0))
+
+    def test_psd_variation(self):
+        """Test the PSD variation against separate Welch estimates"""
+        from pycbc.psd.variation import calc_psd_variation
+        # The last long and short windows run past the end of the data
+        strain = TimeSeries(numpy.random.normal(size=198 * 256),
+                            delta_t=1./256, epoch=1000)
+        short_seg, long_seg = 8, 64
+        with self.context:
+            psd_var = calc_psd_variation(strain, short_seg, long_seg,
+                                         4, 2, 'median', 20, 100)
+
+            def welch(start, end):
+                return pycbc.psd.welch(strain.time_slice(start, end),
+                                       seg_len=4 * 256, seg_stride=2 * 256,
+                                       avg_method='median').numpy()
+
+            start, end = float(strain.start_time), float(strain.end_time)
+            ref = []
+            for tlong in numpy.arange(start, end, long_seg):
+                psd_long = welch(min(tlong, end - long_seg),
+                                 min(tlong + long_seg, end))
+                freqs = numpy.arange(len(psd_long)) * 0.25
+                weight = freqs[80:400] ** (-7./3.) / psd_long[80:400]
+                weight /= weight.sum()
+                for tshort in numpy.arange(tlong, min(tlong + long_seg, end),
+                                           short_seg):
+                    if tshort + short_seg <= end:
+                        psd_short = welch(tshort, tshort + short_seg)
+                    else:
+                        psd_short = welch(tshort - short_seg, end)
+                    ref.append((weight * psd_short[80:400] /
+                                psd_long[80:400]).sum())
+
+        self.assertEqual(len(psd_var), len(ref))
+        self.assertEqual(psd_var.delta_t, short_seg)
+        self.assertTrue(numpy.allclose(psd_var.numpy(), ref,
+                                       rtol=1e-6, atol=0))
+
     def test_truncation(self):
         """Test inverse PSD truncation"""
         for seg_len in (2048, 4096, 8192):
@@ -125,6 +219,47 @@ class TestPSD(unittest.TestCase):
                                 msg='seg_len=%d max_len=%d -> rms=%.3f' \
                                 % (seg_len, max_len, err_rms))
 
+    def test_truncation_multi(self):
+        """Test inverse PSD truncation at several resolutions"""
+        with self.context:
+            psd = pycbc.psd.welch(self.noise, seg_len=4096,
+                                  seg_stride=2048, avg_method='mean')
+            psd_trunc = pycbc.psd.inverse_spectrum_truncation(
+                    psd, 512, low_frequency_cutoff=self.psd_low_freq_cutoff)
+            psds = pycbc.psd.inverse_spectrum_truncation_multi(
+                    psd, [psd.delta_f, psd.delta_f * 2], 512,
+                    low_frequency_cutoff=self.psd_low_freq_cutoff)
+            self.assertTrue((psds[psd.delta_f].numpy() ==
+                             psd_trunc.numpy()).all())
+
+            # The coarser PSD samples the same smoothed spectrum
+            coarse = psds[psd.delta_f * 2]
+            self.assertEqual(len(coarse), len(psd) // 2 + 1)
+            kmin = int(self.psd_low_freq_cutoff / coarse.delta_f) + 1
+            self.assertTrue(numpy.allclose(coarse.numpy()[kmin:],
+                                           psd_trunc.numpy()[2*kmin::2],
+                                           rtol=1e-4))
+
+    def test_truncation_long_filter(self):
+        """Test that a filter as long as the PSD is not truncated"""
+        with self.context:
+            psd = pycbc.psd.welch(self.noise, seg_len=4096,
+                                  seg_stride=2048, avg_method='mean')
+            N = (len(psd) - 1) * 2
+            kmin = int(self.psd_low_freq_cutoff / psd.delta_f) + 1
+            for max_len in (N, N + 1):
+                psd_trunc = pycbc.psd.inverse_spectrum_truncation(
+                        psd, max_len,
+                        low_frequency_cutoff=self.psd_low_freq_cutoff)
+                self.assertTrue(numpy.allclose(psd_trunc.numpy()[kmin:-1],
+                                               psd.numpy()[kmin:-1],
+                                               rtol=1e-4))
+            # The filter no longer fits at a coarser resolution
+            self.assertRaises(ValueError,
+                              pycbc.psd.inverse_spectrum_truncation_multi,
+                              psd, [psd.delta_f * 2], N + 1,
+                              low_frequency_cutoff=self.psd_low_freq_cutoff)
+
 suite = unittest.TestSuite()
 suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestPSD))
 
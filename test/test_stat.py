@@ -0,0 +1,98 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for the pycbc.events.stat module
+"""
+import os, shutil, tempfile, unittest
+import h5py, numpy
+from pycbc.events import stat
+from utils import simple_exit
+
+
+class TestTemplateFitTable(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        numpy.random.seed(0)
+        self.alpha = numpy.random.uniform(2, 6, size=20)
+        self.rate = numpy.random.uniform(1, 100, size=20)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_fits(self, template_id, ifo='H1'):
+        fname = os.path.join(self.tmpdir, '%s-%d.hdf' % (ifo, len(template_id)))
+        with h5py.File(fname, 'w') as f:
+            f.attrs['stat'] = '%s-fit_coeffs' % ifo
+            f.attrs['stat_threshold'] = 6.0
+            f['template_id'] = template_id
+            f['fit_coeff'] = self.alpha[template_id]
+            f['count_above_thresh'] = self.rate[template_id]
+        return fname
+
+    def check_table(self, template_id, memmap):
+        fname = self.write_fits(template_id)
+        with h5py.File(fname, 'r') as f:
+            table = stat.TemplateFitTable(f, memmap=memmap)
+            missing = numpy.ones(template_id.max() + 1, dtype=bool)
+            missing[template_id] = False
+            self.assertEqual(len(table['alpha']), len(missing))
+            self.assertTrue((table['alpha'][template_id] ==
+                             self.alpha[template_id]).all())
+            self.assertTrue((table['rate'][template_id] ==
+                             self.rate[template_id]).all())
+            self.assertTrue(numpy.allclose(table['log_alpha'][template_id],
+                                           numpy.log(self.alpha[template_id])))
+            self.assertTrue(numpy.isnan(table['alpha'][missing]).all())
+            self.assertTrue(numpy.isnan(table['rate'][missing]).all())
+            self.assertEqual(table.thresh, 6.0)
+            self.assertFalse(table['alpha'].flags.writeable)
+
+    def test_dense(self):
+        for memmap in (True, False):
+            self.check_table(numpy.arange(20), memmap)
+
+    def test_permuted(self):
+        for memmap in (True, False):
+            self.check_table(numpy.random.permutation(20), memmap)
+
+    def test_gapped(self):
+        for memmap in (True, False):
+            self.check_table(numpy.array([7, 0, 3, 19, 12]), memmap)
+
+    def test_alphamax(self):
+        template_id = numpy.array([7, 0, 3, 19, 12])
+        fnames = [self.write_fits(template_id, ifo='H1'),
+                  self.write_fits(numpy.arange(20), ifo='L1')]
+        fit_stat = stat.ExpFitStatistic(fnames)
+        self.assertEqual(fit_stat.alphamax['H1'],
+                         self.alpha[template_id].max())
+        self.assertEqual(fit_stat.alphamax['L1'], self.alpha.max())
+        for f in fit_stat.files.values():
+            f.close()
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestTemplateFitTable))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
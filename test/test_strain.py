@@ -0,0 +1,119 @@
+# This program is free software; you can redistribute it and/or modify it
+# under the terms of the GNU General Public License as published by the
+# Free Software Foundation; either version 3 of the License, or (at your
+# option) any later version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General
+# Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+#
+# =============================================================================
+#
+#                                   Preamble
+#
+# =============================================================================
+#
+"""
+These are the unittests for the segmentation in the pycbc.strain module
+"""
+import unittest
+import numpy
+from pycbc.types import TimeSeries, FrequencySeries, float32, float64
+from pycbc.strain import StrainSegments
+from pycbc.fft.fftw import set_measure_level
+from utils import simple_exit
+set_measure_level(0)
+
+
+class TestStrainSegments(unittest.TestCase):
+    def setUp(self):
+        numpy.random.seed(0)
+        self.sample_rate = 256
+        self.strain = TimeSeries(numpy.random.normal(size=64 * 256),
+                                 delta_t=1.0 / self.sample_rate,
+                                 epoch=1000, dtype=float32)
+
+    def segments(self, batch_fft):
+        # Analysing the whole strain zero pads the first and last segments
+        segs = StrainSegments(self.strain, segment_length=16,
+                              segment_start_pad=2, segment_end_pad=2,
+                              trigger_start=1000, trigger_end=1064,
+                              allow_zero_padding=True, batch_fft=batch_fft)
+        # Leave a partial last batch
+        segs.fft_batch_size = 4
+        return segs
+
+    def psds(self, flen, dtype=float32):
+        freqs = numpy.arange(flen)
+        return [FrequencySeries(1.0 + freqs * scale, delta_f=1.0 / 16,
+                                dtype=dtype) for scale in (1e-2, 1e-3)]
+
+    def test_fourier_segments(self):
+        ref = self.segments(False).fourier_segments()
+        segs = self.segments(True).fourier_segments()
+        self.assertEqual(len(segs), len(ref))
+        self.assertTrue(segs[0].seg_slice.start < 0)
+        self.assertTrue(segs[-1].seg_slice.stop > len(self.strain))
+        for seg, rseg in zip(segs, ref):
+            self.assertEqual(seg.dtype, rseg.dtype)
+            self.assertEqual(seg.delta_f, rseg.delta_f)
+            self.assertEqual(seg.epoch, rseg.epoch)
+            self.assertEqual(seg.analyze, rseg.analyze)
+            self.assertEqual(seg.cumulative_index, rseg.cumulative_index)
+            self.assertTrue(numpy.allclose(seg.numpy(), rseg.numpy(),
+                                           rtol=1e-5, atol=1e-6))
+
+    def test_batch_fft_off_cpu(self):
+        # Other schemes transform the segments one at a time, as the block
+        # of the batched mode is filled through host memory
+        from pycbc.scheme import mgr, Scheme
+        segs = self.segments(True)
+        calls = []
+        segs._batched_fourier_segments = lambda: calls.append(1) or []
+        state = mgr.state
+        mgr.shift_to(Scheme.__new__(Scheme))
+        try:
+            segs.fourier_segments()
+        except Exception: # pylint:disable=broad-except
+            # the stand-in scheme has no FFT backend of its own
+            pass
+        finally:
+            mgr.shift_to(state)
+        self.assertEqual(calls, [])
+
+    def test_overwhiten_segments(self):
+        ref_segs = self.segments(False)
+        segs = self.segments(True)
+        for strain_segs in (ref_segs, segs):
+            fsegs = strain_segs.fourier_segments()
+            psds = self.psds(len(fsegs[0]))
+            for i, seg in enumerate(fsegs):
+                seg.psd = psds[i % 2]
+            strain_segs.overwhiten_segments()
+        for seg, rseg in zip(segs.fourier_segments(),
+                             ref_segs.fourier_segments()):
+            self.assertTrue(numpy.allclose(seg.numpy(), rseg.numpy(),
+                                           rtol=1e-5, atol=1e-6))
+
+    def test_overwhiten_precision(self):
+        for batch_fft in (False, True):
+            segs = self.segments(batch_fft)
+            fsegs = segs.fourier_segments()
+            psd = self.psds(len(fsegs[0]), dtype=float64)[0]
+            for seg in fsegs:
+                seg.psd = psd
+            self.assertRaises(TypeError, segs.overwhiten_segments)
+
+
+suite = unittest.TestSuite()
+suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestStrainSegments))
+
+if __name__ == '__main__':
+    results = unittest.TextTestRunner(verbosity=2).run(suite)
+    simple_exit(results)
@@ -58,6 +58,80 @@ class TestThreshold(unittest.TestCase):
             self.assertTrue((locs == self.locs).all())
             self.assertTrue((vals == self.vals).all())
             print(len(locs), len(vals))
+
+    def test_findchirp_threshold_cluster(self):
+        with self.context:
+            window = 100
+            locs, vals = cluster_reduce(self.locs, self.vals, window)
+            engine = FindchirpThresholdCluster(self.series)
+            cvals, clocs = engine.threshold_and_cluster(self.threshold, window)
+            self.assertTrue((clocs == locs).all())
+            self.assertTrue((cvals == vals).all())
+
+    def test_findchirp_fallback(self):
+        # Schemes without a fused engine threshold and then cluster
+        from pycbc.scheme import mgr, Scheme
+        from pycbc.events.threshold_cpu import CPUFindchirpThresholdCluster
+        state = mgr.state
+        mgr.shift_to(Scheme.__new__(Scheme))
+        try:
+            engine = FindchirpThresholdCluster(self.series)
+        finally:
+            mgr.shift_to(state)
+        self.assertFalse(isinstance(engine, CPUFindchirpThresholdCluster))
+
+        window = 100
+        locs, vals = cluster_reduce(self.locs, self.vals, window)
+        cvals, clocs = engine.threshold_and_cluster(self.threshold, window)
+        self.assertTrue((clocs == locs).all())
+        self.assertTrue((cvals == vals).all())
+
+    def test_trigger_store(self):
+        dtype = [('template_id', int), ('snr', numpy.complex64)]
+        pieces = []
+        for i in range(20):
+            e = numpy.zeros(numpy.random.randint(0, 300), dtype=dtype)
+            e['template_id'] = i
+            e['snr'] = numpy.random.uniform(size=len(e))
+            pieces.append(e)
+        expected = numpy.concatenate(pieces)
+
+        store = TriggerStore(dtype, chunk_size=256)
+        for e in pieces:
+            store.append(e)
+        self.assertEqual(len(store), len(expected))
+        self.assertTrue((store.to_array() == expected).all())
+        self.assertEqual(len(store), 0)
+
+        spilled = []
+        store = TriggerStore(dtype, chunk_size=256, spill=spilled.append)
+        for e in pieces:
+            store.append(e)
+        store.flush()
+        self.assertEqual(store.nspilled, len(expected))
+        self.assertTrue(all(len(c) <= 256 for c in spilled))
+        self.assertTrue((numpy.concatenate(spilled) == expected).all())
+
+    def test_threshold_masks(self):
+        from pycbc.events.ranking import newsnr
+        dtype = [('snr', numpy.complex64), ('chisq', numpy.float32),
+                 ('chisq_dof', int)]
+        events = numpy.zeros(1000, dtype=dtype)
+        events['snr'] = numpy.random.uniform(4, 10, size=1000)
+        events['chisq'] = numpy.random.uniform(0, 100, size=1000)
+        events['chisq_dof'] = numpy.random.randint(1, 40, size=1000)
+
+        keep = chisq_threshold_mask(events, 3.0, delta=0.1)
+        for e, k in zip(events, keep):
+            xi = e['chisq'] / (e['chisq_dof'] / 2 + 1 +
+                               0.1 * abs(e['snr']) ** 2)
+            self.assertEqual(k, not xi > 3.0)
+
+        keep = newsnr_threshold_mask(events, 6.0)
+        for e, k in zip(events, keep):
+            nsnr = newsnr(abs(e['snr']), e['chisq'] / e['chisq_dof'])
+            self.assertEqual(k, not nsnr < 6.0)
+
 suite = unittest.TestSuite()
 suite.addTest(unittest.TestLoader().loadTestsFromTestCase(TestThreshold))
 
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+""" Benchmark the lookup of the PhaseTD statistic histogram
+
+Compares the BinnedLookup table used by PhaseTDStatistic.logsignalrate with
+locating each bin by binary search and indexing the N-dimensional histogram
+directly, on a random histogram of a similar shape to those produced by
+pycbc_stat_dtphase.
+"""
+import argparse, timeit
+import numpy
+from pycbc.events.stat import BinnedLookup
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--num-coincs', type=int, default=10**6,
+                    help='Number of coincidences to look up. Default 1e6')
+parser.add_argument('--shape', type=int, nargs=5,
+                    default=[100, 50, 20, 20, 20],
+                    metavar=('TIME', 'PHASE', 'SNR0', 'SNR1', 'RATIO'),
+                    help='Number of bins along each axis of the histogram')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='Number of times to repeat each lookup. Default 5')
+args = parser.parse_args()
+
+numpy.random.seed(0)
+hist = numpy.log(numpy.random.uniform(size=args.shape))
+tbins = numpy.linspace(-0.015, 0.015, args.shape[0] + 1)
+pbins = numpy.linspace(0, 2. * numpy.pi, args.shape[1] + 1)
+sbins = numpy.linspace(4, 40, args.shape[2] + 1)
+rbins = numpy.linspace(0, 1, args.shape[4] + 1)
+edges = [tbins, pbins, sbins, sbins, rbins]
+
+n = args.num_coincs
+coords = [numpy.random.uniform(-0.02, 0.02, n),
+          numpy.random.uniform(0, 2. * numpy.pi, n),
+          numpy.random.uniform(4, 50, n).astype(numpy.float32),
+          numpy.random.uniform(4, 50, n).astype(numpy.float32),
+          numpy.random.uniform(0, 1, n)]
+
+def searchsorted_lookup():
+    idx = []
+    for e, x in zip(edges, coords):
+        v = numpy.searchsorted(e, x) - 1
+        v[v < 0] = 0
+        v[v >= len(e) - 1] = len(e) - 2
+        idx.append(v)
+    return hist[tuple(idx)]
+
+lookup = BinnedLookup(hist, edges)
+def table_lookup():
+    return lookup(*coords)
+
+if not (searchsorted_lookup() == table_lookup()).all():
+    raise RuntimeError('Lookup methods do not agree')
+
+for name, func in [('searchsorted', searchsorted_lookup),
+                   ('lookup table', table_lookup)]:
+    best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+    print('%-12s: %.3f s, %.1f ns per coinc' % (name, best, best / n * 1e9))